@@ -47,12 +47,18 @@ from libs.create_ml_io import CreateMLReader
 from libs.create_ml_io import JSON_EXT
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
-from libs.ldv_utils import move_verified_helper, train_model_file_helper, detect_raw_conversion_helper, detect_raw_moving_helper, test_model_file_helper, IMG_FILE_EXTENSIONS_
+from libs.ldv_jobs import LDVJob, JobCancelled, JobProgressSink, JobProgressDock
+from libs.ldv_watch import RawCapturesWatcher
+from libs.ldv_prefetch import ImagePrefetcher
+from libs.ldv_file_list import ImageListModel, ImageScanThread
+from libs.ldv_model_registry import choose_best_model, model_registry_class_names, read_class_names, MODEL_REGISTRY_FILENAME_
+from libs.ldv_utils import move_verified_helper, train_model_file_helper, VOCResultSink, detect_raw_moving_helper, test_model_file_helper, read_test_set_targets, recently_moved_images, IMG_FILE_EXTENSIONS_
 from ldv_config import LDV_CONFIGS
+YOLOV7_DIR_ = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yolov7')  # relative YOLOv7 cfg/hyp/weights paths are resolved against this folder
 sys.path.insert(0, './yolov7')
 from yolov7.train import train_script_importable
-from yolov7.detect import detect_script_importable
-from yolov7.test import test_script_importable
+from yolov7.detect import detect_script_importable, WARM_DETECTION_MODEL
+from yolov7.test import test_script_importable, test_saved_predictions
 sys.path.pop(0) # Remove the inserted path to keep things clean
 import torch.cuda
 from functools import wraps
@@ -103,7 +109,8 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_file_format = settings.get(SETTING_LABEL_FILE_FORMAT, LabelFileFormat.PASCAL_VOC)
 
         # For loading all image under a directory
-        self.m_img_list = []
+        self.m_img_list = ImageListModel(self)
+        self.image_scan = None  # the ImageScanThread listing the open dir, while it runs
         self.dir_name = None
         self.label_hist = []
         self.last_open_dir = None
@@ -179,17 +186,24 @@ class MainWindow(QMainWindow, WindowMixin):
         self.dock.setObjectName(get_str('labels'))
         self.dock.setWidget(label_list_container)
 
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.itemDoubleClicked.connect(self.file_item_double_clicked)
+        self.file_list_view = QListView()
+        self.file_list_view.setModel(self.m_img_list)
+        self.file_list_view.setUniformItemSizes(True)  # lets the view lay out hundreds of thousands of rows without measuring each
+        self.file_list_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.file_list_view.doubleClicked.connect(self.file_item_double_clicked)
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
-        file_list_layout.addWidget(self.file_list_widget)
+        file_list_layout.addWidget(self.file_list_view)
         file_list_container = QWidget()
         file_list_container.setLayout(file_list_layout)
         self.file_dock = QDockWidget(get_str('fileList'), self)
         self.file_dock.setObjectName(get_str('files'))
         self.file_dock.setWidget(file_list_container)
 
+        # progress of the LDV action (Detect Raw, Move Verified, Train Model, Test Model) running in the background, if any
+        self.ldv_job = None
+        self.job_dock = JobProgressDock('LDV Action Progress', self)
+
         self.zoom_widget = ZoomWidget()
         self.light_widget = LightWidget(get_str('lightWidgetTitle'))
         self.color_dialog = ColorDialog(parent=self)
@@ -218,6 +232,8 @@ class MainWindow(QMainWindow, WindowMixin):
         self.addDockWidget(Qt.RightDockWidgetArea, self.dock)
         self.addDockWidget(Qt.RightDockWidgetArea, self.file_dock)
         self.file_dock.setFeatures(QDockWidget.DockWidgetFloatable)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.job_dock)
+        self.job_dock.hide()  # shown once an LDV action starts
 
         self.dock_features = QDockWidget.DockWidgetClosable | QDockWidget.DockWidgetFloatable
         self.dock.setFeatures(self.dock.features() ^ int(self.dock_features))
@@ -415,6 +431,18 @@ class MainWindow(QMainWindow, WindowMixin):
                             icon='detect_raw_capture',
                             tip=get_str('detectRawDetail'))
         
+        # action for toggling the mode that keeps detecting new images in the raw captures folder as they arrive
+        watch_raw = action(text=get_str('watchRaw'),
+                           slot=self.toggle_watch_raw,
+                           shortcut=None,
+                           icon=None,
+                           tip=get_str('watchRawDetail'),
+                           checkable=True)
+        self.raw_watcher = None  # the RawCapturesWatcher while Watch Raw Captures is on
+
+        # decodes the images next to the current one in the background, so next/prev shows them without waiting
+        self.prefetcher = ImagePrefetcher(parent=self)
+
         # action for running a script to move all Verified captures into the Training folder
         move_verified = action(text=get_str('moveVerified'),
                                 slot=self.move_verified_func,
@@ -429,12 +457,26 @@ class MainWindow(QMainWindow, WindowMixin):
                             icon='train_model',
                             tip=get_str('trainModelDetail'))
 
+        # action for continuing to train the selected model on the current training set, instead of training a new one
+        finetune_model = action(text=get_str('fineTuneModel'),
+                                slot=self.finetune_model_func,
+                                shortcut=None,
+                                icon=None,
+                                tip=get_str('fineTuneModelDetail'))
+
         # action for running a script to test a list of models based on the config file
         test_model = action(text=get_str('testModel'),
                             slot=self.test_model_func,
                             shortcut=None,
                             icon='test_model',
                             tip=get_str('testModelDetail'))
+
+        # action for scoring the predictions saved by the last Test Model run again, with the current config thresholds
+        rescore_test = action(text=get_str('rescoreTest'),
+                              slot=self.rescore_test_func,
+                              shortcut=None,
+                              icon=None,
+                              tip=get_str('rescoreTestDetail'))
         
         # actions for configuring the settings of LDV # raw_dir, project_dir, optional_verified_dir 
         ldv_set_raw_dir = action(text=get_str('setRawDir'),
@@ -491,8 +533,8 @@ class MainWindow(QMainWindow, WindowMixin):
                               onLoadActive=(
                                   close, create, create_mode, edit_mode),
                               onShapesPresent=(save_as, hide_all, show_all),
-                              ldvConfirm=ldv_confirm_toggle, detectRaw=detect_raw, moveVerified=move_verified,
-                              trainModel=train_model, testModel=test_model)
+                              ldvConfirm=ldv_confirm_toggle, detectRaw=detect_raw, watchRaw=watch_raw, moveVerified=move_verified,
+                              trainModel=train_model, fineTuneModel=finetune_model, testModel=test_model, rescoreTest=rescore_test)
 
         self.menus = Struct(
             file=self.menu(get_str('menu_file')),
@@ -536,7 +578,7 @@ class MainWindow(QMainWindow, WindowMixin):
             fit_window, fit_width, None,
             light_brighten, light_darken, light_org))
         add_actions(self.menus.ldv,
-                    (detect_raw, move_verified, train_model, test_model,
+                    (detect_raw, watch_raw, move_verified, train_model, finetune_model, test_model, rescore_test,
                      None, ldv_confirm_toggle))
         add_actions(self.menus.ldv_settings,
                     (ldv_set_raw_dir, ldv_set_project_dir, None, ldv_set_selected_model_dir, ldv_set_optional_verified_dir))
@@ -829,11 +871,13 @@ class MainWindow(QMainWindow, WindowMixin):
         self.statusBar().show()
 
     # Functions for Main LDV Actions
-    def _auto_choose_selected_model_dir(self):
+    def _auto_choose_selected_model_dir(self, class_names=None):
         """
         Helper function to automatically choose the model selected for Detect Raw Captures and Test Model, i.e., selected_model_dir
         If selected_model_dir is already a valid selection, will do nothing and return selected_model_dir.
-        If selected_model_dir is not set properly, will automatically select a model based on results file in the models in the project dir.
+        If selected_model_dir is not set properly, will automatically select the model with the best validation fitness from the
+        model registry of the trained models folder (see libs/ldv_model_registry.py). If class_names is given, only models
+        trained on those classes are considered.
         If there are no models to choose from in trained_models_dir, return None. 
         """
 
@@ -846,39 +890,16 @@ class MainWindow(QMainWindow, WindowMixin):
             return self.selected_model_dir
         
         # in the case where we need to automatically choose and set self.selected_model_dir
-        # sanity check for no saved trained models. early exit if no valid trained model folders
-        model_folders = [item for item in os.listdir(self.trained_models_dir) if os.path.isdir(os.path.join(self.trained_models_dir, item))]         # List all files and subdirectories in the given directory
-        # grab the valid 'result.txt' files and associated model name in dict, only if results file and 'weights/best.pt' exists
-        model_name_to_results_path = {model_name : os.path.join(self.trained_models_dir, model_name, 'results.txt') for model_name in model_folders \
-                                      if os.path.exists(os.path.join(self.trained_models_dir, model_name, 'results.txt'))\
-                                      and os.path.exists(os.path.join(self.trained_models_dir, model_name, 'weights', 'best.pt'))}
-        if len(model_name_to_results_path) == 0:
+        # best criterion from ITS OWN validation set during training, recorded in the registry when the training finished
+        best_model_name = choose_best_model(self.trained_models_dir, class_names=class_names)
+        if best_model_name is None:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Warning)
-            msg.setText(f"No valid models for automatic selection found in this project's Trained Models folder. \n\nIf this is a new project, ensure you Train Model at least once before before attempting to detect or test.")
+            msg.setText(f"No valid models for automatic selection found in this project's Trained Models folder{' for the current classes' if class_names else ''}. \n\nIf this is a new project, ensure you Train Model at least once before before attempting to detect or test.")
             msg.setWindowTitle("No Valid Trained Models Found")
             msg.exec_()
             return None
-        
-        # in the case where at least one valid trained model folder exists in the trained_models_dir
-        best_model_name = ''
-        best_model_performance = -1.0
-
-        for model_name, results_path in model_name_to_results_path.items():
-            # parse the relevant numbers from results.txt path
-            mAP50s, mAP50_95s = [], []
-            with open(results_path, "r") as f:
-                for line in f:
-                    parts = line.split() # Split the line into parts separated by spaces
-                    mAP50s.append(float(parts[10])) # the 10th index has validation set mAP@0.50
-                    mAP50_95s.append(float(parts[11])) # the 11th index has validation set mAP@0.50-0.95
-            weighted_sum = [0.1*mAP50 + 0.9*mAP50_95 for mAP50, mAP50_95 in zip(mAP50s, mAP50_95s)]  # the 0.1, 0.9 numbers come from the original YOLOv7 fitness weighting to determine "best" model
-            this_max_val = max(weighted_sum)
-            if this_max_val > best_model_performance: # if this model's performance is better than best, record that
-                best_model_name = model_name
-                best_model_performance = this_max_val
-
-        # set the selected_model_dir based on the selection criteria above (best criterion from ITS OWN validation set during training)
+
         self.selected_model_dir = os.path.join(self.trained_models_dir, best_model_name)
         return self.selected_model_dir
 
@@ -909,45 +930,135 @@ class MainWindow(QMainWindow, WindowMixin):
         if _auto_choice is None: # there are no valid models to automatically choose from, pop-up has already been shown in the function
             return None
 
-        # runs YOLOv7 detect.py, but the importable function version. 
-        # Most of these args are set in the ldv_configs or dynamically determined before this point
-        pred_file_name = 'predictions'
-        _cur_dir = os.getcwd()   # need to change to internal yolov7 directory for this due to relative pathing issues
-        os.chdir('./yolov7')
-        class_mapping, imgname_to_imgsize = \
-            detect_script_importable(weights=os.path.join(self.selected_model_dir, 'weights', 'best.pt'),
-                                     source=self.raw_dir,
-                                     img_size=self.ldv_configs.inference.img_input_size,
-                                     conf_thres=self.ldv_configs.inference.confidence_threshold,
-                                     iou_thres=self.ldv_configs.inference.iou_threshold,
-                                     device=self.ldv_configs.inference.device if torch.cuda.is_available() else '',
-                                     nosave=True,
-                                     save_txt=True,
-                                     save_conf=True,
-                                     project=self.project_dir,
-                                     name=pred_file_name,
-                                     no_trace=True,
-                                     exist_ok=True
-                                    )
-        os.chdir(_cur_dir)
-
-        # saves the XML files of all images detected (even if no preds were made) to the raw_dir
-        detect_raw_conversion_helper(raw_captures_dir=self.raw_dir,
-                                     pred_labels_dir=os.path.join(self.project_dir, pred_file_name, 'labels'),
-                                     class_mapping=class_mapping,
-                                     imgname_to_imgsize=imgname_to_imgsize
-                                    )
-        
-        # moves all XML file + image files from the raw_dir into the detected_dir
-        report_str = detect_raw_moving_helper(raw_captures_dir=self.raw_dir,
-                                              detected_dir=self.detected_dir)
-        
-        # reload/update the current directory in the GUI because some images will almost certainly have moved into the detected folder,
-        # If the last open dir is the detected folder, then it will show up with the images/XMLs now after detecting.  
-        self.import_dir_images(self.last_open_dir)
-        
-        self.statusBar().showMessage(report_str)
+        detected_dir = self.detected_dir
+
+        def detect_raw_done(report_str):
+            # update the file list in place because images will almost certainly have moved into the detected folder (or out of the raw folder),
+            # so an operator verifying in the open dir keeps their place
+            added = []
+            if self.last_open_dir and os.path.abspath(self.last_open_dir) == os.path.abspath(detected_dir):
+                added = [os.path.join(detected_dir, os.path.basename(p)) for p in valid_images]
+            self.update_file_list(added)
+            
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
+
+        # the detection and moving runs on a background thread (see libs/ldv_jobs.py), so the labeling UI stays responsive
+        self.start_LDV_job('Detect Raw Captures',
+                           self._detect_raw_job(self.raw_dir, len(valid_images), keep_loaded=self.ldv_configs.inference.keep_model_loaded),
+                           detect_raw_done)
+
+    def _detect_raw_job(self, source, num_images, keep_loaded):
+        """
+        Returns the LDVJob function for detecting source (the Raw Captures folder, or a list of images in it), writing the
+        XML files next to the images and moving the XML/image pairs into the Detected Captures folder
+        """
+        weights_path = os.path.join(self.selected_model_dir, 'weights', 'best.pt')
+        raw_dir, project_dir, detected_dir = self.raw_dir, self.project_dir, self.detected_dir
+        inference_configs = self.ldv_configs.inference
+
+        def detect_raw_job(job):
+            # runs YOLOv7 detect.py, but the importable function version. 
+            # Most of these args are set in the ldv_configs or dynamically determined before this point
+            pred_file_name = 'predictions'
+            cancelled = False
+            try:
+                detect_script_importable(weights=weights_path,
+                                         source=source,
+                                         img_size=inference_configs.img_input_size,
+                                         conf_thres=inference_configs.confidence_threshold,
+                                         iou_thres=inference_configs.iou_threshold,
+                                         device=inference_configs.device if torch.cuda.is_available() else '',
+                                         nosave=True,
+                                         save_txt=False,
+                                         project=project_dir,
+                                         name=pred_file_name,
+                                         no_trace=True,
+                                         exist_ok=True,
+                                         result_sinks=[VOCResultSink(),  # saves the XML files of all images detected (even if no preds were made) next to them in the raw_dir
+                                                       JobProgressSink(job, total=num_images)],
+                                         keep_loaded=keep_loaded,
+                                         batch_size=inference_configs.batch_size,
+                                         workers=inference_configs.workers,
+                                         root=YOLOV7_DIR_
+                                        )
+            except JobCancelled:
+                cancelled = True  # the images detected so far already have their XML files, so they still get moved below
+
+            # moves all XML file + image files from the raw_dir into the detected_dir
+            job.report('Moving detected captures...')
+            report_str = detect_raw_moving_helper(raw_captures_dir=raw_dir,
+                                                  detected_dir=detected_dir,
+                                                  progress_callback=lambda done, total: job.report('Moving detected captures...', done, total))
+            return ('Detect Raw Captures cancelled. ' if cancelled else '') + report_str
+
+        return detect_raw_job
+
+    def toggle_watch_raw(self, checked=False):
+        """
+        Slottable function responsible for the (checkable) Watch Raw Captures action
+        """
+        if not checked:
+            self.stop_watch_raw()
+        elif not self.start_watch_raw():  # nothing to watch, pop-up has already been shown
+            self.actions.watchRaw.setChecked(False)
+
+    @assert_dirs(['raw_dir', 'project_dir', 'detected_dir', 'trained_models_dir'])
+    def start_watch_raw(self):
+        """
+        Starts watching the Raw Captures folder. New images are detected in small batches with the model kept loaded,
+        and moved into the Detected Captures folder, without needing to click Detect Raw Captures
+        """
+        if self._auto_choose_selected_model_dir() is None: # there are no valid models to automatically choose from, pop-up has already been shown in the function
+            return None
+
+        inference_configs = self.ldv_configs.inference
+        self.raw_watcher = RawCapturesWatcher(self.raw_dir, IMG_FILE_EXTENSIONS_,
+                                              batch_size=inference_configs.watch_batch_size,
+                                              max_wait=inference_configs.watch_max_wait,
+                                              poll_interval=inference_configs.watch_poll_interval,
+                                              parent=self)
+        self.raw_watcher.capturesReady.connect(self.detect_watched_captures)
+        self.raw_watcher.start()
+        self.statusBar().showMessage(f'Watching {self.raw_dir} for new Raw Captures')
         self.statusBar().show()
+        return True
+
+    def stop_watch_raw(self):
+        if self.raw_watcher is not None:
+            self.raw_watcher.stop()
+            self.raw_watcher.deleteLater()
+            self.raw_watcher = None
+            self.statusBar().showMessage('Stopped watching the Raw Captures Folder')
+            self.statusBar().show()
+
+    def detect_watched_captures(self):
+        """
+        Detects the next batch of new raw captures offered by the watcher, unless another LDV action is still running
+        (the watcher then offers the batch again on one of its next scans)
+        """
+        if self.raw_watcher is None or (self.ldv_job is not None and self.ldv_job.isRunning()):
+            return None
+        img_paths = self.raw_watcher.take_ready()
+        if len(img_paths) == 0:
+            return None
+        detected_dir = self.detected_dir
+
+        def detect_watched_done(report_str):
+            # only add the newly detected images to the file list, so an operator verifying in the detected folder keeps their place
+            if self.last_open_dir and os.path.abspath(self.last_open_dir) == os.path.abspath(detected_dir):
+                self.add_images_to_file_list([os.path.join(detected_dir, os.path.basename(p)) for p in img_paths])
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
+
+        watcher = self.raw_watcher
+        job = self.start_LDV_job('Detect Raw Captures (watching)',
+                                 self._detect_raw_job(img_paths, len(img_paths), keep_loaded=True),
+                                 detect_watched_done)
+        if job is not None:
+            # the captures that were not moved into the detected folder are picked up by the next scans again
+            job.failed.connect(lambda _trace: watcher.release(img_paths))
+            job.cancelled.connect(lambda: watcher.release(img_paths))
 
     @assert_dirs(['last_open_dir', 'project_dir', 'training_source_dir'])
     @confirm_if_needed
@@ -987,16 +1098,31 @@ class MainWindow(QMainWindow, WindowMixin):
                 self.show_error_message_box(str(ae))
                 return None
         
-        # use the imported helper util function to do actual Move Verified functionality
-        report_str = move_verified_helper(last_open_dir=self.last_open_dir, 
-                                          training_source_dir=self.training_source_dir,
-                                          optional_verified_dir=self.optional_verified_dir)
-        
-        # reload/update the current directory in the GUI because some verified images will almost certainly have moved     
-        self.import_dir_images(self.last_open_dir)
-        
-        self.statusBar().showMessage(report_str)
-        self.statusBar().show()
+        # use the imported helper util function to do actual Move Verified functionality, on a background thread
+        last_open_dir, training_source_dir, optional_verified_dir = self.last_open_dir, self.training_source_dir, self.optional_verified_dir
+
+        def move_verified_job(job):
+            def progress(message, done, total):
+                job.check_cancelled()  # stops between two image/XML pairs, never halfway through one
+                job.report(message, done, total)
+            return move_verified_helper(last_open_dir=last_open_dir, 
+                                        training_source_dir=training_source_dir,
+                                        optional_verified_dir=optional_verified_dir,
+                                        progress_callback=progress)
+
+        def move_verified_done(report_str):
+            # update the file list in place because some verified images will almost certainly have moved out of the open dir
+            self.update_file_list()
+            
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
+
+        def move_verified_cancelled():
+            self.update_file_list()  # the pairs moved before cancelling are gone from the open dir
+
+        job = self.start_LDV_job('Move Verified Captures', move_verified_job, move_verified_done)
+        if job is not None:
+            job.cancelled.connect(move_verified_cancelled)
 
     @assert_dirs(['project_dir', 'training_source_dir', 'trained_models_dir'])
     @confirm_if_needed
@@ -1004,6 +1130,26 @@ class MainWindow(QMainWindow, WindowMixin):
         """
         Slottable function responsible for Train Model action
         """
+        self._train_model()
+
+    @assert_dirs(['project_dir', 'training_source_dir', 'trained_models_dir'])
+    @confirm_if_needed
+    def finetune_model_func(self, _value=False):
+        """
+        Slottable function responsible for Fine-Tune Model action.
+        Continues training the selected model (its weights/best.pt) on the current training set for a short schedule,
+        oversampling the images moved in by Move Verified Captures since that model was trained
+        """
+        if self._auto_choose_selected_model_dir() is None: # there are no valid models to automatically choose from, pop-up has already been shown in the function
+            return None
+        self._train_model(finetune_model_dir=self.selected_model_dir)
+
+    def _train_model(self, finetune_model_dir=None):
+        """
+        Prepares the YOLO dataset folder and trains a model on it in an LDV job.
+        Trains a new model from the configured pretrained weights, or if finetune_model_dir is given, continues training that model.
+        Classes added since that model was trained get new detection head outputs, the outputs of the known classes are kept
+        """
         # sanity check that training_source_dir is not empty
         files = [item for item in os.listdir(self.training_source_dir) if os.path.isfile(os.path.join(self.training_source_dir, item))] # List all files and subdirectories in the given directory
         if len(files) == 0:
@@ -1014,34 +1160,79 @@ class MainWindow(QMainWindow, WindowMixin):
             msg.exec_()
             return None
        
-        # assumes the temp dataset folder will go into the same folder as the training_source_dir
-        # TODO: could eventually refactor YOLOv7 training code to not NEED to have this structure? Duplicating images temporarily feels bad.
-        temp_YOLO_dataset_folder = os.path.join(self.training_source_dir, 'temp')
-        class_map, data_yaml_filepath = \
-            train_model_file_helper(training_source_folder=self.training_source_dir,
-                                    temp_dataset_folder=temp_YOLO_dataset_folder,
-                                    model_config_yaml_path=os.path.join('yolov7', self.ldv_configs.training.cfg_yaml_filepath)
-            )
+        training_source_dir, trained_models_dir, project_dir = self.training_source_dir, self.trained_models_dir, self.project_dir
+        training_configs = self.ldv_configs.training
+        job_name = 'Fine-Tune Model' if finetune_model_dir else 'Train Model'
+        if finetune_model_dir:
+            # the architecture and anchors come with the weights, so no cfg file
+            weights_path, cfg_path = os.path.join(finetune_model_dir, 'weights', 'best.pt'), ''
+            hyp_path, epochs = training_configs.finetune_hyperparameter_yaml_filepath, training_configs.finetune_epochs
+            run_name = os.path.basename(finetune_model_dir).split('_finetune')[0] + '_finetune'  # fine-tuning a fine-tuned model again only increments the number
+        else:
+            weights_path, cfg_path = training_configs.weights_filepath, training_configs.cfg_yaml_filepath
+            hyp_path, epochs = training_configs.hyperparameter_yaml_filepath, training_configs.epochs
+            run_name = training_configs.yolov7_model_type + '_' + os.path.basename(project_dir)
+
+        def train_model_job(job):
+            # assumes the temp dataset folder will go into the same folder as the training_source_dir
+            # by default the temp folder only holds hardlinks to the training source files, so no image data is duplicated (see dataset_file_mode)
+            job.report('Preparing the YOLO dataset folder...')
+            temp_YOLO_dataset_folder = os.path.join(training_source_dir, 'temp')
+            class_map, data_yaml_filepath = \
+                train_model_file_helper(training_source_folder=training_source_dir,
+                                        temp_dataset_folder=temp_YOLO_dataset_folder,
+                                        model_config_yaml_path=os.path.join(YOLOV7_DIR_, training_configs.cfg_yaml_filepath),
+                                        file_mode=training_configs.dataset_file_mode
+                )
+            job.check_cancelled()
+
+            # training needs all the GPU memory it can get, so let go of the model kept warm for Detect Raw
+            WARM_DETECTION_MODEL.release()
+
+            def epoch_done(epoch, epochs, results):
+                # results are (P, R, mAP@.5, mAP@.5-.95, val losses...) of the last validated epoch. Cancelling validates and saves this epoch, then stops training
+                job.report(f'Epoch {epoch + 1}/{epochs} done. Last validation: P {results[0]:.3f}, R {results[1]:.3f}, mAP@.5 {results[2]:.3f}, mAP@.5:.95 {results[3]:.3f}',
+                           epoch + 1, epochs)
+                return job.is_cancel_requested()
+
+            # the images moved in since the fine-tuned model was trained are the ones it has not seen yet
+            replay_images = recently_moved_images(training_source_dir, since=os.path.getmtime(weights_path)) if finetune_model_dir else None
+            if replay_images:
+                job.report(f'Oversampling {len(replay_images)} images moved in since {os.path.basename(finetune_model_dir)} was trained...')
+
+            # runs YOLOv7 train.py, but the importable function version. 
+            # Most of these args are set in the ldv_configs or dynamically determined before this point
+            job.report(f'Training for {epochs} epochs...', 0, epochs)
+            _resu = train_script_importable(weights=weights_path,
+                                            cfg=cfg_path,
+                                            data=data_yaml_filepath,
+                                            hyp=hyp_path,
+                                            epochs=epochs,
+                                            val_interval=training_configs.val_interval,
+                                            val_dense_epochs=training_configs.val_dense_epochs,
+                                            patience=training_configs.patience,
+                                            remap_head=bool(finetune_model_dir),
+                                            replay_images=replay_images,
+                                            replay_weight=training_configs.replay_weight,
+                                            batch_size=training_configs.batch_size,
+                                            img_size=training_configs.img_input_size,
+                                            adam=training_configs.use_adam,
+                                            workers=training_configs.workers,
+                                            cache_images=training_configs.cache_images,
+                                            project=trained_models_dir,
+                                            name=run_name,
+                                            device=training_configs.device if torch.cuda.is_available() else '',
+                                            model_registry=os.path.join(trained_models_dir, MODEL_REGISTRY_FILENAME_),
+                                            epoch_callback=epoch_done,
+                                            root=YOLOV7_DIR_)   # weights, cfg and hyp file paths are with respect to the yolov7 folder
+            return (f'{job_name} stopped early. ' if job.is_cancel_requested() else '') + f'Training finished, the model was saved in {trained_models_dir}'
+
+        def train_model_done(report_str):
+            # TODO: Add popup box confirming training has ended with some information about the model (where it was stored, final mAP?)
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
 
-        # runs YOLOv7 train.py, but the importable function version. 
-        # Most of these args are set in the ldv_configs or dynamically determined before this point
-        _cur_dir = os.getcwd()   # need to change to internal yolov7 directory for this due to relative pathing issues
-        os.chdir('./yolov7')
-        _resu = train_script_importable(weights=self.ldv_configs.training.weights_filepath,
-                                        cfg=self.ldv_configs.training.cfg_yaml_filepath,
-                                        data=data_yaml_filepath,
-                                        hyp=self.ldv_configs.training.hyperparameter_yaml_filepath,
-                                        epochs=self.ldv_configs.training.epochs,
-                                        batch_size=self.ldv_configs.training.batch_size,
-                                        img_size=self.ldv_configs.training.img_input_size,
-                                        adam=self.ldv_configs.training.use_adam,
-                                        workers=self.ldv_configs.training.workers,
-                                        project=self.trained_models_dir,
-                                        name=self.ldv_configs.training.yolov7_model_type+'_'+os.path.basename(self.project_dir),
-                                        device=self.ldv_configs.training.device if torch.cuda.is_available() else '')
-        os.chdir(_cur_dir)
-
-        # TODO: Add popup box confirming training has ended with some information about the model (where it was stored, final mAP?)
+        self.start_LDV_job(job_name, train_model_job, train_model_done)
 
     @assert_dirs(['project_dir', 'test_set_dir', 'trained_models_dir'])
     @confirm_if_needed
@@ -1069,41 +1260,145 @@ class MainWindow(QMainWindow, WindowMixin):
             msg.exec_()
             return None
 
-        # check the selected_model_dir and choose if not.
-        _auto_choice = self._auto_choose_selected_model_dir()
+        # check the selected_model_dir and choose if not. The test set labels use the classes of the training source, so must the model
+        _auto_choice = self._auto_choose_selected_model_dir(class_names=read_class_names(training_source_data_yaml_path))
         if _auto_choice is None: # there are no valid models to automatically choose from, pop-up has already been shown
             return None
         
-        temp_test_folder = os.path.join(self.test_set_dir, 'temp')  # where the YOLO compatible test set folder structure will be copied to
-        test_set_yaml_path = test_model_file_helper(test_set_folder=self.test_set_dir,
-                                                    temp_test_folder=temp_test_folder,
-                                                    training_source_data_yaml_path=training_source_data_yaml_path
-                                                    )
-
-        # '''
-        _cur_dir = os.getcwd()   # need to change to internal yolov7 directory for this due to relative pathing issues
-        os.chdir('./yolov7')
-        test_script_importable(weights=os.path.join(self.selected_model_dir, 'weights', 'best.pt'),
-                               data=test_set_yaml_path,
-                               batch_size=self.ldv_configs.inference.batch_size,
-                               img_size=self.ldv_configs.inference.img_input_size,
-                               conf_thres=self.ldv_configs.inference.confidence_threshold,
-                               iou_thres=self.ldv_configs.inference.iou_threshold,
-                               task='test',
-                               project=self.selected_model_dir,                       # recall that results are saved in project/name folder
-                               name=os.path.basename(self.test_set_dir)+'_results',   # so here, saved in /model_name/test_set_results folder
-                               save_txt=True,
-                               save_hybrid=True,
-                               save_conf=True,
-                               exist_ok=self.ldv_configs.inference.overwrite_test_set_res,
-                               device=self.ldv_configs.training.device if torch.cuda.is_available() else '',
-                               single_cls=False,
-                               augment=False,
-                               verbose=False,
-                               save_json=False,
-                               no_trace=True)
-        os.chdir(_cur_dir)
-        # '''
+        test_set_dir, selected_model_dir = self.test_set_dir, self.selected_model_dir
+        configs = self.ldv_configs
+
+        def test_model_job(job):
+            job.report('Preparing the YOLO test set folder...')
+            temp_test_folder = os.path.join(test_set_dir, 'temp')  # where the YOLO compatible test set folder structure will be copied to
+            test_set_yaml_path = test_model_file_helper(test_set_folder=test_set_dir,
+                                                        temp_test_folder=temp_test_folder,
+                                                        training_source_data_yaml_path=training_source_data_yaml_path,
+                                                        file_mode=configs.training.dataset_file_mode
+                                                        )
+            job.check_cancelled()
+
+            def batch_done(done, total):
+                job.check_cancelled()
+                job.report(f'Tested batch {done}/{total}', done, total)
+
+            results_dir = os.path.join(selected_model_dir, os.path.basename(test_set_dir)+'_results')
+            test_script_importable(weights=os.path.join(selected_model_dir, 'weights', 'best.pt'),
+                                   data=test_set_yaml_path,
+                                   batch_size=configs.inference.test_batch_size,
+                                   img_size=configs.inference.img_input_size,
+                                   conf_thres=configs.inference.confidence_threshold,
+                                   iou_thres=configs.inference.iou_threshold,
+                                   task='test',
+                                   project=selected_model_dir,                       # recall that results are saved in project/name folder
+                                   name=os.path.basename(test_set_dir)+'_results',   # so here, saved in /model_name/test_set_results folder
+                                   save_txt=True,
+                                   save_hybrid=False,  # hybrid would mix the test set labels into the saved predictions (and their metrics)
+                                   save_conf=True,     # the saved predictions can then be scored again by Re-score Test Results
+                                   exist_ok=configs.inference.overwrite_test_set_res,
+                                   device=configs.training.device if torch.cuda.is_available() else '',
+                                   single_cls=False,
+                                   augment=False,
+                                   verbose=False,
+                                   save_json=False,
+                                   no_trace=True,
+                                   progress_callback=batch_done,
+                                   root=YOLOV7_DIR_)
+            return f'Test Model finished, results saved in {results_dir}'
+
+        def test_model_done(report_str):
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
+
+        self.start_LDV_job('Test Model', test_model_job, test_model_done)
+
+    @assert_dirs(['project_dir', 'test_set_dir', 'trained_models_dir'])
+    def rescore_test_func(self, _value=False):
+        """
+        Slottable function responsible for Re-score Test Results action
+        Scores the predictions saved by the last Test Model run of the selected model again, with the confidence and IOU
+        thresholds of the config file, without running the model. The saved boxes already passed the confidence threshold and NMS
+        of Test Model, so only a higher confidence threshold or a lower IOU threshold than the ones Test Model used changes them
+        """
+        test_set_dir = self.test_set_dir
+        test_set_yaml_path = os.path.join(test_set_dir, 'temp', 'test_set_info.yaml')  # class names of the last tested model
+        test_class_names = read_class_names(test_set_yaml_path) if os.path.exists(test_set_yaml_path) else None
+
+        # check the selected_model_dir and choose if not, among the models trained on the classes of the saved predictions
+        _auto_choice = self._auto_choose_selected_model_dir(class_names=test_class_names)
+        if _auto_choice is None: # there are no valid models to automatically choose from, pop-up has already been shown
+            return None
+
+        selected_model_dir = self.selected_model_dir
+        results_dir = os.path.join(selected_model_dir, os.path.basename(test_set_dir)+'_results')
+        if not os.path.isdir(os.path.join(results_dir, 'labels')) or test_class_names is None:
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Warning)
+            msg.setText(f"No saved Test Model predictions found for the selected model ({selected_model_dir}). Please run Test Model first.")
+            msg.setWindowTitle("No Test Results Found")
+            msg.exec_()
+            return None
+
+        # test_set_info.yaml is written by every Test Model run, the last one may have tested a model trained on other classes
+        model_class_names = model_registry_class_names(self.trained_models_dir, os.path.basename(selected_model_dir))
+        if model_class_names is not None and list(model_class_names) != list(test_class_names):
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Warning)
+            msg.setText(f"The classes of the selected model ({selected_model_dir}) do not match the classes of the last Test Model run. Please run Test Model with the selected model first.")
+            msg.setWindowTitle("Test Results Of Other Classes")
+            msg.exec_()
+            return None
+
+        configs = self.ldv_configs
+
+        def rescore_test_job(job):
+            job.report('Reading the test set XML files...')
+            targets, class_names = read_test_set_targets(test_set_dir, test_set_yaml_path)
+            job.check_cancelled()
+
+            job.report('Scoring the saved predictions...')
+            conf_thres, iou_thres = configs.inference.confidence_threshold, configs.inference.iou_threshold
+            (mp, mr, map50, map), _maps, _confusion_matrix = test_saved_predictions(pred_dir=os.path.join(results_dir, 'labels'),
+                                                                                   targets=targets,
+                                                                                   names=class_names,
+                                                                                   conf_thres=conf_thres,
+                                                                                   iou_thres=iou_thres,
+                                                                                   save_dir=os.path.join(results_dir, 'rescored'))
+            return (f'Test results at confidence {conf_thres} and IOU {iou_thres}: P {mp:.3f}, R {mr:.3f}, '
+                    f'mAP@.5 {map50:.3f}, mAP@.5:.95 {map:.3f} (plots in {os.path.join(results_dir, "rescored")})')
+
+        def rescore_test_done(report_str):
+            self.statusBar().showMessage(report_str)
+            self.statusBar().show()
+
+        self.start_LDV_job('Re-score Test Results', rescore_test_job, rescore_test_done)
+
+    def start_LDV_job(self, name, func, on_success=None):
+        """
+        Runs func(job) of an LDV action on a background thread (see libs/ldv_jobs.py), with its progress shown in the job dock.
+        on_success(result) is called on the GUI thread with the return value of func. Only one LDV action runs at a time.
+        Returns the started job, or None if another LDV action is still running
+        """
+        if self.ldv_job is not None and self.ldv_job.isRunning():
+            self.show_error_message_box(f"{self.ldv_job.name} is still running. Please wait for it to finish, or cancel it, before starting another LDV Action.")
+            return None
+
+        job = LDVJob(name, func, parent=self)
+        if on_success is not None:
+            job.succeeded.connect(on_success)
+        job.failed.connect(lambda trace: self.show_error_message_box(f"{name} failed with the following error:\n\n{trace}"))
+        job.cancelled.connect(lambda: self.statusBar().showMessage(f'{name} cancelled'))
+
+        def job_ended(*_args):
+            if self.ldv_job is job:
+                self.ldv_job = None
+        for signal in (job.succeeded, job.failed, job.cancelled):
+            signal.connect(job_ended)
+        job.finished.connect(job.deleteLater)  # the thread object and its connections go away once its last signal is handled
+        self.job_dock.attach(job)
+        self.ldv_job = job
+        job.start()
+        return job
 
     # ----- END LDV MainWindow Functions added ------ #
 
@@ -1331,8 +1626,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.update_combo_box()
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def file_item_double_clicked(self, item=None):
-        self.cur_img_idx = self.m_img_list.index(ustr(item.text()))
+    def file_item_double_clicked(self, index=None):
+        self.cur_img_idx = index.row()
         filename = self.m_img_list[self.cur_img_idx]
         if filename:
             self.load_file(filename)
@@ -1672,13 +1967,12 @@ class MainWindow(QMainWindow, WindowMixin):
         unicode_file_path = os.path.abspath(unicode_file_path)
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
-        if unicode_file_path and self.file_list_widget.count() > 0:
-            if unicode_file_path in self.m_img_list:
-                index = self.m_img_list.index(unicode_file_path)
-                file_widget_item = self.file_list_widget.item(index)
-                file_widget_item.setSelected(True)
+        if unicode_file_path and len(self.m_img_list) > 0:
+            row = self.m_img_list.row_of(unicode_file_path)
+            if row >= 0:
+                self.file_list_view.setCurrentIndex(self.m_img_list.index(row))
             else:
-                self.file_list_widget.clear()
+                self.stop_image_scan()
                 self.m_img_list.clear()
 
         if unicode_file_path and os.path.exists(unicode_file_path):
@@ -1700,7 +1994,7 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 # Load image:
                 # read data first and store for saving into label file.
-                self.image_data = read(unicode_file_path, None)
+                self.image_data = self.prefetcher.image(unicode_file_path)
                 self.label_file = None
                 self.canvas.verified = False
 
@@ -1726,6 +2020,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.add_recent_file(self.file_path)
             self.toggle_actions(True)
             self.show_bounding_box_from_annotation_file(self.file_path)
+            if self.file_path in self.m_img_list:
+                self.prefetcher.prefetch(self.m_img_list, self.m_img_list.row_of(self.file_path), self.xml_path_for_image)
 
             counter = self.counter_str()
             self.setWindowTitle(__appname__ + ' ' + file_path + ' ' + counter)
@@ -1745,6 +2041,13 @@ class MainWindow(QMainWindow, WindowMixin):
         """
         return '[{} / {}]'.format(self.cur_img_idx + 1, self.img_count)
 
+    def xml_path_for_image(self, file_path):
+        """ PASCAL VOC annotation file that would be loaded together with an image """
+        if self.default_save_dir is not None:
+            basename = os.path.basename(os.path.splitext(str(file_path))[0])
+            return os.path.join(self.default_save_dir, basename + XML_EXT)
+        return os.path.splitext(file_path)[0] + XML_EXT
+
     def show_bounding_box_from_annotation_file(self, file_path):
         if self.default_save_dir is not None:
             basename = os.path.basename(os.path.splitext(str(file_path))[0])
@@ -1813,6 +2116,17 @@ class MainWindow(QMainWindow, WindowMixin):
     def closeEvent(self, event):
         if not self.may_continue():
             event.ignore()
+            return  # the window stays open, so the watcher, prefetcher and running LDV action keep going
+        self.stop_watch_raw()
+        if self.image_scan is not None:
+            self.image_scan.stop()
+            self.image_scan.wait()
+        self.prefetcher.clear()
+        self.prefetcher.pool.waitForDone()
+        if self.ldv_job is not None and self.ldv_job.isRunning():
+            # let the running LDV action stop at its next safe point (training stops after the current epoch, keeping its weights)
+            self.ldv_job.cancel()
+            self.ldv_job.wait()
         settings = self.settings
         # If it loads images from dir, don't load it at the beginning
         if self.dir_name is None:
@@ -1858,18 +2172,45 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.may_continue():
             self.load_file(filename)
 
-    def scan_all_images(self, folder_path):
-        extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
-        images = []
+    def image_extensions(self):
+        return ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
+
+    def start_image_scan(self, folder_path):
+        """ Fills the file list with the images under folder_path from a background scan, showing the first one right away """
+        self.stop_image_scan()
+        self.image_scan = ImageScanThread(folder_path, self.image_extensions(), self)
+        self.image_scan.found.connect(self.images_found)
+        self.image_scan.scanned.connect(self.images_scanned)
+        self.image_scan.finished.connect(self.image_scan.deleteLater)
+        self.image_scan.start()
+
+    def stop_image_scan(self):
+        if self.image_scan is not None:
+            self.image_scan.stop()
+            self.image_scan = None  # results it still sends are ignored, it deletes itself once finished
+
+    def images_found(self, img_paths):
+        if self.sender() is not self.image_scan:
+            return
+        self.m_img_list.extend(img_paths)
+        self.img_count = len(self.m_img_list)
+        if self.file_path is None:
+            self.open_next_image()
 
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relative_path = os.path.join(root, file)
-                    path = ustr(os.path.abspath(relative_path))
-                    images.append(path)
-        natural_sort(images, key=lambda x: x.lower())
-        return images
+    def images_scanned(self, img_paths):
+        if self.sender() is not self.image_scan:
+            return
+        self.image_scan = None
+        # folders arrive in about the right order already, only reorder when the complete natural sort differs
+        if img_paths != self.m_img_list.paths[:len(img_paths)]:
+            scanned = set(img_paths)
+            added_meanwhile = [path for path in self.m_img_list if path not in scanned]  # e.g. by Watch Raw Captures
+            self.m_img_list.set_paths(img_paths + added_meanwhile)
+            self.img_count = len(self.m_img_list)
+            if self.file_path in self.m_img_list:
+                self.cur_img_idx = self.m_img_list.row_of(self.file_path)
+                self.file_list_view.setCurrentIndex(self.m_img_list.index(self.cur_img_idx))
+        self.status('Found %d images in %s' % (len(img_paths), self.dir_name))
 
     def change_save_dir_dialog(self, _value=False):
         if self.default_save_dir is not None:
@@ -1949,13 +2290,37 @@ class MainWindow(QMainWindow, WindowMixin):
         self.last_open_dir = dir_path
         self.dir_name = dir_path
         self.file_path = None
-        self.file_list_widget.clear()
-        self.m_img_list = self.scan_all_images(dir_path)
+        self.prefetcher.clear()
+        self.m_img_list.clear()
+        self.img_count = 0
+        self.start_image_scan(dir_path)
+
+    def add_images_to_file_list(self, img_paths):
+        """ Appends images to the file list of the open dir, without changing the currently shown image """
+        self.m_img_list.extend([ustr(os.path.abspath(img_path)) for img_path in img_paths if os.path.exists(img_path)])
         self.img_count = len(self.m_img_list)
-        self.open_next_image()
-        for imgPath in self.m_img_list:
-            item = QListWidgetItem(imgPath)
-            self.file_list_widget.addItem(item)
+
+    def update_file_list(self, added_img_paths=()):
+        """
+        Updates the file list of the open dir in place after an LDV action moved images out of (or into) it, without rescanning
+        the folder, so an operator verifying there keeps their place. The current image stays selected. If it was moved away
+        itself, the image that took its place in the list is opened
+        """
+        old_paths = self.m_img_list.paths
+        old_row = self.m_img_list.row_of(self.file_path) if self.file_path else -1
+        gone = {path for path in old_paths if not os.path.exists(path)}
+        if gone:
+            kept_before = sum(1 for path in old_paths[:old_row] if path not in gone) if old_row >= 0 else 0
+            self.prefetcher.clear()
+            self.m_img_list.set_paths([path for path in old_paths if path not in gone])
+        self.add_images_to_file_list(added_img_paths)
+
+        if self.file_path in self.m_img_list:
+            self.cur_img_idx = self.m_img_list.row_of(self.file_path)
+            self.file_list_view.setCurrentIndex(self.m_img_list.index(self.cur_img_idx))
+        elif old_row >= 0 and gone and self.img_count > 0 and not self.dirty:
+            self.cur_img_idx = min(kept_before, self.img_count - 1)
+            self.load_file(self.m_img_list[self.cur_img_idx])
 
     def verify_image(self, _value=False):
         # Proceeding next image without dialog if having any label
@@ -2103,7 +2468,9 @@ class MainWindow(QMainWindow, WindowMixin):
             idx = self.cur_img_idx
             if os.path.exists(delete_path):
                 os.remove(delete_path)
-            self.import_dir_images(self.last_open_dir)
+            self.m_img_list.remove(delete_path)
+            self.img_count = len(self.m_img_list)
+            self.file_path = None
             if self.img_count > 0:
                 self.cur_img_idx = min(idx, self.img_count - 1)
                 filename = self.m_img_list[self.cur_img_idx]
@@ -2205,7 +2572,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self.set_format(FORMAT_PASCALVOC)
 
-        t_voc_parse_reader = PascalVocReader(xml_path)
+        t_voc_parse_reader = self.prefetcher.pascal_voc_reader(xml_path)
         shapes = t_voc_parse_reader.get_shapes()
         self.load_labels(shapes)
         self.canvas.verified = t_voc_parse_reader.verified
@@ -2237,7 +2604,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.canvas.verified = create_ml_parse_reader.verified
 
     def copy_previous_bounding_boxes(self):
-        current_index = self.m_img_list.index(self.file_path)
+        current_index = self.m_img_list.row_of(self.file_path)
         if current_index - 1 >= 0:
             prev_file_path = self.m_img_list[current_index - 1]
             self.show_bounding_box_from_annotation_file(prev_file_path)
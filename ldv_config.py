@@ -13,17 +13,25 @@ class Training:
 
     # ---- Generally these can and should be changed ---- #
     epochs: int = 400       # total number of epochs to train for. If you don't like performance, try to train longer, or label more high quality data for low performance classes
+    patience: int = 100      # stop training once the validation fitness (mostly mAP@.5:.95) has not improved for this many epochs, so training time follows convergence. 0 always trains all epochs
+    val_interval: int = 5    # validate (and possibly save a new best.pt) every this many epochs. Validation can take as long as a training epoch, so this saves a lot of GPU time
+    val_dense_epochs: int = 20   # validate every one of the last this many epochs, where the best model is most likely found
+    finetune_epochs: int = 30    # Fine-Tune Model: epochs to continue training the selected model for. It starts from trained weights, so far fewer epochs are needed than training from scratch
+    replay_weight: float = 3.0   # Fine-Tune Model: how much more often the images moved in by Move Verified Captures since the selected model was trained are sampled than the rest of the training set
     batch_size: int = 4      # should be lowered if you hit out of memory errors. Generally works best with a factor of 2 (1,2,4,8,16,32,64 are all good if you have the memory)
     img_input_size: List[int] =  field(init=False)  # PLEASE SEE __post_init__ BELOW for setting this configuration
     yolov7_model_type: str = 'yolov7x'   # default will be yolov7x, other options are yolov7, yolov7-tiny, yolov7-e6e. But MUST download the corresponding weights files
 
     # ---- Generally Don't Touch These ---- #
     weights_filepath: str = str(Path(yolov7_model_type+'_training.pt'))  # expects, from initial setup, to have the pre-trained weights in the home folder of yolov7 
-    cfg_yaml_filepath: str = str(Path('cfg', 'training', yolov7_model_type+'.yaml'))  # note that these file paths are with respect to the yolov7 folder, because we change dir in the code
+    cfg_yaml_filepath: str = str(Path('cfg', 'training', yolov7_model_type+'.yaml'))  # note that these file paths are with respect to the yolov7 folder, they are resolved against it (the root argument of the YOLOv7 entry points)
     hyperparameter_yaml_filepath: str = str(Path('data', 'hyp.scratch.custom.yaml')) # further hyperparameters (like data augmentation) are stored in this YAML file
+    finetune_hyperparameter_yaml_filepath: str = str(Path('data', 'hyp.finetune.custom.yaml'))  # hyperparameters used by Fine-Tune Model, a lower learning rate and shorter warmup than from scratch
     use_adam = True              # use the Adam optimizer, because duh
     device: str = '0'            # defaults to trying to use a single GPU, but will fall back to CPU via the YOLOv7 code if not available
     workers: int = batch_size    # number of workers for data loaders. Lower this to 1 or 0 if any weird dataloader/workers error shows up. 
+    dataset_file_mode: str = 'hardlink'  # how images show up in the temp YOLO dataset folders. 'hardlink' or 'symlink' only touch file metadata (no image data duplicated), 'copy' duplicates every file. Links fall back to copying when the file system can't make them
+    cache_images = False         # False, 'ram' or 'mmap'. 'mmap' keeps every resized image in one memory-mapped file next to the temp dataset (about img_input_size^2 * 3 bytes per image on disk), shared by all workers and reused between trainings, so images are not decoded again every epoch
 
     def __post_init__(self):
         self.img_input_size = [1280, 1280] # during training, images will be automatically resized to the square (X,X) with padding
@@ -40,7 +48,13 @@ class Inference:
     confidence_threshold: float = 0.3     # any bounding boxes whose confidence score is below this will NOT be considered a detected object. [0-1]. Lower values produces more "guesses". Higher values produces fewer, more confident boxes.
     iou_threshold: float = 0.45           # any additional bounding boxes predicting the same class with an IOU OVER this threshold will be thrown out (except 1) due to assumption they are the same instance of that class
     device: str = '0'                     # defaults to trying to use a single GPU, but will fall back to CPU via the YOLOv7 code if not available
-    batch_size: int = 1                   # during inference batch size does not really matter, so we set at 1
+    batch_size: int = 4                   # number of images run through the model at once during Detect Raw. Images are decoded on a thread pool and grouped by padded shape, so larger batches mostly help throughput (lower this if you hit out of memory errors)
+    workers: int = 4                      # number of threads decoding and resizing images ahead of the model when batch_size is above 1
+    test_batch_size: int = 1              # number of images run through the model at once during Test Model (kept apart from batch_size, so raising the Detect Raw batch does not change test runs)
+    watch_batch_size: int = 8             # Watch Raw Captures mode: number of new raw captures that get detected together right away
+    watch_max_wait: float = 5.0           # Watch Raw Captures mode: seconds a new raw capture waits for more captures before it is detected anyway
+    watch_poll_interval: float = 1.0      # Watch Raw Captures mode: seconds between two scans of the Raw Captures Folder (new files are usually noticed immediately, this is the fallback)
+    keep_model_loaded: bool = True        # if True, the Detect Raw action keeps the selected model loaded and warmed up between clicks, only reloading when the selected model (or its best.pt file) changes
     overwrite_test_set_res: bool = True   # if True, during the Test Model action, will overwrite the test results folder created inside the selected model folder. IE, only keep the last run test set for each model
 
     def to_dict(self):
@@ -21,6 +21,60 @@ CURSOR_GRAB = Qt.OpenHandCursor
 # class Canvas(QGLWidget):
 
 
+class PixmapPyramid(object):
+    """
+    Half-size copies (mipmaps) of the canvas image, so a zoomed out 8K image is drawn from a pixmap close to the
+    size it is shown at instead of being downscaled from full resolution on every repaint.
+    Levels are made the first time a zoom level needs them. The brightness overlay is composited onto a level once
+    and reused until the overlay color (or the image) changes.
+    """
+    MIN_LEVEL_SIZE = 64  # smallest side of the smallest level
+
+    def __init__(self, pixmap=None):
+        self.set_pixmap(pixmap)
+
+    def set_pixmap(self, pixmap):
+        self.pixmap = pixmap
+        self.levels = [pixmap]  # levels[k] is the image at 1 / 2**k of its size
+        self.overlaid = {}      # k -> levels[k] with the overlay color applied
+        self.overlay_rgba = None
+
+    def level_for_scale(self, scale):
+        """ Smallest level that still has at least one image pixel per screen pixel at this scale """
+        level = 0
+        size = min(self.pixmap.width(), self.pixmap.height())
+        while scale * 2 ** (level + 1) <= 1 and size / 2 ** (level + 1) >= self.MIN_LEVEL_SIZE:
+            level += 1
+        return level
+
+    def level_pixmap(self, level):
+        while len(self.levels) <= level:
+            previous = self.levels[-1]
+            self.levels.append(previous.scaled(max(previous.width() // 2, 1), max(previous.height() // 2, 1),
+                                               Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        return self.levels[level]
+
+    def get(self, scale, overlay_color=None):
+        """ Returns the pixmap to draw at this scale, with the overlay color composited onto it """
+        level = self.level_for_scale(scale)
+        pixmap = self.level_pixmap(level)
+        if not overlay_color:
+            return pixmap
+
+        rgba = overlay_color.getRgb()
+        if rgba != self.overlay_rgba:
+            self.overlaid = {}
+            self.overlay_rgba = rgba
+        if level not in self.overlaid:
+            temp = QPixmap(pixmap)
+            painter = QPainter(temp)
+            painter.setCompositionMode(painter.CompositionMode_Overlay)
+            painter.fillRect(temp.rect(), overlay_color)
+            painter.end()
+            self.overlaid[level] = temp
+        return self.overlaid[level]
+
+
 class Canvas(QWidget):
     zoomRequest = pyqtSignal(int)
     lightRequest = pyqtSignal(int)
@@ -51,6 +105,7 @@ class Canvas(QWidget):
         self.overlay_color = None
         self.label_font_size = 8
         self.pixmap = QPixmap()
+        self.pixmap_pyramid = PixmapPyramid(self.pixmap)
         self.visible = {}
         self._hide_background = False
         self.hide_background = False
@@ -505,15 +560,19 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        temp = self.pixmap
-        if self.overlay_color:
-            temp = QPixmap(self.pixmap)
-            painter = QPainter(temp)
-            painter.setCompositionMode(painter.CompositionMode_Overlay)
-            painter.fillRect(temp.rect(), self.overlay_color)
-            painter.end()
-
-        p.drawPixmap(0, 0, temp)
+        if self.pixmap_pyramid.pixmap is not self.pixmap:
+            self.pixmap_pyramid.set_pixmap(self.pixmap)
+        temp = self.pixmap_pyramid.get(self.scale, self.overlay_color)
+
+        # only draw the part of the image inside the exposed (visible) area, in image coordinates
+        exposed = QRectF(event.rect())
+        target = QRectF(self.transform_pos(exposed.topLeft()), self.transform_pos(exposed.bottomRight()))
+        target = target.adjusted(-1, -1, 1, 1).intersected(QRectF(self.pixmap.rect()))
+        if not target.isEmpty():
+            sx = temp.width() / self.pixmap.width()
+            sy = temp.height() / self.pixmap.height()
+            source = QRectF(target.x() * sx, target.y() * sy, target.width() * sx, target.height() * sy)
+            p.drawPixmap(target, temp, source)
         Shape.scale = self.scale
         Shape.label_font_size = self.label_font_size
         for shape in self.shapes:
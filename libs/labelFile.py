@@ -13,6 +13,7 @@ from libs.create_ml_io import CreateMLWriter
 from libs.pascal_voc_io import PascalVocWriter
 from libs.pascal_voc_io import XML_EXT
 from libs.yolo_io import YOLOWriter
+from libs.ldv_annotation_cache import record_verified_status
 
 
 class LabelFileFormat(Enum):
@@ -79,6 +80,7 @@ class LabelFile(object):
             writer.add_bnd_box(bnd_box[0], bnd_box[1], bnd_box[2], bnd_box[3], label, difficult)
 
         writer.save(target_file=filename)
+        record_verified_status(filename, self.verified)
         return
 
     def save_yolo_format(self, filename, shapes, image_path, image_data, class_list,
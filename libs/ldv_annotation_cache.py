@@ -0,0 +1,179 @@
+import os
+import json
+import sqlite3
+from xml.etree import ElementTree as ET
+
+ANNOTATION_CACHE_FILENAME_ = '.ldv_annotation_cache.sqlite'  # lives inside the folder whose XML files it describes
+_SCHEMA_VERSION = 2  # bump whenever the stored record layout changes, the old cache is then simply rebuilt
+
+
+def parse_voc_xml(xml_path):
+    """
+    Parses a PASCAL VOC XML file into a plain dict record
+
+    Returns:
+    - record (dict): {'filename': str, 'width': int, 'height': int, 'depth': int, 'verified': bool,
+                      'objects': [[class_name, xmin, ymin, xmax, ymax, difficult], ...]}
+    """
+    root = ET.parse(xml_path).getroot()
+
+    size = root.find('size')
+    filename = root.find('filename')
+    objects = []
+    for obj in root.findall('object'):
+        bbox = obj.find('bndbox')
+        difficult = obj.find('difficult')
+        objects.append([obj.find('name').text,
+                        float(bbox.find('xmin').text),
+                        float(bbox.find('ymin').text),
+                        float(bbox.find('xmax').text),
+                        float(bbox.find('ymax').text),
+                        int(difficult.text) if difficult is not None else 0])
+
+    return {'filename': filename.text if filename is not None else None,
+            'width': int(size.find('width').text),
+            'height': int(size.find('height').text),
+            'depth': int(size.find('depth').text),
+            'verified': root.attrib.get('verified') == 'yes',
+            'objects': objects}
+
+
+def read_verified_flag(xml_path, chunk_size=1024):
+    """
+    Reads the 'verified' attribute of a PASCAL VOC file's root tag, without parsing (or reading) the rest of the file
+    """
+    parser = ET.XMLPullParser(events=('start',))
+    with open(xml_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            parser.feed(chunk)
+            for _event, element in parser.read_events():  # the first start event is the root tag
+                return element.attrib.get('verified') == 'yes'
+    return False
+
+
+def record_verified_status(xml_path, verified):
+    """
+    Updates the verified status index of the folder xml_path was just saved into, so Move Verified does not have to
+    read the file again. Folders without an AnnotationCache are left alone, their index is built the first time it is needed
+    """
+    folder = os.path.dirname(os.path.abspath(xml_path))
+    if not os.path.exists(os.path.join(folder, ANNOTATION_CACHE_FILENAME_)):
+        return
+    try:
+        with AnnotationCache(folder, timeout=0.1) as cache:  # never hold up saving in the GUI
+            cache.set_verified(xml_path, verified)
+    except sqlite3.Error:
+        pass  # e.g. locked by a running Move Verified, the changed mtime makes the index re-read the file anyway
+
+
+class AnnotationCache(object):
+    """
+    Persistent cache of parsed PASCAL VOC XML files for a single (flat) folder, stored as a SQLite file inside that folder.
+    Each record is keyed by the XML file name and is only trusted while the file's mtime and size are unchanged,
+    so re-running on an unchanged folder costs one os.stat per file instead of a full XML parse.
+
+    Next to the full records it keeps a lighter verified status index (is_verified), filled by reading only the root tag.
+
+    Paths handed to get() only use their file name, so the linked/copied XML files in a temp YOLO dataset
+    folder resolve to the record (and freshness check) of the original file in the cached folder.
+    """
+
+    def __init__(self, folder, cache_filename=ANNOTATION_CACHE_FILENAME_, timeout=5.0):
+        self.folder = folder
+        self.path = os.path.join(folder, cache_filename)
+        self.num_parsed = 0  # number of XML files (re)parsed during this session, handy for reporting
+        self.conn = sqlite3.connect(self.path, timeout=timeout)  # timeout: seconds to wait while another connection writes
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS annotations')
+            self.conn.execute('DROP TABLE IF EXISTS verified_status')
+            self.conn.execute('PRAGMA user_version = %d' % _SCHEMA_VERSION)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS annotations ('
+                          'name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, filename TEXT, '
+                          'width INTEGER, height INTEGER, depth INTEGER, verified INTEGER, objects TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS verified_status ('
+                          'name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, verified INTEGER)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get(self, xml_path):
+        """
+        Returns the parsed record (see parse_voc_xml) for xml_path, reparsing only if the file was added or changed
+        """
+        name = os.path.basename(xml_path)
+        source_path = os.path.join(self.folder, name)
+        if not os.path.exists(source_path):  # not part of the cached folder, nothing to validate against
+            return parse_voc_xml(xml_path)
+
+        stat = os.stat(source_path)
+        row = self.conn.execute('SELECT mtime_ns, size, filename, width, height, depth, verified, objects '
+                                'FROM annotations WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return {'filename': row[2], 'width': row[3], 'height': row[4], 'depth': row[5],
+                    'verified': bool(row[6]), 'objects': json.loads(row[7])}
+
+        record = parse_voc_xml(source_path)
+        self.num_parsed += 1
+        self.conn.execute('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                          (name, stat.st_mtime_ns, stat.st_size, record['filename'], record['width'], record['height'],
+                           record['depth'], int(record['verified']), json.dumps(record['objects'])))
+        return record
+
+    def is_verified(self, xml_path, stat=None):
+        """
+        Returns whether xml_path (a file in the cached folder) is verified, re-reading its root tag only if it was added or changed
+
+        Args:
+        - xml_path (str): path of the XML file
+        - stat (os.stat_result, optional): stat of the file if the caller already has it (e.g. from os.scandir)
+        """
+        name = os.path.basename(xml_path)
+        source_path = os.path.join(self.folder, name)
+        stat = stat or os.stat(source_path)
+        row = self.conn.execute('SELECT mtime_ns, size, verified FROM verified_status WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return bool(row[2])
+
+        verified = read_verified_flag(source_path)
+        self.num_parsed += 1
+        self.set_verified(source_path, verified, stat)
+        return verified
+
+    def set_verified(self, xml_path, verified, stat=None):
+        """
+        Records the verified status of xml_path as it is on disk right now
+        """
+        name = os.path.basename(xml_path)
+        stat = stat or os.stat(os.path.join(self.folder, name))
+        self.conn.execute('INSERT OR REPLACE INTO verified_status VALUES (?, ?, ?, ?)',
+                          (name, stat.st_mtime_ns, stat.st_size, int(verified)))
+
+    def forget(self, xml_paths):
+        """
+        Drops the records of XML files that were moved out of the folder
+        """
+        names = [(os.path.basename(xml_path),) for xml_path in xml_paths]
+        self.conn.executemany('DELETE FROM annotations WHERE name = ?', names)
+        self.conn.executemany('DELETE FROM verified_status WHERE name = ?', names)
+
+    def prune(self):
+        """
+        Drops the records of XML files that no longer exist in the folder (moved or deleted)
+        """
+        names = [row[0] for row in self.conn.execute('SELECT name FROM annotations')]
+        missing = [(name,) for name in names if not os.path.exists(os.path.join(self.folder, name))]
+        self.conn.executemany('DELETE FROM annotations WHERE name = ?', missing)
+        status_names = [row[0] for row in self.conn.execute('SELECT name FROM verified_status')]
+        self.conn.executemany('DELETE FROM verified_status WHERE name = ?',
+                              [(name,) for name in status_names if not os.path.exists(os.path.join(self.folder, name))])
+        return len(missing)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,130 @@
+import os
+import threading
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.utils import natural_sort
+
+
+def sort_image_paths(paths):
+    natural_sort(paths, key=lambda x: x.lower())
+    return paths
+
+
+class ImageListModel(QAbstractListModel):
+    """
+    Model behind the File List dock. The view only asks for the rows it shows, so no per-image widget item is made,
+    and path -> row lookups go through a dict instead of searching the list.
+    It also behaves like the plain list of image paths it replaced (len, [row], in, iteration).
+    """
+
+    def __init__(self, parent=None):
+        super(ImageListModel, self).__init__(parent)
+        self.paths = []
+        self.rows = {}  # path -> row
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.paths[index.row()]
+        return None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, row):
+        return self.paths[row]
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __contains__(self, path):
+        return path in self.rows
+
+    def row_of(self, path):
+        """ Row of path, or -1 if it is not in the list """
+        return self.rows.get(path, -1)
+
+    def extend(self, paths):
+        """ Appends the paths that are not in the list yet """
+        new_paths = []
+        for path in paths:
+            if path not in self.rows:
+                self.rows[path] = len(self.paths) + len(new_paths)
+                new_paths.append(path)
+        if new_paths:
+            self.beginInsertRows(QModelIndex(), len(self.paths), len(self.paths) + len(new_paths) - 1)
+            self.paths.extend(new_paths)
+            self.endInsertRows()
+
+    def remove(self, path):
+        row = self.rows.get(path)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.paths[row]
+        del self.rows[path]
+        for later_row in range(row, len(self.paths)):
+            self.rows[self.paths[later_row]] = later_row
+        self.endRemoveRows()
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = list(paths)
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self.endResetModel()
+
+    def clear(self):
+        self.set_paths([])
+
+
+class ImageScanThread(QThread):
+    """
+    Lists the images under a folder (subfolders included) off the GUI thread.
+    Each folder's images are sent through found as soon as that folder is listed, so the first images can be shown
+    right away. scanned then gets the complete list, natural sorted, unless the scan was stopped.
+    """
+    found = pyqtSignal(list)
+    scanned = pyqtSignal(list)
+
+    def __init__(self, folder, extensions, parent=None):
+        super(ImageScanThread, self).__init__(parent)
+        self.folder = os.path.abspath(folder)
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        images = []
+        folders = [self.folder]
+        while folders:
+            if self._stop_event.is_set():
+                return
+            folder = folders.pop()
+            files, subfolders = [], []
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            if not entry.is_symlink():  # like os.walk, don't follow symlinked folders
+                                subfolders.append(entry.path)
+                        elif entry.name.lower().endswith(self.extensions):
+                            files.append(entry.path)
+            except OSError:
+                continue
+            if files:
+                self.found.emit(sort_image_paths(files))
+                images.extend(files)
+            # depth first in natural order, so the folders arrive roughly in their final order
+            folders.extend(reversed(sort_image_paths(subfolders)))
+        self.scanned.emit(sort_image_paths(images))
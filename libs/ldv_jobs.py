@@ -0,0 +1,140 @@
+import os
+import threading
+import traceback
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+class JobCancelled(Exception):
+    """ Raised inside a running job once its cancellation has been requested """
+
+
+class LDVJob(QThread):
+    """
+    Runs one LDV action (Detect Raw, Move Verified, Train Model, Test Model) off the GUI thread.
+    The action is a plain function taking this job as its only argument. It reports progress with job.report(...)
+    and calls job.check_cancelled() at safe points, which raises JobCancelled once the user pressed Cancel.
+    The job function must not touch any widget; everything GUI related happens in the slots connected to the signals,
+    which Qt runs on the GUI thread.
+    """
+    progress = pyqtSignal(str, int, int)  # message, done, total (total of 0 means unknown)
+    succeeded = pyqtSignal(object)        # return value of the job function
+    failed = pyqtSignal(str)              # formatted traceback
+    cancelled = pyqtSignal()
+
+    def __init__(self, name, func, parent=None):
+        super(LDVJob, self).__init__(parent)
+        self.name = name
+        self.func = func
+        self._cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = self.func(self)
+        except JobCancelled:
+            self.cancelled.emit()
+        except Exception:
+            self.failed.emit(traceback.format_exc())
+        else:
+            self.succeeded.emit(result)
+
+    def report(self, message, done=0, total=0):
+        self.progress.emit(message, done, total)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+
+class JobProgressSink(object):
+    """
+    Detection result sink (see ResultSink in yolov7/detect.py) that reports per-image progress of a job
+    and stops the detection as soon as the job is cancelled
+    """
+
+    def __init__(self, job, total=0):
+        self.job = job
+        self.total = total
+        self.done = 0
+
+    def write(self, path, im0, det, names, frame=None):
+        self.job.check_cancelled()
+        self.done += 1
+        self.job.report(f'Detected {len(det)} objects in {os.path.basename(path)}', self.done, self.total)
+
+    def close(self):
+        pass
+
+
+class JobProgressDock(QDockWidget):
+    """
+    Dock showing the progress messages of the currently running LDV job, with a button to cancel it
+    """
+
+    def __init__(self, title, parent=None):
+        super(JobProgressDock, self).__init__(title, parent)
+        self.setObjectName('ldvJobs')
+        self.job = None
+
+        self.title_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_job)
+        self.log = QPlainTextEdit()
+        self.log.setReadOnly(True)
+        self.log.setMaximumBlockCount(500)  # only keep the most recent messages
+
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.title_label)
+        top_layout.addWidget(self.progress_bar, 1)
+        top_layout.addWidget(self.cancel_button)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(top_layout)
+        layout.addWidget(self.log)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+    def attach(self, job):
+        self.job = job
+        self.title_label.setText(job.name)
+        self.progress_bar.setRange(0, 0)  # busy indicator until the first report with a known total
+        self.cancel_button.setEnabled(True)
+        self.log.appendPlainText(f'--- {job.name} started ---')
+        job.progress.connect(self.on_progress)
+        job.finished.connect(self.on_finished)
+        self.show()
+
+    def on_progress(self, message, done, total):
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+        else:
+            self.progress_bar.setRange(0, 0)
+        self.log.appendPlainText(message)
+
+    def on_finished(self):
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(1)
+        self.cancel_button.setEnabled(False)
+        self.job = None
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_button.setEnabled(False)
+            self.log.appendPlainText(f'Cancelling {self.job.name}, stopping at the next safe point...')
@@ -0,0 +1,51 @@
+import os
+import yaml
+
+from yolov7.utils.model_registry import registered_models as shared_registered_models
+
+MODEL_REGISTRY_FILENAME_ = 'model_registry.json'  # lives inside the trained models folder, written by YOLOv7 train() at the end of every run
+
+
+def registered_models(trained_models_dir):
+    """
+    Reads the model registry of a trained models folder. If there is no registry yet (the models were trained before it
+    existed), the model folders are registered from their results.txt files once and the registry is written
+
+    Returns:
+    - models (dict): {model folder name: entry}, see train() in yolov7/train.py for the entry fields
+    """
+    return shared_registered_models(os.path.join(trained_models_dir, MODEL_REGISTRY_FILENAME_))
+
+def read_class_names(data_yaml_path):
+    """ Class names listed in a YOLO dataset YAML file (like the dataset_info.yaml of the temp training dataset) """
+    with open(data_yaml_path, 'r') as f:
+        return list(yaml.safe_load(f)['names'])
+
+def model_registry_class_names(trained_models_dir, model_name):
+    """ Class names a registered model was trained on, None if they are unknown (not registered, or trained before the registry) """
+    return registered_models(trained_models_dir).get(model_name, {}).get('names')
+
+def choose_best_model(trained_models_dir, class_names=None):
+    """
+    Picks the trained model with the best validation fitness from the model registry.
+    Fitnesses are only comparable on the same validation set, so only the models validated on the same validation set as
+    the most recently trained candidate are compared
+
+    Args:
+    - trained_models_dir (str): the trained models folder
+    - class_names (list, optional): only models trained on exactly these classes, in this order, are considered.
+                                    Models whose classes are unknown are still considered
+
+    Returns:
+    - model_name (str or None): folder name of the chosen model inside trained_models_dir, None if there is no valid model
+    """
+    # LDV always loads weights/best.pt, models deleted since they were registered are skipped
+    candidates = {model_name: entry for model_name, entry in registered_models(trained_models_dir).items()
+                  if (class_names is None or entry.get('names') is None or list(entry['names']) == list(class_names))
+                  and os.path.exists(os.path.join(trained_models_dir, model_name, 'weights', 'best.pt'))}
+    if not candidates:
+        return None
+
+    latest = max(candidates.values(), key=lambda entry: entry.get('time', 0.0))  # models trained before the registry have no time
+    comparable = [model_name for model_name, entry in candidates.items() if entry.get('val_dataset') == latest.get('val_dataset')]
+    return max(comparable, key=lambda model_name: candidates[model_name]['best_fitness'])
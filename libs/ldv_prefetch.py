@@ -0,0 +1,150 @@
+import os
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.pascal_voc_io import PascalVocReader
+
+PREFETCH_RADIUS_ = 2               # number of images decoded ahead of (and behind) the current image in the file list
+PREFETCH_CACHE_BYTES_ = 1 << 30    # decoded images kept in memory, least recently used ones are dropped first
+PREFETCH_THREADS_ = 2              # number of images decoded at the same time
+
+
+def file_signature(path):
+    """ (mtime_ns, size) of path, or None if it does not exist. Cached entries are only used while this is unchanged """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def decode_image(path):
+    """ Decodes an image the same way MainWindow's read() does (EXIF orientation applied) """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    return reader.read()
+
+
+def image_nbytes(image):
+    return image.sizeInBytes() if hasattr(image, 'sizeInBytes') else image.byteCount()
+
+
+class _PrefetchTask(QRunnable):
+    """ Decodes one image and parses its PASCAL VOC annotation file on a QThreadPool thread """
+
+    def __init__(self, prefetcher, img_path, xml_path):
+        super(_PrefetchTask, self).__init__()
+        self.prefetcher = prefetcher
+        self.img_path = img_path
+        self.xml_path = xml_path
+
+    def run(self):
+        img_signature = file_signature(self.img_path)
+        image = decode_image(self.img_path)
+        reader, xml_signature = None, None
+        if self.xml_path is not None:
+            xml_signature = file_signature(self.xml_path)
+            if xml_signature is not None:
+                reader = PascalVocReader(self.xml_path)
+        # signals of the prefetcher (a GUI thread object) are queued, so the caches are only ever touched by the GUI thread
+        self.prefetcher.prefetched.emit(self.img_path, (img_signature, image, self.xml_path, xml_signature, reader))
+
+
+class ImagePrefetcher(QObject):
+    """
+    Decodes the images around the current one in the file list on background threads, and keeps them in a size-bounded
+    LRU cache of QImages, together with their parsed PASCAL VOC annotation files. Entries are only handed out while
+    the image (or annotation) file is unchanged on disk, so edits and saves are always picked up.
+    """
+    prefetched = pyqtSignal(str, object)
+
+    def __init__(self, radius=PREFETCH_RADIUS_, max_bytes=PREFETCH_CACHE_BYTES_, threads=PREFETCH_THREADS_, parent=None):
+        super(ImagePrefetcher, self).__init__(parent)
+        self.radius = radius
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()  # img_path -> (signature, QImage), most recently used last
+        self.cached_bytes = 0
+        self.annotations = {}        # xml_path -> (signature, PascalVocReader)
+        self.in_flight = {}          # img_path -> _PrefetchTask
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        self.prefetched.connect(self.store)
+
+    def prefetch(self, img_list, index, xml_path_for):
+        """
+        Queues the images within radius of img_list[index], nearest first, dropping queued work for images further away.
+        xml_path_for(img_path) returns the annotation file to pre-parse for an image (or None)
+        """
+        self.drop_queued()  # not started tasks are for images we moved away from
+
+        for offset in range(1, self.radius + 1):
+            for neighbour in (index + offset, index - offset):
+                if not 0 <= neighbour < len(img_list):
+                    continue
+                img_path = img_list[neighbour]
+                if img_path in self.images or img_path in self.in_flight:
+                    continue
+                task = _PrefetchTask(self, img_path, xml_path_for(img_path))
+                task.setAutoDelete(False)  # still referenced by in_flight
+                self.in_flight[img_path] = task
+                self.pool.start(task)
+
+    def store(self, img_path, result):
+        img_signature, image, xml_path, xml_signature, reader = result
+        self.in_flight.pop(img_path, None)
+        if reader is not None:
+            self.annotations[xml_path] = (xml_signature, reader)
+        if image.isNull() or img_signature is None:
+            return
+        self.put_image(img_path, img_signature, image)
+
+    def put_image(self, img_path, signature, image):
+        self.drop_image(img_path)
+        self.images[img_path] = (signature, image)
+        self.cached_bytes += image_nbytes(image)
+        while self.cached_bytes > self.max_bytes and len(self.images) > 1:
+            self.drop_image(next(iter(self.images)))  # least recently used
+
+    def drop_image(self, img_path):
+        entry = self.images.pop(img_path, None)
+        if entry is not None:
+            self.cached_bytes -= image_nbytes(entry[1])
+
+    def image(self, img_path):
+        """ Returns the decoded QImage of img_path, from the cache if it is still valid, else decoded right now """
+        entry = self.images.get(img_path)
+        signature = file_signature(img_path)
+        if entry is not None and entry[0] == signature:
+            self.images.move_to_end(img_path)
+            return entry[1]
+        image = decode_image(img_path)
+        if not image.isNull() and signature is not None:
+            self.put_image(img_path, signature, image)  # keeps it around for going back and forth
+        return image
+
+    def pascal_voc_reader(self, xml_path):
+        """ Returns the parsed PascalVocReader of xml_path, from the cache if the file did not change since """
+        entry = self.annotations.pop(xml_path, None)
+        if entry is not None and entry[0] == file_signature(xml_path):
+            return entry[1]
+        return PascalVocReader(xml_path)
+
+    def drop_queued(self):
+        """
+        Takes the tasks that no pool thread has picked up yet out of the queue. Tasks already running stay referenced
+        in in_flight until their result is stored, dropping them earlier frees them under the pool thread
+        """
+        self.in_flight = {path: task for path, task in self.in_flight.items() if not self.pool.tryTake(task)}
+
+    def clear(self):
+        self.drop_queued()
+        self.images.clear()
+        self.cached_bytes = 0
+        self.annotations.clear()
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+TRANSFER_JOURNAL_FILENAME_ = '.ldv_transfer_journal.jsonl'  # lives inside the folder the files are moved out of
+COPY_CHUNK_BYTES_ = 8 << 20  # read/write size of copies between drives
+PART_SUFFIX_ = '.ldv_part'   # a copy between drives is written under this suffix and only renamed to its real name once complete
+_JOURNAL_VERSION = 1
+
+
+class TransferStats(object):
+    """ Counts of one FileMover run, with the throughput for the report string """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.num_renamed = 0
+        self.num_copied = 0
+        self.num_bytes_copied = 0
+        self.num_missing = 0
+
+    def __str__(self):
+        seconds = max(time.time() - self.start_time, 1e-6)
+        num_files = self.num_renamed + self.num_copied
+        text = f"Moved {num_files} files in {seconds:.1f} s ({num_files / seconds:.0f} files/s"
+        if self.num_copied:
+            text += f", {self.num_copied} copied between drives at {self.num_bytes_copied / seconds / 2 ** 20:.1f} MB/s"
+        text += ")."
+        if self.num_missing:
+            text += f" {self.num_missing} planned files were already gone."
+        return text
+
+
+class FileMover(object):
+    """
+    Moves groups of files (an image together with its XML file) as one unit.
+    All moves are planned and written to a journal before the first file is touched, and every finished group is
+    appended to it, so a run that was interrupted (crash, power loss, error) can be resumed or rolled back instead of
+    leaving images separated from their XML files. The journal is removed once a run completes.
+
+    Within one drive a move is a single os.replace (no data is copied). Between drives the files are copied in
+    chunks by a thread pool, under a temporary name that is only renamed to the real one once the copy is complete,
+    after which the source is removed.
+
+    Args:
+    - journal_path (str): the journal file. If it already exists, it belongs to an unfinished run, which is loaded
+                          so it can be resumed (run) or undone (rollback) instead of planning a new one
+    - workers (int): number of files copied between drives at once
+    - chunk_size (int): bytes per read/write of those copies
+    """
+
+    def __init__(self, journal_path, workers=4, chunk_size=COPY_CHUNK_BYTES_):
+        self.journal_path = journal_path
+        self.workers = max(workers, 1)
+        self.chunk_size = chunk_size
+        self.groups = []      # [[(src_path, dst_path), ...], ...]
+        self.done = set()     # indices of the groups that were moved completely
+        self.stats = TransferStats()
+        self._same_device = {}  # (src_folder, dst_folder) -> bool
+        self._between_groups = False  # True while the progress callback runs, nothing is half moved then
+        if os.path.exists(journal_path):
+            self._load_journal()
+
+    @property
+    def unfinished(self):
+        """ True while a journal exists: an interrupted run that should be resumed or rolled back first """
+        return os.path.exists(self.journal_path)
+
+    @property
+    def moved_groups(self):
+        """ The groups of the current (or last) run that were moved completely """
+        return [self.groups[index] for index in sorted(self.done)]
+
+    def _load_journal(self):
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            assert header.get('version') == _JOURNAL_VERSION, f"Unknown transfer journal version in {self.journal_path}"
+            self.groups = [[tuple(move) for move in group] for group in header['groups']]
+            for line in f:
+                try:
+                    self.done.add(json.loads(line)['done'])
+                except ValueError:
+                    break  # last line only half written when the run was interrupted
+
+    def plan(self, groups):
+        """
+        Records the groups of (src_path, dst_path) moves of a new run in the journal
+
+        Args:
+        - groups (list): list of groups, each a list of (src_path, dst_path) that must end up on the same side
+        """
+        assert not self.unfinished, f"An interrupted file transfer ({self.journal_path}) has to be resumed or rolled back first"
+        self.groups = [[(src, dst) for src, dst in group] for group in groups]
+        self.done = set()
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': _JOURNAL_VERSION, 'groups': self.groups}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, progress_callback=None):
+        """
+        Moves all planned (or, after an interruption, all remaining) groups
+
+        Args:
+        - progress_callback (callable, optional): called as progress_callback(groups_done, num_groups) before each group
+                                                  (or batch of groups copied between drives). Raising from it (e.g. cancelling)
+                                                  stops the run cleanly, with every group either fully moved or untouched
+
+        Returns:
+        - stats (TransferStats): what was moved, and how fast
+        """
+        self.stats = TransferStats()
+        todo = [index for index in range(len(self.groups)) if index not in self.done]
+        renames = [index for index in todo if all(self.is_same_device(src, dst) for src, dst in self.groups[index])]
+        rename_set = set(renames)
+        copies = [index for index in todo if index not in rename_set]
+
+        try:
+            self._move(renames, copies, progress_callback)
+        except BaseException:
+            if self._between_groups:  # stopped on purpose, every group is either moved or untouched, nothing to resume
+                self._remove_journal()
+            raise
+        self._remove_journal()
+        return self.stats
+
+    def _move(self, renames, copies, progress_callback):
+        with open(self.journal_path, 'a', encoding='utf-8') as journal:
+            for index in renames:
+                self._report(progress_callback)
+                for src, dst in self.groups[index]:
+                    if self._needs_moving(src, dst):
+                        os.replace(src, dst)
+                        self.stats.num_renamed += 1
+                self._mark_done(journal, index)
+
+            batch_size = self.workers * 4
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for start in range(0, len(copies), batch_size):
+                    self._report(progress_callback)
+                    batch = copies[start:start + batch_size]
+                    moves = [(src, dst) for index in batch for src, dst in self.groups[index] if self._needs_moving(src, dst)]
+                    self.stats.num_bytes_copied += sum(executor.map(lambda move: self._copy_part(*move), moves))
+                    for src, dst in moves:  # every copy of the batch is complete, swap them in
+                        os.replace(dst + PART_SUFFIX_, dst)
+                        os.remove(src)
+                        self.stats.num_copied += 1
+                    for index in batch:
+                        self._mark_done(journal, index)
+
+    def rollback(self, progress_callback=None):
+        """
+        Undoes an interrupted run: every file that was already moved goes back to where it came from
+
+        Returns:
+        - stats (TransferStats): what was moved back, and how fast
+        """
+        back = []
+        for group in self.groups:
+            for src, dst in group:
+                if os.path.exists(dst + PART_SUFFIX_):  # copy that never completed
+                    os.remove(dst + PART_SUFFIX_)
+            # only the files that did move, a file that was still waiting may have a namesake at its destination
+            moved = [(dst, src) for src, dst in group if not os.path.exists(src) and os.path.exists(dst)]
+            if moved:
+                back.append(moved)
+        self._remove_journal()
+        self.plan(back)  # journaled like any run, so an interrupted rollback can be resumed too
+        return self.run(progress_callback)
+
+    def is_same_device(self, src, dst):
+        key = (os.path.dirname(src), os.path.dirname(dst))
+        if key not in self._same_device:
+            try:
+                self._same_device[key] = os.stat(key[0] or '.').st_dev == os.stat(key[1] or '.').st_dev
+            except OSError:
+                self._same_device[key] = True  # nothing to copy from, _needs_moving skips it
+        return self._same_device[key]
+
+    def _needs_moving(self, src, dst):
+        if os.path.exists(src):
+            return True
+        if not os.path.exists(dst):  # neither side, it was moved or deleted by someone else meanwhile
+            self.stats.num_missing += 1
+        return False
+
+    def _copy_part(self, src, dst):
+        with open(src, 'rb') as fsrc, open(dst + PART_SUFFIX_, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, self.chunk_size)
+            fdst.flush()
+            os.fsync(fdst.fileno())  # the data must be on disk before the source is removed
+        shutil.copystat(src, dst + PART_SUFFIX_)
+        return os.path.getsize(src)
+
+    def _mark_done(self, journal, index):
+        self.done.add(index)
+        journal.write(json.dumps({'done': index}) + '\n')
+        journal.flush()
+
+    def _report(self, progress_callback):
+        if progress_callback is not None:
+            self._between_groups = True
+            progress_callback(len(self.done), len(self.groups))
+            self._between_groups = False
+
+    def _remove_journal(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+
+def resume_unfinished_transfer(journal_folder, progress_callback=None, workers=4):
+    """
+    Finishes the interrupted FileMover run journaled in journal_folder, if there is one
+
+    Returns:
+    - stats (TransferStats or None): what was moved finishing it, None if there was nothing to resume
+    """
+    mover = FileMover(os.path.join(journal_folder, TRANSFER_JOURNAL_FILENAME_), workers=workers)
+    return mover.run(progress_callback) if mover.unfinished else None
@@ -1,24 +1,36 @@
 import os
+import json
+import time
 import shutil
-import random
+import hashlib
 import glob
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree import ElementTree as ET
+from libs.ldv_annotation_cache import AnnotationCache, parse_voc_xml
+from libs.ldv_transfer import FileMover, resume_unfinished_transfer, TRANSFER_JOURNAL_FILENAME_
 
 IMG_FILE_EXTENSIONS_ = ['bmp', 'jpg', 'jpeg', 'png', 'tif', 'tiff'] # ['bmp', 'jpg', 'jpeg', 'png', 'tif', 'tiff', 'dng', 'webp', 'mpo'] in YOLOv7 loading
+DATASET_FILE_MODES_ = ['hardlink', 'symlink', 'copy']  # ways the temp YOLO dataset folder can reference the original image and XML files
+FILE_TRANSFER_WORKERS_ = 8  # upper bound on threads used to link/copy files, enough to keep a disk busy without thrashing it
+MOVE_PROGRESS_EVERY_ = 500  # checking an unchanged XML file is one index lookup, reporting every one would flood the GUI
+SPLIT_MANIFEST_FILENAME_ = '.ldv_split_manifest.json'  # lives inside the training source folder, the train/valid split of every image
+MOVED_VERIFIED_LOG_FILENAME_ = '.ldv_moved_verified.jsonl'  # lives inside the training source folder, one line per Move Verified run
 
 def clear_YOLO_dataset_folders(YOLO_dataset_folder):
     """
     Clears the temp YOLO dataset folder
     """
-    # defining the folder paths
+    # defining the folder paths. Only the image split folders themselves, the label files (see create_label_files) and the
+    # YOLOv7 label (.cache) and image (_cache.mmap) caches are kept, they only rescan the files that changed since the last training
     all_folders = []
-    for super_folder in ['images', 'labels']:
-        one_path = os.path.join(YOLO_dataset_folder, super_folder)
-        all_folders.append(one_path)
+    for super_folder in ['images']:
+        for sub_dir in ['train', 'valid']:
+            one_path = os.path.join(YOLO_dataset_folder, super_folder, sub_dir)
+            all_folders.append(one_path)
 
     for folder in all_folders:
-        # clears the folders, so that new freshly random training source examples can populate it
+        # clears the folders, so that the current training source examples can populate it
         if os.path.exists(folder):
             shutil.rmtree(folder) # deletes entire directory tree and folder
 
@@ -37,105 +49,235 @@ def create_YOLO_dataset_folders(YOLO_dataset_folder):
         os.makedirs(folder, exist_ok=True) # makes the directory anew
 
 
-def generate_class_mapping(input_dirs):
+def link_or_copy_file(src_path, dst_folder, file_mode='hardlink'):
+    """
+    Places a file into dst_folder, only duplicating the file contents when there is no other choice.
+
+    Args:
+    - src_path (str): path of the original file (in the training source or test set folder)
+    - dst_folder (str): folder the file should show up in (one of the temp images/{train,valid,test} folders)
+    - file_mode (str): one of DATASET_FILE_MODES_. 'hardlink' and 'symlink' only touch file system metadata,
+                       and fall back to a full copy if the file system does not support them (FAT32, some network shares, Windows without symlink privileges)
+
+    Returns:
+    - dst_path (str): the path of the file inside dst_folder
+    """
+    assert file_mode in DATASET_FILE_MODES_, f"Unknown dataset file mode '{file_mode}'. Valid options are {DATASET_FILE_MODES_}"
+    dst_path = os.path.join(dst_folder, os.path.basename(src_path))
+    if os.path.lexists(dst_path):  # the temp test folder is not cleared between runs, so refresh any stale entry
+        os.remove(dst_path)
+
+    if file_mode == 'hardlink':
+        try:
+            os.link(src_path, dst_path)
+            return dst_path
+        except OSError:
+            pass
+    elif file_mode == 'symlink':
+        try:
+            os.symlink(os.path.abspath(src_path), dst_path)
+            return dst_path
+        except OSError:
+            pass
+
+    shutil.copy2(src_path, dst_path)  # keeps the mtime, so the YOLO label cache still recognises the image
+    return dst_path
+
+def generate_class_mapping(input_dirs, annotation_cache=None):
     """
     Generates the mapping of class names to class indices
+    If an AnnotationCache is given, unchanged XML files are not parsed again
     """
     class_names = set()
     for input_dir in input_dirs:
         for xml_file in glob.glob(os.path.join(input_dir, "*.xml")):
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-
-            for obj in root.findall("object"):
-                class_name = obj.find("name").text
-                class_names.add(class_name)
+            record = annotation_cache.get(xml_file) if annotation_cache else parse_voc_xml(xml_file)
+            for obj in record['objects']:
+                class_names.add(obj[0])
 
     class_mapping = {name: idx for idx, name in enumerate(sorted(class_names))} # note that Python dicts are now ordered dicts
     return class_mapping
 
-def copy_files_to_YOLO_dataset_folder(training_source_folder, YOLO_dataset_folder, val_percentage=0.3):
+def index_image_xml_pairs(folder):
     """
-    Copies the image and XML files to the YOLO dataset folder structure. 
-    Copies only those images that have corresponding XML files
+    Scans a folder ONCE (os.scandir, not recursive) and indexes its image and XML files by basename (file name without extension)
+
+    Args:
+    - folder (str): directory to scan
+
+    Returns:
+    - pairs (dict): {basename: {'image': image_path or None, 'xml': xml_path or None}}.
+                    If several images share a basename, the one whose extension comes first in IMG_FILE_EXTENSIONS_ is kept
+    """
+    ext_priority = {ext: i for i, ext in enumerate(IMG_FILE_EXTENSIONS_)}
+    pairs = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            basename, ext = os.path.splitext(entry.name)
+            ext = ext[1:].lower()
+            if ext == 'xml':
+                pairs.setdefault(basename, {'image': None, 'xml': None})['xml'] = entry.path
+            elif ext in ext_priority:
+                pair = pairs.setdefault(basename, {'image': None, 'xml': None})
+                current = pair['image']
+                if current is None or ext_priority[ext] < ext_priority[os.path.splitext(current)[1][1:].lower()]:
+                    pair['image'] = entry.path
+    return pairs
+
+def link_or_copy_files(transfers, file_mode='hardlink', max_workers=FILE_TRANSFER_WORKERS_):
     """
-    # Get all image and XML file paths
-    img_extensions = IMG_FILE_EXTENSIONS_
-    img_files = [glob.glob(os.path.join(training_source_folder, f'*.{ext}')) for ext in img_extensions]
-    img_files = [item for sublist in img_files for item in sublist]  # Flatten the list
-    xml_files = glob.glob(os.path.join(training_source_folder, '*.xml'))
+    Runs link_or_copy_file for many files on a bounded thread pool
 
-    # Create a list of file basenames that have both image and XML files
-    img_basenames = set([os.path.basename(f).split('.')[0] for f in img_files])
-    xml_basenames = set([os.path.basename(f).split('.')[0] for f in xml_files])
-    common_basenames = list(img_basenames & xml_basenames)
+    Args:
+    - transfers (list): list of (src_path, dst_folder) tuples
+    - file_mode (str): one of DATASET_FILE_MODES_
+    - max_workers (int): maximum number of threads doing file work at once
 
-    # Shuffle and split into training and validation sets
-    random.shuffle(common_basenames)
-    num_val = int(len(common_basenames) * val_percentage)
-    val_set = set(common_basenames[:num_val])
-    train_set = set(common_basenames[num_val:])
+    Returns:
+    - dst_paths (list): the resulting paths, in the same order as transfers
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda t: link_or_copy_file(t[0], t[1], file_mode=file_mode), transfers))
 
-    # Copy image and XML files to respective training and validation folders
-    for basename in common_basenames:
-        img_file = next(f for f in img_files if (os.path.splitext(os.path.basename(f))[0] == basename)) # grabs the first file with same basename
-        xml_file = os.path.join(training_source_folder, f"{basename}.xml")
+def split_hash(basename):
+    """ Deterministic number in [0, 1) for a basename, the same on every machine and every run (unlike hash()) """
+    return int(hashlib.md5(basename.encode('utf-8')).hexdigest()[:15], 16) / 16 ** 15
 
-        target_folder = 'valid' if basename in val_set else 'train'
+def stratified_split(basenames, val_percentage, image_classes=None):
+    """
+    Splits basenames into training and validation sets, with about val_percentage of the images of every class in the validation set.
+    Each image counts towards its rarest class (the class found in the fewest images). Within a class, the images are
+    ordered by split_hash and the first val_percentage share of them (rounded down, but at least one image for any class
+    with 2 or more images, so rare classes are validated too) goes to validation, so the result only depends on the
+    basenames and their classes
 
-        shutil.copy(img_file, os.path.join(YOLO_dataset_folder, 'images', target_folder))
-        shutil.copy(xml_file, os.path.join(YOLO_dataset_folder, 'images', target_folder))
+    Args:
+    - basenames (list): basenames of the images
+    - val_percentage (float): fraction of the images that go into the validation set
+    - image_classes (dict, optional): {basename: set of class names in its XML file}. Without it, the split is only by hash
 
-def copy_files_to_YOLO_test_folder(test_set_folder, temp_folder):
+    Returns:
+    - split (dict): {basename: 'train' or 'valid'}
     """
-    Copies the image and XML files to the YOLO test set folder structure. 
-    Copies only those images that have corresponding XML files
+    image_classes = image_classes or {}
+    class_counts = {}
+    for basename in basenames:
+        for class_name in image_classes.get(basename, ()):
+            class_counts[class_name] = class_counts.get(class_name, 0) + 1
+
+    strata = {}
+    for basename in basenames:
+        classes = image_classes.get(basename)
+        rarest = min(classes, key=lambda name: (class_counts[name], name)) if classes else ''
+        strata.setdefault(rarest, []).append(basename)
+
+    split = {}
+    for stratum in strata.values():
+        val_count = int(len(stratum) * val_percentage)
+        if val_percentage > 0 and len(stratum) >= 2:
+            val_count = max(val_count, 1)
+        for i, basename in enumerate(sorted(stratum, key=lambda b: (split_hash(b), b))):
+            split[basename] = 'valid' if i < val_count else 'train'
+    return split
+
+def load_split_manifest(training_source_folder, basenames, val_percentage, image_classes=None):
     """
-    # Get all image and XML file paths
-    img_extensions = IMG_FILE_EXTENSIONS_
-    img_files = [glob.glob(os.path.join(test_set_folder, f'*.{ext}')) for ext in img_extensions]
-    img_files = [item for sublist in img_files for item in sublist]  # Flatten the list
-    xml_files = glob.glob(os.path.join(test_set_folder, '*.xml'))
+    Returns the train/valid split of the training source folder, kept in its SPLIT_MANIFEST_FILENAME_ between trainings,
+    so every training validates on the same images (comparable mAPs, warm YOLO caches).
+    The first time (or when val_percentage changed) the split is made by stratified_split. After that, images that
+    are no longer there are dropped and new images are assigned by split_hash, which does not move any existing image
 
-    # Create a list of file basenames that have both image and XML files
-    img_basenames = set([os.path.basename(f).split('.')[0] for f in img_files])
-    xml_basenames = set([os.path.basename(f).split('.')[0] for f in xml_files])
-    common_basenames = list(img_basenames & xml_basenames)
+    Args:
+    - training_source_folder (str): the training source folder, where the manifest lives
+    - basenames (list): basenames of the image/XML pairs currently in the training source folder
+    - val_percentage (float): fraction of the images that go into the validation set
+    - image_classes (dict, optional): {basename: set of class names}, used to stratify a new split
 
-    # Copy image and XML files to temporary test set folder
+    Returns:
+    - split (dict): {basename: 'train' or 'valid'}
+    """
+    manifest_path = os.path.join(training_source_folder, SPLIT_MANIFEST_FILENAME_)
+    manifest = None
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except ValueError:
+            manifest = None  # unreadable, made again below
+    if manifest is None or manifest.get('val_percentage') != val_percentage:
+        split = stratified_split(basenames, val_percentage, image_classes)
+    else:
+        split = {basename: manifest['split'][basename] if basename in manifest['split'] else
+                 ('valid' if split_hash(basename) < val_percentage else 'train') for basename in basenames}
+
+    if manifest is None or manifest.get('val_percentage') != val_percentage or split != manifest['split']:
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'val_percentage': val_percentage, 'split': split}, f, indent=0, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return split
+
+def copy_files_to_YOLO_dataset_folder(training_source_folder, YOLO_dataset_folder, val_percentage=0.3, file_mode='hardlink',
+                                      annotation_cache=None):
+    """
+    Copies the image and XML files to the YOLO dataset folder structure. 
+    Copies only those images that have corresponding XML files.
+    The split into training and validation sets is persistent and stratified by class, see load_split_manifest
+    With file_mode 'hardlink' or 'symlink' no image data is duplicated, see link_or_copy_file
+    """
+    # Index all image and XML files by basename in a single pass, keeping only those basenames that have both
+    pairs = index_image_xml_pairs(training_source_folder)
+    common_basenames = sorted(b for b, pair in pairs.items() if pair['image'] and pair['xml'])
+
+    # The same split as the previous trainings, new images are added to it
+    image_classes = None
+    if annotation_cache is not None:
+        image_classes = {b: {obj[0] for obj in annotation_cache.get(pairs[b]['xml'])['objects']} for b in common_basenames}
+    split = load_split_manifest(training_source_folder, common_basenames, val_percentage, image_classes)
+
+    # Copy image and XML files to respective training and validation folders
+    transfers = []
     for basename in common_basenames:
-        img_file = next(f for f in img_files if (os.path.splitext(os.path.basename(f))[0] == basename)) # grabs the first file with same basename
-        xml_file = os.path.join(test_set_folder, f"{basename}.xml")
+        target_folder = os.path.join(YOLO_dataset_folder, 'images', split[basename])
+        transfers.append((pairs[basename]['image'], target_folder))
+        transfers.append((pairs[basename]['xml'], target_folder))
+    link_or_copy_files(transfers, file_mode=file_mode)
 
-        target_folder = 'test'
+def copy_files_to_YOLO_test_folder(test_set_folder, temp_folder, file_mode='hardlink'):
+    """
+    Copies the image and XML files to the YOLO test set folder structure. 
+    Copies only those images that have corresponding XML files.
+    With file_mode 'hardlink' or 'symlink' no image data is duplicated, see link_or_copy_file
+    """
+    # Index all image and XML files by basename in a single pass, keeping only those basenames that have both
+    pairs = index_image_xml_pairs(test_set_folder)
+    target_folder = os.path.join(temp_folder, 'images', 'test')
 
-        shutil.copy(img_file, os.path.join(temp_folder, 'images', target_folder))
-        shutil.copy(xml_file, os.path.join(temp_folder, 'images', target_folder))
+    # Copy image and XML files to temporary test set folder
+    transfers = []
+    for basename, pair in pairs.items():
+        if pair['image'] and pair['xml']:
+            transfers.append((pair['image'], target_folder))
+            transfers.append((pair['xml'], target_folder))
+    link_or_copy_files(transfers, file_mode=file_mode)
 
 
-def convert_voc_to_yolo(xml_path, class_mapping):
+def convert_voc_to_yolo(xml_path, class_mapping, annotation_cache=None):
     """
     Converts the PASCAL VOC style bounding box annotations to to YOLO style bounding box annotations
+    If an AnnotationCache is given, unchanged XML files are not parsed again
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    record = annotation_cache.get(xml_path) if annotation_cache else parse_voc_xml(xml_path)
 
     # get width and height of current image from VOC file
-    img_width = int(root.find('size').find('width').text)
-    img_height = int(root.find('size').find('height').text)
-    img_channels = int(root.find('size').find('depth').text)
+    img_width = record['width']
+    img_height = record['height']
 
     yolo_annots = []
 
-    for obj in root.findall("object"):
-        class_name = obj.find("name").text
+    for class_name, x_min, y_min, x_max, y_max, _difficult in record['objects']:
         class_idx = class_mapping[class_name]
-        
-        bbox = obj.find("bndbox")
-        x_min = float(bbox.find("xmin").text)
-        y_min = float(bbox.find("ymin").text)
-        x_max = float(bbox.find("xmax").text)
-        y_max = float(bbox.find("ymax").text)
 
         x_center = (x_min + x_max) / (2 * img_width)
         y_center = (y_min + y_max) / (2 * img_height)
@@ -146,21 +288,34 @@ def convert_voc_to_yolo(xml_path, class_mapping):
 
     return "\n".join(yolo_annots)
 
-def create_label_files(YOLO_dataset_folder, class_mapping):
+def create_label_files(YOLO_dataset_folder, class_mapping, annotation_cache=None):
     """
     Creates and saves the YOLO-compatible label files in the proper folders
+    Label files that already hold the converted text are not written again, so they keep their mtime and size and the
+    YOLOv7 label cache does not parse them again. Label files of images that are no longer in the split are removed
     """
 
     for set_type in ['train', 'valid', 'test']:
         fldr_check = os.path.exists(os.path.join(YOLO_dataset_folder, 'images', set_type))  # can now use in both training set construction and test set construction
         xml_files = glob.glob(os.path.join(YOLO_dataset_folder, 'images', set_type, '*.xml')) if fldr_check else []
+        yolo_txt_paths = set()
         for xml_file_path in xml_files:
-            yolo_annotations = convert_voc_to_yolo(xml_file_path, class_mapping)  # does the converting from PASCAL VOC to YOLO style
+            yolo_annotations = convert_voc_to_yolo(xml_file_path, class_mapping, annotation_cache=annotation_cache)  # does the converting from PASCAL VOC to YOLO style
             yolo_txt_path = os.path.join(YOLO_dataset_folder, 'labels', set_type, os.path.basename(xml_file_path).replace('.xml', '.txt'))
-            
+            yolo_txt_paths.add(yolo_txt_path)
+
+            if os.path.exists(yolo_txt_path):
+                with open(yolo_txt_path, 'r') as f:
+                    if f.read() == yolo_annotations:
+                        continue
             with open(yolo_txt_path, 'w') as f:
                 f.write(yolo_annotations)
 
+        # labels kept from the last training, of images that moved to the other split or left the dataset
+        for yolo_txt_path in glob.glob(os.path.join(YOLO_dataset_folder, 'labels', set_type, '*.txt')):
+            if yolo_txt_path not in yolo_txt_paths:
+                os.remove(yolo_txt_path)
+
 def create_training_data_yaml_file(YOLO_dataset_folder, class_mapping):
     """
     Create a YAML file with given dataset paths and class mapping.
@@ -212,7 +367,7 @@ def update_nc_in_yaml(file_path, num_classes):
     with open(file_path, 'w') as yaml_file:
         yaml.dump(yaml_data, yaml_file, sort_keys=False)
 
-def train_model_file_helper(training_source_folder, temp_dataset_folder, model_config_yaml_path):
+def train_model_file_helper(training_source_folder, temp_dataset_folder, model_config_yaml_path, file_mode='hardlink'):
     """
     The helper function to be imported for primary functionality of Train Model action
 
@@ -220,6 +375,7 @@ def train_model_file_helper(training_source_folder, temp_dataset_folder, model_c
     - training_source_folder (str): The directory where training images and XML files are jointly are stored
     - temp_dataset_folder (str): The temp directory where the images/[train,valid] and labels/[train,valid] are created for YOLO compatibility
     - model_config_yaml_path (str): file path to where the 
+    - file_mode (str): how the images and XML files show up in the temp directory, one of DATASET_FILE_MODES_
     """
 
     # pre-emptive clear to reset the temporary folder
@@ -228,17 +384,25 @@ def train_model_file_helper(training_source_folder, temp_dataset_folder, model_c
     # create the YOLOv7 compatible dataset directories
     create_YOLO_dataset_folders(YOLO_dataset_folder=temp_dataset_folder)
 
+    # persistent cache of the parsed XML files in the training source folder, so a retrain only parses added or changed XMLs
+    annotation_cache = AnnotationCache(training_source_folder)
+    annotation_cache.prune()
+
     # generate class mapping dict of name to index, directly from the XML files. 
     # This is the ground truth for the class order
-    class_mapping = generate_class_mapping(input_dirs=[training_source_folder])
+    class_mapping = generate_class_mapping(input_dirs=[training_source_folder], annotation_cache=annotation_cache)
 
     # locates all XML+image pairs in training source folder, splits into train and validation set, then copies over to images/{train,valid}
     copy_files_to_YOLO_dataset_folder(training_source_folder=training_source_folder,
                                       YOLO_dataset_folder=temp_dataset_folder,
-                                      val_percentage=0.3)
+                                      val_percentage=0.3,
+                                      file_mode=file_mode,
+                                      annotation_cache=annotation_cache)
     
     # create the YOLO style txt files and place in appropriate labels folders
-    create_label_files(YOLO_dataset_folder=temp_dataset_folder, class_mapping=class_mapping)
+    create_label_files(YOLO_dataset_folder=temp_dataset_folder, class_mapping=class_mapping, annotation_cache=annotation_cache)
+    print(f"Parsed {annotation_cache.num_parsed} new or changed XML files in {training_source_folder}, the rest were loaded from the annotation cache")
+    annotation_cache.close()
 
     # create the YAML dataset file
     yaml_data_file_path = create_training_data_yaml_file(YOLO_dataset_folder=temp_dataset_folder, class_mapping=class_mapping)
@@ -249,77 +413,119 @@ def train_model_file_helper(training_source_folder, temp_dataset_folder, model_c
     return class_mapping, yaml_data_file_path
 
 
-def move_verified_helper(last_open_dir, training_source_dir, optional_verified_dir=None):
+def move_verified_helper(last_open_dir, training_source_dir, optional_verified_dir=None, progress_callback=None,
+                         copy_workers=FILE_TRANSFER_WORKERS_):
     """
     The helper function to be imported for primary functionality of Move Verified Captures action
     Moves all VERIFIED images and associated files from the source directory to the training source directory.
     Optionally, copies the files to an additional directory.
+    The verified status comes from the source directory's AnnotationCache, so only XML files added or changed since
+    the last run are read, and only up to their root tag. Images are paired with their XML files by one folder scan.
+    The moves go through a journaled FileMover (see libs/ldv_transfer.py), so an image and its XML file always end up
+    on the same side. A run that was interrupted is finished first.
     
     Args:
     - last_open_dir (str): The directory where currently opened/processed images are located.
     - training_source_dir (str): The directory where training images should be moved to.
     - optional_verified_dir (str, optional): An optional directory where copies of verified images can be stored.
+    - progress_callback (callable, optional): called as progress_callback(message, done, total) every MOVE_PROGRESS_EVERY_
+                                              XML files checked, and before each moved pair (or batch of pairs copied between drives)
+    - copy_workers (int): number of threads copying files at once, between drives and to optional_verified_dir (1 copies them one by one)
     
     Returns:
     - report_str (str): The general report information relayed back
     """
-    # Loop through all XML files in the source directory
-    xml_file_list = [f for f in os.listdir(last_open_dir) if f.endswith('.xml')]
-    num_xml_files_before = len(xml_file_list)
-    num_verified_files_moved = 0
-
-    for xml_file in xml_file_list:
-        xml_path = os.path.join(last_open_dir, xml_file)
-
-        # Parse the XML file to check for the 'verified' attribute
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-
-        # Check if this image has been verified
-        if root is not None and root.attrib.get('verified') == 'yes':
-            # The corresponding image file should have the same name but different extension (e.g., .jpg, .png)
-            img_file = xml_file.rsplit('.', 1)[0]  # Removing the .xml extension
-            img_file_with_extension = None  # Initialize
-
-            # Search for the image file with the corresponding name, and if found, set and break
-            for ext in IMG_FILE_EXTENSIONS_:
-                possible_img_file = f"{img_file}.{ext}"
-                if os.path.exists(os.path.join(last_open_dir, possible_img_file)):
-                    img_file_with_extension = possible_img_file
-                    break
-
-            # If corresponding image file is found, proceed to move
-            if img_file_with_extension:
-                # Move image and XML to the training source directory
-                shutil.move(os.path.join(last_open_dir, img_file_with_extension), 
-                            os.path.join(training_source_dir, img_file_with_extension))
-                shutil.move(xml_path, os.path.join(training_source_dir, xml_file))
-                num_verified_files_moved += 1
-
-                # Optionally, move a copy to the optional verified directory as well
-                if optional_verified_dir:
-                    shutil.copy(os.path.join(training_source_dir, img_file_with_extension),
-                                os.path.join(optional_verified_dir, img_file_with_extension))
-                    shutil.copy(os.path.join(training_source_dir, xml_file),
-                                os.path.join(optional_verified_dir, xml_file))
-    
-    new_xml_file_list = [f for f in os.listdir(last_open_dir) if f.endswith('.xml')]
-    num_xml_files_after = len(new_xml_file_list)
+    def moving_progress(done, total):
+        if progress_callback is not None:
+            progress_callback(f'Moved {done} of {total} verified image/XML pairs', done, total)
+
+    resumed_stats = resume_unfinished_transfer(last_open_dir, moving_progress, workers=copy_workers)
+
+    pairs = index_image_xml_pairs(last_open_dir)
+    xml_pairs = [pairs[basename] for basename in sorted(pairs) if pairs[basename]['xml']]
+    num_xml_files_before = len(xml_pairs)
+    groups = []  # [(image, moved image), (XML, moved XML)] of every verified pair
+
+    with AnnotationCache(last_open_dir) as annotation_cache:
+        for xml_index, pair in enumerate(xml_pairs):
+            if progress_callback is not None and xml_index % MOVE_PROGRESS_EVERY_ == 0:
+                progress_callback(f'Checked {xml_index} of {num_xml_files_before} XML files', xml_index, num_xml_files_before)
+            # a verified XML file without an image is left where it is, like before
+            if pair['image'] is not None and annotation_cache.is_verified(pair['xml']):
+                groups.append([(path, os.path.join(training_source_dir, os.path.basename(path))) for path in (pair['image'], pair['xml'])])
+
+        mover = FileMover(os.path.join(last_open_dir, TRANSFER_JOURNAL_FILENAME_), workers=copy_workers)
+        mover.plan(groups)
+        try:
+            stats = mover.run(moving_progress)
+        finally:
+            # also when cancelled halfway, so the pairs that did move are forgotten and copied
+            moved_paths = [dst for group in mover.moved_groups for _src, dst in group]
+            annotation_cache.forget(moved_paths[1::2])
+            log_moved_verified(training_source_dir, moved_paths[0::2])
+
+            # Optionally, copy them to the optional verified directory as well
+            if optional_verified_dir and moved_paths:
+                link_or_copy_files([(path, optional_verified_dir) for path in moved_paths], file_mode='copy', max_workers=copy_workers)
+
+    num_verified_files_moved = len(moved_paths) // 2
+    num_xml_files_after = num_xml_files_before - num_verified_files_moved
 
     # construct final report str
     report_str = f"{num_verified_files_moved} Verified XML Files and associated images were moved to training source directory. \
-        XML files before: {num_xml_files_before}. After: {num_xml_files_after} in {last_open_dir}."
+        XML files before: {num_xml_files_before}. After: {num_xml_files_after} in {last_open_dir}. {stats}"
+    if resumed_stats is not None:
+        report_str += f" An interrupted earlier run was finished first: {resumed_stats}"
     if optional_verified_dir:
         report_str += f" Additionally, {num_verified_files_moved} were copied to {optional_verified_dir}"
 
     return report_str
 
-def construct_voc_from_yolo_annotations(img_full_path, yolo_annotations, class_mapping, imgsize, difficult_thresh=0.5):
+def log_moved_verified(training_source_dir, image_paths):
     """
-    Constructs the ElementTree object for the PASCAL VOC style annotations
+    Appends the images moved into the training source folder to its MOVED_VERIFIED_LOG_FILENAME_, with the time they were moved.
+    Moves keep the modification times of the files, so this log is what tells the recently added images apart
     """
+    if not image_paths:
+        return
+    with open(os.path.join(training_source_dir, MOVED_VERIFIED_LOG_FILENAME_), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'time': time.time(), 'images': [os.path.basename(path) for path in image_paths]}) + '\n')
 
-    index_to_class_mapping = {v:k for k,v in class_mapping.items()} # reverses the class mapping {'name': idx} to {idx : 'name'}
+def recently_moved_images(training_source_dir, since):
+    """
+    Lists the images that Move Verified Captures moved into the training source folder at or after a given time
+
+    Args:
+    - training_source_dir (str): the training source folder
+    - since (float): time.time() style timestamp, e.g. the modification time of the weights of the model being fine-tuned
+
+    Returns:
+    - image_names (list): file names of those images that are still in training_source_dir, sorted
+    """
+    log_path = os.path.join(training_source_dir, MOVED_VERIFIED_LOG_FILENAME_)
+    if not os.path.exists(log_path):
+        return []
+    image_names = set()
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # line only half written when a run was interrupted
+            if entry['time'] >= since:
+                image_names.update(entry['images'])
+    return sorted(name for name in image_names if os.path.exists(os.path.join(training_source_dir, name)))
+
+def construct_voc_from_boxes(img_full_path, boxes, imgsize, difficult_thresh=0.5):
+    """
+    Constructs the ElementTree object for the PASCAL VOC style annotations
+
+    Args:
+    - img_full_path (str): full path to the image the annotations belong to
+    - boxes (list): list of (class_name, xmin, ymin, xmax, ymax, confidence) in image pixels. confidence may be None
+    - imgsize (tuple): (H, W, Channels) of the image
+    - difficult_thresh (float): boxes with a confidence below this are marked as difficult
+    """
 
     # Create XML root element
     root = ET.Element('annotation')
@@ -342,6 +548,31 @@ def construct_voc_from_yolo_annotations(img_full_path, yolo_annotations, class_m
     
     ET.SubElement(root, 'segmented').text = '0'
     
+    for class_name, xmin, ymin, xmax, ymax, confidence in boxes:
+        # Create object element and append to root
+        obj = ET.SubElement(root, 'object')
+        ET.SubElement(obj, 'name').text = class_name
+        ET.SubElement(obj, 'pose').text = 'Unspecified'
+        ET.SubElement(obj, 'truncated').text = '0'
+        ET.SubElement(obj, 'difficult').text = '1' if confidence and (confidence < difficult_thresh) else '0' # set difficult toggle when confidence under threshold 
+        
+        bbox = ET.SubElement(obj, 'bndbox')
+        ET.SubElement(bbox, 'xmin').text = str(max(0, int(xmin)))
+        ET.SubElement(bbox, 'ymin').text = str(max(0, int(ymin)))
+        ET.SubElement(bbox, 'xmax').text = str(min(width, int(xmax)))
+        ET.SubElement(bbox, 'ymax').text = str(min(height,int(ymax)))
+    
+    return ET.ElementTree(root)
+
+def construct_voc_from_yolo_annotations(img_full_path, yolo_annotations, class_mapping, imgsize, difficult_thresh=0.5):
+    """
+    Constructs the ElementTree object for the PASCAL VOC style annotations from YOLO label lines
+    """
+
+    index_to_class_mapping = {v:k for k,v in class_mapping.items()} # reverses the class mapping {'name': idx} to {idx : 'name'}
+    height, width, _channel = imgsize
+
+    boxes = []
     if yolo_annotations:  # file has already been read. If there was no file, yolo_annotations should be None, so won't enter this part at all. 
         for line in yolo_annotations:
             parts = line.strip().split(" ")
@@ -355,21 +586,38 @@ def construct_voc_from_yolo_annotations(img_full_path, yolo_annotations, class_m
             # Convert YOLO to VOC
             x_center, y_center, width_rel, height_rel = x_center * width, y_center * height, width_rel * width, height_rel * height
             xmin, ymin, xmax, ymax = x_center - width_rel / 2, y_center - height_rel / 2, x_center + width_rel / 2, y_center + height_rel / 2
-            
-            # Create object element and append to root
-            obj = ET.SubElement(root, 'object')
-            ET.SubElement(obj, 'name').text = index_to_class_mapping.get(class_idx, "Unknown Class")
-            ET.SubElement(obj, 'pose').text = 'Unspecified'
-            ET.SubElement(obj, 'truncated').text = '0'
-            ET.SubElement(obj, 'difficult').text = '1' if confidence and (confidence < difficult_thresh) else '0' # set difficult toggle when confidence under threshold 
-            
-            bbox = ET.SubElement(obj, 'bndbox')
-            ET.SubElement(bbox, 'xmin').text = str(max(0, int(xmin)))
-            ET.SubElement(bbox, 'ymin').text = str(max(0, int(ymin)))
-            ET.SubElement(bbox, 'xmax').text = str(min(width, int(xmax)))
-            ET.SubElement(bbox, 'ymax').text = str(min(height,int(ymax)))
+            boxes.append((index_to_class_mapping.get(class_idx, "Unknown Class"), xmin, ymin, xmax, ymax, confidence))
     
-    return ET.ElementTree(root)
+    return construct_voc_from_boxes(img_full_path, boxes, imgsize, difficult_thresh=difficult_thresh)
+
+class VOCResultSink(object):
+    """
+    Detection result sink (see ResultSink in yolov7/detect.py) writing each image's detections straight to a 
+    PASCAL VOC XML file, without going through intermediate YOLO .txt label files. 
+    Every detected image gets an XML file, even when no predictions were made ("no labels" voc file).
+
+    Args:
+    - output_dir (str): folder the XML files are written to. If None, each XML file is written next to its image
+    - difficult_thresh (float): predictions with a confidence below this are marked as difficult
+    """
+
+    def __init__(self, output_dir=None, difficult_thresh=0.5):
+        self.output_dir = output_dir
+        self.difficult_thresh = difficult_thresh
+        self.xml_paths = []  # every XML file written, in order
+
+    def write(self, path, im0, det, names, frame=None):
+        # det rows are [xmin, ymin, xmax, ymax, conf, cls] in original image pixels, objects are written in the same order as the YOLO txt labels
+        boxes = [(names[int(cls)], xmin, ymin, xmax, ymax, conf) for xmin, ymin, xmax, ymax, conf, cls in reversed(det.tolist())]
+        imgname_wo_ext, _ = os.path.splitext(os.path.basename(path))
+        if frame is not None:
+            imgname_wo_ext += f'_{frame}'
+        xml_path = os.path.join(self.output_dir or os.path.dirname(path), imgname_wo_ext+'.xml')
+        construct_voc_from_boxes(path, boxes, im0.shape, difficult_thresh=self.difficult_thresh).write(xml_path)
+        self.xml_paths.append(xml_path)
+
+    def close(self):
+        pass
 
 def detect_raw_conversion_helper(raw_captures_dir, pred_labels_dir, class_mapping, imgname_to_imgsize):
     """
@@ -406,19 +654,21 @@ def detect_raw_conversion_helper(raw_captures_dir, pred_labels_dir, class_mappin
         xml_etree = construct_voc_from_yolo_annotations(img_full_path, yolo_annotations, class_mapping, imgsize)
         xml_etree.write(labels_xml_full_path)  # write the ElementTree object to XML file
 
-def detect_raw_moving_helper(raw_captures_dir, detected_dir):
+def detect_raw_moving_helper(raw_captures_dir, detected_dir, progress_callback=None):
     """
     The helper function to be imported and used within the Detect Raw Captures Action
     Helps after the XML files have been created in the raw_captures_dir, and identifies and moves all the XML/image pairs
-    into detected_dir. 
+    into detected_dir. The moves go through a journaled FileMover (see libs/ldv_transfer.py), a run that was interrupted is finished first.
 
     Args:
     - raw_captures_dir (str):
     - detected_dir (str): 
+    - progress_callback (callable, optional): called as progress_callback(pairs_done, num_pairs), see FileMover.run
     """
+    resumed_stats = resume_unfinished_transfer(raw_captures_dir, progress_callback, workers=FILE_TRANSFER_WORKERS_)
 
     xml_files = [f for f in os.listdir(raw_captures_dir) if f.endswith('.xml')]
-    moving_counter = 0
+    groups = []
     for xml_file in xml_files:
         xml_path = os.path.join(raw_captures_dir, xml_file)
 
@@ -431,24 +681,30 @@ def detect_raw_moving_helper(raw_captures_dir, detected_dir):
 
         # move the XML and image files to detected_dir
         if os.path.exists(image_path):
-            moving_counter += 1
-            shutil.move(xml_path, os.path.join(detected_dir, xml_file))
-            shutil.move(image_path, os.path.join(detected_dir, image_filename))
+            groups.append([(xml_path, os.path.join(detected_dir, xml_file)),
+                           (image_path, os.path.join(detected_dir, image_filename))])
         else:
             print(f"Image file {image_filename} not found for {xml_file}")
 
+    mover = FileMover(os.path.join(raw_captures_dir, TRANSFER_JOURNAL_FILENAME_), workers=FILE_TRANSFER_WORKERS_)
+    mover.plan(groups)
+    stats = mover.run(progress_callback)
+
     # construct final report str
-    report_str = f"Of the {len(xml_files)} XML files found in the Raw Captures directory, {moving_counter} XML files and their associated images were moved to the Detected Captures"
+    report_str = f"Of the {len(xml_files)} XML files found in the Raw Captures directory, {len(groups)} XML files and their associated images were moved to the Detected Captures. {stats}"
+    if resumed_stats is not None:
+        report_str += f" An interrupted earlier run was finished first: {resumed_stats}"
 
     return report_str
     
-def test_model_file_helper(test_set_folder, temp_test_folder, training_source_data_yaml_path):
+def test_model_file_helper(test_set_folder, temp_test_folder, training_source_data_yaml_path, file_mode='hardlink'):
     """
     The helper function to be importaed and used within the Test Model Action
     Helps with creating the test set YAML file and the folder structure (similar to the YOLO training dataset folder structure needed)
     Args:
     - test_set_folder (str): The directory where testing images and XML files are jointly are stored
     - temp_test_folder (str): The temp directory where the images/test and labels/test are created for YOLO compatibility
+    - file_mode (str): how the images and XML files show up in the temp directory, one of DATASET_FILE_MODES_
     """
     
     # pre-emptive clear to reset test's temporary folder
@@ -485,9 +741,37 @@ def test_model_file_helper(test_set_folder, temp_test_folder, training_source_da
 
     # locates all XML+image pairs in test set folder then copies over to images/test
     copy_files_to_YOLO_test_folder(test_set_folder=test_set_folder,
-                                   temp_folder=temp_test_folder)
+                                   temp_folder=temp_test_folder,
+                                   file_mode=file_mode)
     
     # create the YOLO style txt files and place in appropriate labels folders
-    create_label_files(YOLO_dataset_folder=temp_test_folder, class_mapping=class_mapping)
+    with AnnotationCache(test_set_folder) as annotation_cache:
+        create_label_files(YOLO_dataset_folder=temp_test_folder, class_mapping=class_mapping, annotation_cache=annotation_cache)
 
     return yaml_save_path
+
+def read_test_set_targets(test_set_folder, test_set_yaml_path):
+    """
+    Reads the ground truth boxes of a test set from its XML files, for scoring saved Test Model predictions again
+    Only images that have an XML file count, the same ones test_model_file_helper puts in the YOLO test set folder
+
+    Args:
+    - test_set_folder (str): the directory where testing images and XML files are jointly stored
+    - test_set_yaml_path (str): the test set YAML file written by test_model_file_helper, with the class names of the tested model
+
+    Returns:
+    - targets (dict): {basename: [[class_idx, x_min, y_min, x_max, y_max], ...]}, coordinates normalized to the image size
+    - class_names (list): class names, in class index order
+    """
+    with open(test_set_yaml_path, 'r') as f:
+        class_names = yaml.safe_load(f)['names']
+    class_mapping = {name: idx for idx, name in enumerate(class_names)}
+    targets = {}
+    with AnnotationCache(test_set_folder) as annotation_cache:
+        for basename, pair in index_image_xml_pairs(test_set_folder).items():
+            if pair['image'] and pair['xml']:
+                record = annotation_cache.get(pair['xml'])
+                w, h = record['width'], record['height']
+                targets[basename] = [[class_mapping[class_name], x_min / w, y_min / h, x_max / w, y_max / h]
+                                     for class_name, x_min, y_min, x_max, y_max, _difficult in record['objects']]
+    return targets, class_names
@@ -0,0 +1,94 @@
+import os
+import time
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+class RawCapturesWatcher(QObject):
+    """
+    Watches the Raw Captures folder for new images and groups them into detection batches.
+    New files are noticed through QFileSystemWatcher (inotify on Linux), with a polling timer as fallback for file systems
+    that don't report changes (e.g. network shares). An image only counts as ready once its size stayed the same between
+    two scans, so captures that are still being written are left alone.
+    capturesReady is emitted once batch_size images are ready, or the oldest ready image waited max_wait seconds.
+    The consumer then calls take_ready() to get (and claim) the batch.
+
+    Args:
+    - folder (str): folder to watch
+    - extensions (list): image file extensions (without the dot) to pick up
+    - batch_size (int): number of ready images that triggers a batch right away
+    - max_wait (float): seconds after which fewer than batch_size ready images still make a batch
+    - poll_interval (float): seconds between two polling scans
+    """
+    capturesReady = pyqtSignal()
+
+    def __init__(self, folder, extensions, batch_size=8, max_wait=5.0, poll_interval=1.0, parent=None):
+        super(RawCapturesWatcher, self).__init__(parent)
+        self.folder = folder
+        self.extensions = tuple('.' + ext.lower() for ext in extensions)
+        self.batch_size = max(batch_size, 1)
+        self.max_wait = max_wait
+        self.pending = {}   # path -> (size at the last scan, time it became ready or None)
+        self.taken = set()  # paths handed out by take_ready() that are still in the folder
+
+        self.fs_watcher = QFileSystemWatcher([folder], self)
+        self.fs_watcher.directoryChanged.connect(self.scan)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(int(poll_interval * 1000))
+        self.poll_timer.timeout.connect(self.scan)
+
+    def start(self):
+        self.poll_timer.start()
+        self.scan()
+
+    def stop(self):
+        self.poll_timer.stop()
+        self.fs_watcher.removePaths(self.fs_watcher.directories())
+
+    def scan(self, _path=None):
+        now = time.time()
+        present = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(self.extensions) or not entry.is_file():
+                    continue
+                present.add(entry.path)
+                if entry.path in self.taken:
+                    continue
+                size = entry.stat().st_size
+                last_size, ready_since = self.pending.get(entry.path, (None, None))
+                if size == 0 or size != last_size:
+                    self.pending[entry.path] = (size, None)  # new or still being written
+                elif ready_since is None:
+                    self.pending[entry.path] = (size, now)
+
+        # forget the files that were moved away (detected) or deleted
+        self.pending = {path: state for path, state in self.pending.items() if path in present}
+        self.taken &= present
+
+        ready_times = [ready_since for _size, ready_since in self.pending.values() if ready_since is not None]
+        if len(ready_times) >= self.batch_size or (ready_times and now - min(ready_times) >= self.max_wait):
+            self.capturesReady.emit()
+
+    def take_ready(self):
+        """
+        Returns up to batch_size ready image paths, oldest first, and stops offering them in later batches
+        """
+        ready = sorted((ready_since, path) for path, (_size, ready_since) in self.pending.items() if ready_since is not None)
+        batch = [path for _ready_since, path in ready[:self.batch_size]]
+        for path in batch:
+            del self.pending[path]
+            self.taken.add(path)
+        return batch
+
+    def release(self, paths):
+        """
+        Offers paths handed out by take_ready() again, for a detection job that failed or was cancelled before moving them
+        """
+        self.taken.difference_update(paths)
@@ -0,0 +1,43 @@
+import unittest
+
+try:
+    from PyQt5.QtGui import QColor, QImage, QPixmap
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    from PyQt4.QtGui import QApplication, QColor, QImage, QPixmap
+
+from libs.canvas import Canvas, PixmapPyramid
+
+
+class TestPixmapPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QApplication.instance() or QApplication([])
+        image = QImage(1024, 512, QImage.Format_RGB32)
+        image.fill(QColor(100, 150, 200))
+        self.pixmap = QPixmap.fromImage(image)
+
+    def test_zoomed_out_draws_from_a_smaller_level(self):
+        pyramid = PixmapPyramid(self.pixmap)
+        self.assertEqual(pyramid.level_for_scale(2.0), 0)
+        self.assertEqual(pyramid.level_for_scale(0.5), 1)
+        self.assertEqual(pyramid.get(0.3).width(), 512)
+        # never smaller than MIN_LEVEL_SIZE, however far it is zoomed out
+        self.assertEqual(pyramid.get(0.001).height(), PixmapPyramid.MIN_LEVEL_SIZE)
+
+    def test_overlay_is_applied_once_per_color(self):
+        pyramid = PixmapPyramid(self.pixmap)
+        bright = pyramid.get(0.5, QColor(200, 200, 200))
+        self.assertIs(pyramid.get(0.5, QColor(200, 200, 200)), bright)
+        self.assertNotEqual(bright.toImage().pixel(0, 0), pyramid.get(0.5).toImage().pixel(0, 0))
+        self.assertIsNot(pyramid.get(0.5, QColor(40, 40, 40)), bright)
+
+    def test_canvas_paints_the_image(self):
+        canvas = Canvas()
+        canvas.resize(1024, 512)
+        canvas.load_pixmap(self.pixmap)
+        self.assertEqual(QColor(canvas.grab().toImage().pixel(300, 200)), QColor(100, 150, 200))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import QCoreApplication
+except ImportError:
+    from PyQt4.QtCore import QCoreApplication
+
+from libs.ldv_file_list import ImageListModel, ImageScanThread
+
+
+class TestImageListModel(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def test_rows_follow_appends_and_removals(self):
+        model = ImageListModel()
+        model.extend(['a.jpg', 'b.jpg', 'a.jpg', 'c.jpg'])
+        self.assertEqual(list(model), ['a.jpg', 'b.jpg', 'c.jpg'])
+        self.assertEqual(model.rowCount(), 3)
+        self.assertEqual(model.data(model.index(1)), 'b.jpg')
+
+        model.remove('a.jpg')
+        self.assertEqual(model.row_of('c.jpg'), 1)
+        self.assertEqual(model.row_of('a.jpg'), -1)
+        self.assertNotIn('a.jpg', model)
+
+
+class TestImageScanThread(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'sub'))
+        for name in ['img10.jpg', 'img2.JPG', 'notes.txt', os.path.join('sub', 'img1.png')]:
+            with open(os.path.join(self.folder, name), 'w') as f:
+                f.write('0')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batches_then_natural_sorted_list(self):
+        batches, complete = [], []
+        scan = ImageScanThread(self.folder, ['.jpg', '.png'])
+        scan.found.connect(batches.append)
+        scan.scanned.connect(complete.append)
+        scan.start()
+        scan.wait()
+        self.app.processEvents()  # deliver the queued signals emitted by the scan thread
+
+        expected = [os.path.join(self.folder, name) for name in ['img2.JPG', 'img10.jpg', os.path.join('sub', 'img1.png')]]
+        self.assertEqual(complete, [expected])
+        self.assertEqual(sorted(path for batch in batches for path in batch), sorted(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+try:
+    from PyQt5.QtCore import QCoreApplication
+except ImportError:
+    from PyQt4.QtCore import QCoreApplication
+
+from libs.ldv_jobs import LDVJob, JobCancelled, JobProgressSink
+
+
+class TestLDVJob(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def run_job(self, job):
+        outcome = {}
+        job.succeeded.connect(lambda result: outcome.setdefault('succeeded', result))
+        job.failed.connect(lambda trace: outcome.setdefault('failed', trace))
+        job.cancelled.connect(lambda: outcome.setdefault('cancelled', True))
+        job.start()
+        job.wait()
+        self.app.processEvents()  # deliver the queued signals emitted by the worker thread
+        return outcome
+
+    def test_result_reaches_the_gui_thread(self):
+        self.assertEqual(self.run_job(LDVJob('sum', lambda job: sum(range(4)))), {'succeeded': 6})
+
+    def test_errors_are_reported_not_raised(self):
+        outcome = self.run_job(LDVJob('fail', lambda job: 1 / 0))
+        self.assertIn('ZeroDivisionError', outcome['failed'])
+
+    def test_cancelled_detection_stops_at_the_next_image(self):
+        def detect(job):
+            sink = JobProgressSink(job, total=3)
+            for i in range(3):
+                if i == 1:
+                    job.cancel()
+                sink.write(f'img{i}.jpg', None, [], ['cat'])
+            return sink.done
+
+        self.assertEqual(self.run_job(LDVJob('detect', detect)), {'cancelled': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from libs.ldv_model_registry import choose_best_model, registered_models, MODEL_REGISTRY_FILENAME_
+from yolov7.utils.model_registry import update_model_registry
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name in ['dogs', 'cats', 'older_val', 'old']:
+            os.makedirs(os.path.join(self.root, name, 'weights'))
+            open(os.path.join(self.root, name, 'weights', 'best.pt'), 'w').close()
+        # trained before the registry existed, validation P, R, mAP@.5 and mAP@.5:.95 in columns 9 to 12
+        with open(os.path.join(self.root, 'old', 'results.txt'), 'w') as f:
+            f.write('0/1 0G 0.1 0.1 0.1 0.3 4 640 0.5 0.5 0.4 0.3 0.1 0.1 0.1\n')
+            f.write('1/1 0G 0.1 0.1 0.1 0.3 4 640 0.5 0.5 0.6 0.2 0.1 0.1 0.1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_registry(self):
+        models = {'dogs': {'best_fitness': 0.5, 'names': ['dog'], 'val_dataset': 'v2', 'time': 3.0},
+                  'cats': {'best_fitness': 0.6, 'names': ['cat', 'dog'], 'val_dataset': 'v2', 'time': 2.0},
+                  'older_val': {'best_fitness': 0.8, 'names': ['cat', 'dog'], 'val_dataset': 'v1', 'time': 1.0},
+                  'deleted': {'best_fitness': 0.9, 'names': ['dog'], 'val_dataset': 'v3', 'time': 4.0}}
+        with open(os.path.join(self.root, MODEL_REGISTRY_FILENAME_), 'w') as f:
+            json.dump({'version': 1, 'models': models}, f)
+
+    def test_old_models_are_registered_when_there_is_no_registry(self):
+        self.assertEqual(choose_best_model(self.root), 'old')
+        self.assertAlmostEqual(registered_models(self.root)['old']['best_fitness'], 0.04 + 0.27)
+        self.assertTrue(os.path.exists(os.path.join(self.root, MODEL_REGISTRY_FILENAME_)))
+
+        os.remove(os.path.join(self.root, 'old', 'results.txt'))  # no longer needed
+        self.assertIn('old', registered_models(self.root))
+
+    def test_first_trained_run_keeps_the_old_models(self):
+        update_model_registry(os.path.join(self.root, MODEL_REGISTRY_FILENAME_), 'dogs',
+                              {'best_fitness': 0.2, 'names': ['dog'], 'val_dataset': 'v1', 'time': 1.0})
+        self.assertEqual(sorted(registered_models(self.root)), ['dogs', 'old'])
+
+    def test_best_fitness_on_the_latest_validation_set_wins(self):
+        self.write_registry()
+        self.assertNotIn('old', registered_models(self.root))  # folders are only scanned without a registry
+        # older_val has the best fitness, but on a validation set the latest models are no longer validated on.
+        # The latest registered model was deleted, so it does not decide the validation set
+        self.assertEqual(choose_best_model(self.root), 'cats')
+
+    def test_only_models_with_the_same_classes(self):
+        self.write_registry()
+        self.assertEqual(choose_best_model(self.root, class_names=['dog']), 'dogs')
+        self.assertIsNone(choose_best_model(self.root, class_names=['bird']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import QCoreApplication
+    from PyQt5.QtGui import QImage
+except ImportError:
+    from PyQt4.QtCore import QCoreApplication
+    from PyQt4.QtGui import QImage
+
+from libs.ldv_prefetch import ImagePrefetcher
+
+
+class TestImagePrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.folder = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.folder, f'img{i}.png')
+            self.write_image(path, 10 + i)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_image(self, path, width):
+        image = QImage(width, 8, QImage.Format_RGB32)
+        image.fill(0)
+        self.assertTrue(image.save(path))
+
+    def prefetch(self, prefetcher, index):
+        prefetcher.prefetch(self.paths, index, lambda path: None)
+        prefetcher.pool.waitForDone()
+        self.app.processEvents()  # deliver the queued results to the cache
+
+    def test_neighbours_are_decoded_ahead(self):
+        prefetcher = ImagePrefetcher(radius=1)
+        self.prefetch(prefetcher, 2)
+        self.assertEqual(set(prefetcher.images), {self.paths[1], self.paths[3]})
+        self.assertEqual(prefetcher.image(self.paths[3]).width(), 13)
+
+    def test_changed_file_is_decoded_again(self):
+        prefetcher = ImagePrefetcher(radius=1)
+        self.prefetch(prefetcher, 0)
+        self.write_image(self.paths[1], 40)
+        os.utime(self.paths[1], ns=(0, 0))  # make sure the signature changes even on coarse mtime file systems
+        self.assertEqual(prefetcher.image(self.paths[1]).width(), 40)
+
+    def test_least_recently_used_images_are_dropped(self):
+        one_image = 14 * 8 * 4
+        prefetcher = ImagePrefetcher(radius=4, max_bytes=2 * one_image)
+        prefetcher.image(self.paths[0])
+        prefetcher.image(self.paths[1])
+        prefetcher.image(self.paths[0])
+        prefetcher.image(self.paths[4])
+        self.assertEqual(list(prefetcher.images), [self.paths[0], self.paths[4]])
+        self.assertLessEqual(prefetcher.cached_bytes, prefetcher.max_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
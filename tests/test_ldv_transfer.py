@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.ldv_transfer import FileMover, TRANSFER_JOURNAL_FILENAME_
+
+
+class CrossDeviceMover(FileMover):
+    # takes the copy path even though the test folders share a drive
+
+    def is_same_device(self, src, dst):
+        return False
+
+
+class TestFileMover(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src, self.dst = os.path.join(self.root, 'src'), os.path.join(self.root, 'dst')
+        os.makedirs(self.src)
+        os.makedirs(self.dst)
+        self.journal = os.path.join(self.src, TRANSFER_JOURNAL_FILENAME_)
+        self.groups = []
+        for i in range(5):
+            group = []
+            for ext in ['jpg', 'xml']:
+                with open(os.path.join(self.src, f'img{i}.{ext}'), 'w') as f:
+                    f.write(f'{i}' * 100)
+                group.append((os.path.join(self.src, f'img{i}.{ext}'), os.path.join(self.dst, f'img{i}.{ext}')))
+            self.groups.append(group)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def listing(self, folder):
+        return sorted(name for name in os.listdir(folder) if name != TRANSFER_JOURNAL_FILENAME_)
+
+    def test_moves_every_group_and_removes_the_journal(self):
+        back = [[(dst, src) for src, dst in group] for group in self.groups]
+        for mover_class, groups, folder in [(FileMover, self.groups, self.dst), (CrossDeviceMover, back, self.src)]:
+            mover = mover_class(self.journal, workers=2)
+            mover.plan(groups)
+            stats = mover.run()
+            self.assertEqual(len(self.listing(folder)), 10)
+            self.assertFalse(os.path.exists(self.journal))
+            self.assertEqual(stats.num_renamed + stats.num_copied, 10)
+            with open(os.path.join(folder, 'img3.xml')) as f:
+                self.assertEqual(f.read(), '3' * 100)
+
+    def interrupt(self):
+        # what a crash after the first group and half of the second one leaves behind
+        mover = FileMover(self.journal)
+        mover.plan(self.groups)
+        with open(self.journal, 'a') as journal:
+            mover._mark_done(journal, 0)
+        for src, dst in self.groups[0] + self.groups[1][:1]:
+            os.replace(src, dst)
+
+    def test_interrupted_run_is_resumed(self):
+        self.interrupt()
+        mover = FileMover(self.journal)
+        self.assertTrue(mover.unfinished)
+        mover.run()
+        self.assertEqual(self.listing(self.src), [])
+        self.assertEqual(len(self.listing(self.dst)), 10)
+
+    def test_interrupted_run_is_rolled_back(self):
+        self.interrupt()
+        FileMover(self.journal).rollback()
+        self.assertEqual(len(self.listing(self.src)), 10)
+        self.assertEqual(self.listing(self.dst), [])
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_stopping_between_groups_keeps_pairs_together(self):
+        def stop_after_two(done, total):
+            if done == 2:
+                raise KeyboardInterrupt
+        mover = FileMover(self.journal)
+        mover.plan(self.groups)
+        with self.assertRaises(KeyboardInterrupt):
+            mover.run(stop_after_two)
+        self.assertEqual(self.listing(self.dst), ['img0.jpg', 'img0.xml', 'img1.jpg', 'img1.xml'])
+        self.assertEqual(len(mover.moved_groups), 2)
+        self.assertFalse(mover.unfinished)  # nothing half done, so nothing to resume next time
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from libs.ldv_utils import link_or_copy_file, copy_files_to_YOLO_dataset_folder, create_YOLO_dataset_folders, \
+    clear_YOLO_dataset_folders, create_label_files, convert_voc_to_yolo, index_image_xml_pairs, VOCResultSink, move_verified_helper, read_test_set_targets, \
+    recently_moved_images, MOVED_VERIFIED_LOG_FILENAME_, load_split_manifest, stratified_split
+from libs.ldv_annotation_cache import AnnotationCache, read_verified_flag, record_verified_status
+
+VOC_XML = """<annotation verified="{verified}">
+    <filename>img{i}.jpg</filename>
+    <size><width>100</width><height>50</height><depth>3</depth></size>
+    <object>
+        <name>{name}</name>
+        <difficult>0</difficult>
+        <bndbox><xmin>10</xmin><ymin>5</ymin><xmax>30</xmax><ymax>25</ymax></bndbox>
+    </object>
+</annotation>
+"""
+
+
+class TestDatasetFolder(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, 'training_source')
+        os.makedirs(self.source)
+        for i in range(10):
+            with open(os.path.join(self.source, f'img{i}.jpg'), 'w') as f:
+                f.write(f'{i}')
+            with open(os.path.join(self.source, f'img{i}.xml'), 'w') as f:
+                f.write(VOC_XML.format(i=i, name='cat' if i % 2 else 'dog', verified='no'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_hardlink_does_not_duplicate_data(self):
+        src = os.path.join(self.source, 'img0.jpg')
+        dst = link_or_copy_file(src, self.root, file_mode='hardlink')
+        self.assertTrue(os.path.samefile(src, dst))
+
+    def test_copy_mode_makes_independent_file(self):
+        src = os.path.join(self.source, 'img0.jpg')
+        dst = link_or_copy_file(src, self.root, file_mode='copy')
+        self.assertFalse(os.path.samefile(src, dst))
+        # placing the same file again replaces the stale entry instead of failing
+        dst = link_or_copy_file(src, self.root, file_mode='hardlink')
+        self.assertTrue(os.path.samefile(src, dst))
+
+    def test_every_pair_lands_in_one_split(self):
+        temp = os.path.join(self.source, 'temp')
+        create_YOLO_dataset_folders(temp)
+        copy_files_to_YOLO_dataset_folder(self.source, temp, val_percentage=0.3, file_mode='hardlink')
+        train = os.listdir(os.path.join(temp, 'images', 'train'))
+        valid = os.listdir(os.path.join(temp, 'images', 'valid'))
+        self.assertEqual(len(train) + len(valid), 20)
+        self.assertEqual(len(valid), 6)
+
+    def test_unchanged_labels_are_not_written_again(self):
+        temp = os.path.join(self.source, 'temp')
+        class_mapping = {'cat': 0, 'dog': 1}
+
+        def build_dataset():  # the steps of train_model_file_helper that place the images and labels
+            clear_YOLO_dataset_folders(temp)
+            create_YOLO_dataset_folders(temp)
+            copy_files_to_YOLO_dataset_folder(self.source, temp, val_percentage=0.3, file_mode='hardlink')
+            create_label_files(temp, class_mapping)
+            return {name: os.path.join(temp, 'labels', split, name) for split in ['train', 'valid']
+                    for name in os.listdir(os.path.join(temp, 'labels', split))}
+
+        labels = build_dataset()
+        for path in labels.values():
+            os.utime(path, (1, 1))  # a rewrite would move the mtime away from this
+        with open(os.path.join(self.source, 'img3.xml'), 'w') as f:
+            f.write(VOC_XML.format(i=3, name='dog', verified='no'))
+        os.remove(os.path.join(self.source, 'img5.jpg'))
+        os.remove(os.path.join(self.source, 'img5.xml'))
+
+        relabeled = build_dataset()
+        self.assertEqual(set(relabeled), set(labels) - {'img5.txt'})  # the label of the removed image is gone too
+        changed = {name for name, path in relabeled.items() if os.path.getmtime(path) != 1}
+        self.assertEqual(changed, {'img3.txt'})
+
+    def test_split_is_kept_between_trainings(self):
+        basenames = [f'img{i}' for i in range(10)]
+        classes = {b: {'cat' if i % 2 else 'dog'} for i, b in enumerate(basenames)}
+        split = load_split_manifest(self.source, basenames, 0.3, classes)
+        # stratified: 5 dogs and 5 cats, one of each in validation
+        self.assertEqual(sorted(classes[b].pop() for b in split if split[b] == 'valid'), ['cat', 'dog'])
+
+        grown = load_split_manifest(self.source, basenames[1:] + [f'new{i}' for i in range(100)], 0.3)
+        self.assertTrue(all(grown[b] == split[b] for b in basenames[1:]))  # nothing moves
+        self.assertNotIn('img0', grown)
+        self.assertTrue(15 < sum(grown[f'new{i}'] == 'valid' for i in range(100)) < 45)
+        self.assertEqual(stratified_split(basenames, 0.3), stratified_split(list(reversed(basenames)), 0.3))
+
+    def test_rare_classes_are_validated(self):
+        basenames = [f'img{i}' for i in range(23)]
+        classes = {b: {'bird'} if i < 2 else {'cat'} if i < 5 else {'dog'} for i, b in enumerate(basenames)}
+        classes['img22'] = {'fish'}  # a single image stays in training
+        split = stratified_split(basenames, 0.2, classes)
+        valid = [classes[b].copy().pop() for b in basenames if split[b] == 'valid']
+        self.assertEqual(sorted(valid), ['bird', 'cat', 'dog', 'dog', 'dog'])
+
+    def test_index_pairs_in_one_pass(self):
+        with open(os.path.join(self.source, 'img0.png'), 'w') as f:  # lower priority extension than jpg
+            f.write('0')
+        with open(os.path.join(self.source, 'lonely.v2.jpg'), 'w') as f:
+            f.write('0')
+        pairs = index_image_xml_pairs(self.source)
+        self.assertEqual(pairs['img0']['image'], os.path.join(self.source, 'img0.jpg'))
+        self.assertEqual(pairs['img3']['xml'], os.path.join(self.source, 'img3.xml'))
+        self.assertIsNone(pairs['lonely.v2']['xml'])
+
+    def test_test_set_targets_are_normalized(self):
+        yaml_path = os.path.join(self.root, 'test_set_info.yaml')
+        with open(yaml_path, 'w') as f:
+            f.write('nc: 2\nnames: [dog, cat]\n')
+        os.remove(os.path.join(self.source, 'img4.jpg'))  # an XML without its image is not part of the test set
+        targets, class_names = read_test_set_targets(self.source, yaml_path)
+        self.assertEqual(class_names, ['dog', 'cat'])
+        self.assertEqual(len(targets), 9)
+        self.assertEqual(targets['img3'], [[1, 0.1, 0.1, 0.3, 0.5]])
+
+
+class TestAnnotationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for i in range(3):
+            with open(os.path.join(self.folder, f'img{i}.xml'), 'w') as f:
+                f.write(VOC_XML.format(i=i, name='cat', verified='no'))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_only_changed_files_are_reparsed(self):
+        xml_path = os.path.join(self.folder, 'img0.xml')
+        with AnnotationCache(self.folder) as cache:
+            expected = convert_voc_to_yolo(xml_path, {'cat': 0, 'dog': 1})
+            self.assertEqual(convert_voc_to_yolo(xml_path, {'cat': 0, 'dog': 1}, annotation_cache=cache), expected)
+            self.assertEqual(expected, '0 0.2 0.3 0.2 0.4')
+
+        with AnnotationCache(self.folder) as cache:
+            cache.get(xml_path)
+            self.assertEqual(cache.num_parsed, 0)
+
+        with open(xml_path, 'w') as f:
+            f.write(VOC_XML.format(i=0, name='dog', verified='yes'))
+        with AnnotationCache(self.folder) as cache:
+            record = cache.get(xml_path)
+            self.assertEqual(cache.num_parsed, 1)
+            self.assertEqual(record['objects'][0][0], 'dog')
+            self.assertTrue(record['verified'])
+
+
+class TestMoveVerified(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.detected, self.training, self.extra = [os.path.join(self.root, name) for name in ['detected', 'training', 'extra']]
+        for folder in [self.detected, self.training, self.extra]:
+            os.makedirs(folder)
+        for i in range(6):
+            with open(os.path.join(self.detected, f'img{i}.jpg'), 'w') as f:
+                f.write(f'{i}')
+            with open(os.path.join(self.detected, f'img{i}.xml'), 'w') as f:
+                f.write(VOC_XML.format(i=i, name='cat', verified='yes' if i < 2 else 'no'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_verified_flag_from_root_tag_only(self):
+        xml_path = os.path.join(self.detected, 'img0.xml')
+        with open(xml_path, 'a') as f:
+            f.write('<not closed')  # never read, the root tag comes first
+        self.assertTrue(read_verified_flag(xml_path))
+        self.assertFalse(read_verified_flag(os.path.join(self.detected, 'img3.xml')))
+
+    def test_moves_and_copies_verified_pairs(self):
+        move_verified_helper(self.detected, self.training, optional_verified_dir=self.extra, copy_workers=2)
+        expected = ['img0.jpg', 'img0.xml', 'img1.jpg', 'img1.xml']
+        self.assertEqual(sorted(name for name in os.listdir(self.training) if name != MOVED_VERIFIED_LOG_FILENAME_), expected)
+        self.assertEqual(sorted(os.listdir(self.extra)), expected)
+        self.assertFalse(os.path.exists(os.path.join(self.detected, 'img0.xml')))
+
+    def test_recently_moved_images_are_logged(self):
+        before = time.time() - 1
+        move_verified_helper(self.detected, self.training)
+        self.assertEqual(recently_moved_images(self.training, since=before), ['img0.jpg', 'img1.jpg'])
+        self.assertEqual(recently_moved_images(self.training, since=time.time() + 1), [])
+        os.remove(os.path.join(self.training, 'img1.jpg'))
+        self.assertEqual(recently_moved_images(self.training, since=before), ['img0.jpg'])
+
+    def test_saved_status_is_not_read_again(self):
+        move_verified_helper(self.detected, self.training)
+        xml_path = os.path.join(self.detected, 'img2.xml')
+        with open(xml_path, 'w') as f:
+            f.write(VOC_XML.format(i=2, name='cat', verified='yes'))
+        record_verified_status(xml_path, True)  # what saving in LabelImg does
+
+        with AnnotationCache(self.detected) as cache:
+            self.assertTrue(cache.is_verified(xml_path))
+            self.assertFalse(cache.is_verified(os.path.join(self.detected, 'img3.xml')))
+            self.assertEqual(cache.num_parsed, 0)
+
+
+class FakeDetections(list):
+    # stands in for the (n, 6) detection tensor handed to result sinks
+
+    def tolist(self):
+        return list(self)
+
+
+class FakeImage(object):
+    shape = (50, 100, 3)
+
+
+class TestVOCResultSink(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_writes_readable_voc_for_every_image(self):
+        from libs.pascal_voc_io import PascalVocReader
+
+        sink = VOCResultSink(difficult_thresh=0.5)
+        det = FakeDetections([[10.0, 5.0, 30.0, 25.0, 0.9, 1.0], [-3.0, 0.0, 120.0, 40.0, 0.2, 0.0]])
+        sink.write(os.path.join(self.folder, 'img0.jpg'), FakeImage(), det, ['cat', 'dog'])
+        sink.write(os.path.join(self.folder, 'img1.jpg'), FakeImage(), FakeDetections(), ['cat', 'dog'])
+        sink.close()
+
+        shapes = PascalVocReader(os.path.join(self.folder, 'img0.xml')).get_shapes()
+        self.assertEqual([(label, points, difficult) for label, points, _, _, difficult in shapes],
+                         [('cat', [(0, 0), (100, 0), (100, 40), (0, 40)], True),
+                          ('dog', [(10, 5), (30, 5), (30, 25), (10, 25)], False)])
+        self.assertEqual(PascalVocReader(os.path.join(self.folder, 'img1.xml')).get_shapes(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import QCoreApplication
+except ImportError:
+    from PyQt4.QtCore import QCoreApplication
+
+from libs.ldv_watch import RawCapturesWatcher
+
+
+class TestRawCapturesWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.folder = tempfile.mkdtemp()
+        self.watcher = RawCapturesWatcher(self.folder, ['jpg', 'png'], batch_size=2, max_wait=60.0)
+        self.batches_offered = 0
+        self.watcher.capturesReady.connect(self.count_offer)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.folder)
+
+    def count_offer(self):
+        self.batches_offered += 1
+
+    def write(self, name, data=b'0'):
+        with open(os.path.join(self.folder, name), 'ab') as f:
+            f.write(data)
+
+    def test_batches_wait_for_complete_files(self):
+        self.write('a.jpg')
+        self.write('notes.txt')
+        self.watcher.scan()
+        self.write('b.png')
+        self.watcher.scan()  # a.jpg is ready, b.png was just written
+        self.assertEqual(self.batches_offered, 0)
+
+        self.write('b.png', b'1')  # still growing
+        self.watcher.scan()
+        self.assertEqual(self.batches_offered, 0)
+        self.watcher.scan()
+        self.assertEqual(self.batches_offered, 1)
+        self.assertEqual(self.watcher.take_ready(), [os.path.join(self.folder, 'a.jpg'), os.path.join(self.folder, 'b.png')])
+
+        # claimed files are not offered again while they are still in the folder
+        self.watcher.scan()
+        self.assertEqual(self.watcher.take_ready(), [])
+
+        # until the detection job that took them fails, then they are offered again
+        self.watcher.release([os.path.join(self.folder, 'a.jpg')])
+        self.watcher.scan()
+        self.watcher.scan()
+        self.assertEqual(self.watcher.take_ready(), [os.path.join(self.folder, 'a.jpg')])
+
+    def test_time_window_flushes_small_batches(self):
+        self.watcher.max_wait = 0.0
+        self.write('a.jpg')
+        self.watcher.scan()
+        self.watcher.scan()
+        self.assertEqual(self.batches_offered, 1)
+        self.assertEqual(len(self.watcher.take_ready()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    import cv2
+    import numpy as np
+    import torch
+except ImportError:
+    torch = None
+
+YOLOV7_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'yolov7')
+
+
+@unittest.skipIf(torch is None, 'the YOLOv7 code needs torch and OpenCV')
+class TestLoadImagesBatched(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, YOLOV7_DIR)  # the YOLOv7 modules import each other as top-level packages
+        from utils.datasets import LoadImagesBatched
+        self.root = tempfile.mkdtemp()
+        shapes = [(128, 32), (128, 64), (128, 128), (64, 128), (32, 128)]  # captures of 5 aspect ratios, one letterboxed shape each
+        for i in range(30):
+            cv2.imwrite(os.path.join(self.root, f'img{i:02d}.jpg'), np.zeros((*shapes[i % 5], 3), np.uint8))
+        self.loader = LoadImagesBatched(self.root, img_size=128, stride=32, batch_size=4, workers=2, prefetch=1)
+
+    def tearDown(self):
+        sys.path.remove(YOLOV7_DIR)
+        shutil.rmtree(self.root)
+
+    def test_mixed_shapes_keep_the_buffer_bounded(self):
+        buckets, buffered = {}, []
+        for path in self.loader.files:  # one image at a time, to see the buckets after every image
+            list(self.loader.fill_buckets([self.loader.load(path)], buckets))
+            buffered.append(sum(len(bucket) for bucket in buckets.values()))
+        self.assertLessEqual(max(buffered), 4 * 1)
+
+        paths = [path for batch_paths, imgs, _img0s, _ in self.loader for path in batch_paths]
+        self.assertEqual(sorted(paths), self.loader.files)  # every image exactly once
+        for batch_paths, imgs, img0s, _ in self.loader:
+            self.assertEqual(len(imgs), len(img0s))
+            self.assertLessEqual(len(imgs), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+YOLOV7_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'yolov7')
+
+
+@unittest.skipIf(torch is None, 'the YOLOv7 code needs torch')
+class TestRemapHeadClasses(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, YOLOV7_DIR)  # the YOLOv7 modules import each other as top-level packages
+        from models.yolo import Model
+        from utils.torch_utils import remap_head_classes
+        self.remap_head_classes = remap_head_classes
+        cfg = os.path.join(YOLOV7_DIR, 'cfg', 'training', 'yolov7-tiny.yaml')
+        torch.manual_seed(0)
+        self.old_model, self.new_model = Model(cfg, nc=3), Model(cfg, nc=3)
+
+    def tearDown(self):
+        sys.path.remove(YOLOV7_DIR)
+
+    def head_outputs(self, model):
+        # (na, no, ...) view of the first output conv of the detection head
+        head = model.model[-1]
+        return head.m[0].weight.detach().unflatten(0, (head.na, head.no))
+
+    def test_swapped_classes_follow_their_names(self):
+        state_dict = self.remap_head_classes(self.old_model.state_dict(), self.new_model, ['cat', 'dog', 'bird'], ['dog', 'cat', 'bird'])
+        self.new_model.load_state_dict(state_dict)
+        old, new = self.head_outputs(self.old_model), self.head_outputs(self.new_model)
+        self.assertTrue(torch.equal(new[:, :5], old[:, :5]))  # box and objectness
+        self.assertTrue(torch.equal(new[:, 5], old[:, 6]))    # dog
+        self.assertTrue(torch.equal(new[:, 6], old[:, 5]))    # cat
+        self.assertTrue(torch.equal(new[:, 7], old[:, 7]))    # bird
+
+
+if __name__ == '__main__':
+    unittest.main()
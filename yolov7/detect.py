@@ -1,6 +1,8 @@
 import argparse
+import os
 import time
 from pathlib import Path
+from threading import Lock
 
 import cv2
 import torch
@@ -8,18 +10,116 @@ import torch.backends.cudnn as cudnn
 from numpy import random
 
 from models.experimental import attempt_load
-from utils.datasets import LoadStreams, LoadImages
+from utils.datasets import LoadStreams, LoadImages, LoadImagesBatched
 from utils.general import check_img_size, check_requirements, check_imshow, non_max_suppression, apply_classifier, \
-    scale_coords, xyxy2xywh, strip_optimizer, set_logging, increment_path
+    scale_coords, xyxy2xywh, strip_optimizer, set_logging, increment_path, resolve_path
 from utils.plots import plot_one_box
 from utils.torch_utils import select_device, load_classifier, time_synchronized, TracedModel
 
 
-def detect(opt, save_img=False):
+class DetectionModel:
+    """
+    Keeps a detection model loaded between detect() calls: fused, optionally traced, in half precision on GPU and warmed up.
+    load() is cheap when nothing changed, and only reloads when the weights path, the weights file's modification time,
+    the device, the image size or the trace setting differ from the currently loaded model.
+    """
+
+    def __init__(self):
+        self.lock = Lock()  # one detect() run at a time per loaded model
+        self.release()
+
+    def release(self):
+        # drops the loaded model, e.g. to hand the GPU memory over to training
+        self.key = None
+        self.model, self.device, self.half, self.stride, self.imgsz, self.names = None, None, False, None, None, None
+        self.warm_shape = None  # input shape the model was last warmed up with
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    @staticmethod
+    def weights_key(weights):
+        # (path, mtime) of every weights file, missing files (about to be downloaded by attempt_load) have no mtime
+        weights = weights if isinstance(weights, (list, tuple)) else [weights]
+        return tuple((os.path.abspath(w), os.path.getmtime(w) if os.path.exists(w) else None) for w in weights)
+
+    def load(self, weights, device='', img_size=640, trace=True, trace_path='traced_model.pt'):
+        key = (self.weights_key(weights), device, img_size, trace)
+        if key == self.key:
+            return self  # already loaded and warm
+
+        self.release()
+        self.device = select_device(device)
+        self.half = self.device.type != 'cpu'  # half precision only supported on CUDA
+
+        # Load model
+        model = attempt_load(weights, map_location=self.device)  # load FP32 model
+        self.stride = int(model.stride.max())  # model stride
+        self.imgsz = check_img_size(img_size, s=self.stride)  # check img_size
+
+        if trace:
+            model = TracedModel(model, self.device, img_size, save_path=trace_path)
+
+        if self.half:
+            model.half()  # to FP16
+
+        # Run once so the first real batch does not pay for CUDA initialization
+        if self.device.type != 'cpu':
+            model(torch.zeros(1, 3, self.imgsz, self.imgsz).to(self.device).type_as(next(model.parameters())))
+
+        self.model = model
+        self.names = model.module.names if hasattr(model, 'module') else model.names
+        self.key = (self.weights_key(weights), device, img_size, trace)
+        return self
+
+
+WARM_DETECTION_MODEL = DetectionModel()  # shared by detect_script_importable calls made with keep_loaded=True
+
+
+class ResultSink:
+    """
+    Receives the detections of every image processed by detect(), one call per image (also for images without detections).
+    Subclass it, or provide the same write()/close() methods, and pass instances to detect() as result_sinks.
+    """
+
+    def write(self, path, im0, det, names, frame=None):
+        """
+        path (str): image (or video) path, im0: original BGR image (H, W, C), names: list of class names,
+        det: (n, 6) tensor of [xmin, ymin, xmax, ymax, conf, cls] in im0 pixels, frame: video frame number or None for images
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class YOLOTxtSink(ResultSink):
+    """
+    Writes the normalized YOLO labels (class x_center y_center width height [conf]) of each image to save_dir/<stem>.txt
+    """
+
+    def __init__(self, save_dir, save_conf=False):
+        self.save_dir = Path(save_dir)
+        self.save_conf = save_conf
+
+    def write(self, path, im0, det, names, frame=None):
+        if not len(det):
+            return
+        txt_path = str(self.save_dir / Path(path).stem) + ('' if frame is None else f'_{frame}')  # img.txt
+        gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
+        det = det.float().cpu()
+        xywh = xyxy2xywh(det[:, :4]) / gn  # normalized xywh
+        lines = torch.cat((det[:, 5:6], xywh, det[:, 4:5]) if self.save_conf else (det[:, 5:6], xywh), 1)  # label format
+        with open(txt_path + '.txt', 'a') as f:
+            for line in reversed(lines.tolist()):
+                f.write(('%g ' * len(line)).rstrip() % tuple(line) + '\n')
+
+
+def detect(opt, save_img=False, detection_model=None, result_sinks=()):
     source, weights, view_img, save_txt, imgsz, trace = opt.source, opt.weights, opt.view_img, opt.save_txt, opt.img_size, not opt.no_trace
-    save_img = not opt.nosave and not source.endswith('.txt')  # save inference images
-    webcam = source.isnumeric() or source.endswith('.txt') or source.lower().startswith(
-        ('rtsp://', 'rtmp://', 'http://', 'https://'))
+    listed = isinstance(source, (list, tuple))  # added for LDV, source can also be an explicit list of image files
+    save_img = not opt.nosave and (listed or not source.endswith('.txt'))  # save inference images
+    webcam = not listed and (source.isnumeric() or source.endswith('.txt') or source.lower().startswith(
+        ('rtsp://', 'rtmp://', 'http://', 'https://')))
 
     # Directories
     save_dir = Path(increment_path(Path(opt.project) / opt.name, exist_ok=opt.exist_ok))  # increment run
@@ -27,19 +127,13 @@ def detect(opt, save_img=False):
 
     # Initialize
     set_logging()
-    device = select_device(opt.device)
-    half = device.type != 'cpu'  # half precision only supported on CUDA
-
-    # Load model
-    model = attempt_load(weights, map_location=device)  # load FP32 model
-    stride = int(model.stride.max())  # model stride
-    imgsz = check_img_size(imgsz, s=stride)  # check img_size
 
-    if trace:
-        model = TracedModel(model, device, opt.img_size)
-
-    if half:
-        model.half()  # to FP16
+    # Load model (a no-op if the given detection_model already holds these weights)
+    trace_path = str(Path(getattr(opt, 'root', '.')) / 'traced_model.pt')  # root is only set by detect_script_importable
+    detection_model = (detection_model or DetectionModel()).load(weights, device=opt.device, img_size=imgsz, trace=trace,
+                                                                 trace_path=trace_path)
+    model, device, half, stride, imgsz = \
+        detection_model.model, detection_model.device, detection_model.half, detection_model.stride, detection_model.imgsz
 
     # Second-stage classifier
     classify = False
@@ -53,18 +147,20 @@ def detect(opt, save_img=False):
         view_img = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
         dataset = LoadStreams(source, img_size=imgsz, stride=stride)
+    elif opt.batch_size > 1:  # images only, decoded on a thread pool and run through the model batch_size at a time
+        dataset = LoadImagesBatched(source, img_size=imgsz, stride=stride, batch_size=opt.batch_size, workers=opt.workers)
     else:
         dataset = LoadImages(source, img_size=imgsz, stride=stride)
+    batched = isinstance(dataset, LoadImagesBatched)
 
     # Get names and colors
-    names = model.module.names if hasattr(model, 'module') else model.names
+    names = detection_model.names
     colors = [[random.randint(0, 255) for _ in range(3)] for _ in names]
 
-    # Run inference
-    if device.type != 'cpu':
-        model(torch.zeros(1, 3, imgsz, imgsz).to(device).type_as(next(model.parameters())))  # run once
-    old_img_w = old_img_h = imgsz
-    old_img_b = 1
+    # Result sinks (each image's detections are handed to every sink)
+    result_sinks = list(result_sinks)
+    if save_txt:
+        result_sinks.append(YOLOTxtSink(save_dir / 'labels', save_conf=opt.save_conf))
 
     imgname_to_img_size = {}
     t0 = time.time()
@@ -78,15 +174,16 @@ def detect(opt, save_img=False):
         # added LDV info to extract to return
         if webcam:
             pass
+        elif batched:
+            for p_, im0 in zip(path, im0s):
+                imgname_to_img_size[Path(p_).name] = im0.shape
         else:
             p_ = Path(path)
             imgname_to_img_size[str(p_.name)] = im0s.shape # dictionary of { 'pic1.jpg' :  tuple of (H,W,Channels) }
 
-        # Warmup
-        if device.type != 'cpu' and (old_img_b != img.shape[0] or old_img_h != img.shape[2] or old_img_w != img.shape[3]):
-            old_img_b = img.shape[0]
-            old_img_h = img.shape[2]
-            old_img_w = img.shape[3]
+        # Warmup (remembered by the detection model, so a warm model skips this across calls)
+        if device.type != 'cpu' and detection_model.warm_shape != img.shape:
+            detection_model.warm_shape = img.shape
             for i in range(3):
                 model(img, augment=opt.augment)[0]
 
@@ -108,13 +205,13 @@ def detect(opt, save_img=False):
         for i, det in enumerate(pred):  # detections per image
             if webcam:  # batch_size >= 1
                 p, s, im0, frame = path[i], '%g: ' % i, im0s[i].copy(), dataset.count
+            elif batched:
+                p, s, im0, frame = path[i], '', im0s[i], 0
             else:
                 p, s, im0, frame = path, '', im0s, getattr(dataset, 'frame', 0)
 
             p = Path(p)  # to Path
             save_path = str(save_dir / p.name)  # img.jpg
-            txt_path = str(save_dir / 'labels' / p.stem) + ('' if dataset.mode == 'image' else f'_{frame}')  # img.txt
-            gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
             if len(det):
                 # Rescale boxes from img_size to im0 size
                 det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
@@ -124,17 +221,14 @@ def detect(opt, save_img=False):
                     n = (det[:, -1] == c).sum()  # detections per class
                     s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
 
-                # Write results
-                for *xyxy, conf, cls in reversed(det):
-                    if save_txt:  # Write to file
-                        xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()  # normalized xywh
-                        line = (cls, *xywh, conf) if opt.save_conf else (cls, *xywh)  # label format
-                        with open(txt_path + '.txt', 'a') as f:
-                            f.write(('%g ' * len(line)).rstrip() % line + '\n')
+            # Write results
+            for sink in result_sinks:
+                sink.write(str(p), im0, det, names, frame=None if dataset.mode == 'image' else frame)
 
-                    if save_img or view_img:  # Add bbox to image
-                        label = f'{names[int(cls)]} {conf:.2f}'
-                        plot_one_box(xyxy, im0, label=label, color=colors[int(cls)], line_thickness=1)
+            if len(det) and (save_img or view_img):  # Add bbox to image
+                for *xyxy, conf, cls in reversed(det):
+                    label = f'{names[int(cls)]} {conf:.2f}'
+                    plot_one_box(xyxy, im0, label=label, color=colors[int(cls)], line_thickness=1)
 
             # Print time (inference + NMS)
             print(f'{s}Done. ({(1E3 * (t2 - t1)):.1f}ms) Inference, ({(1E3 * (t3 - t2)):.1f}ms) NMS')
@@ -164,6 +258,9 @@ def detect(opt, save_img=False):
                         vid_writer = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
                     vid_writer.write(im0)
 
+    for sink in result_sinks:
+        sink.close()
+
     if save_txt or save_img:
         s = f"\n{len(list(save_dir.glob('labels/*.txt')))} labels saved to {save_dir / 'labels'}" if save_txt else ''
         #print(f"Results saved to {save_dir}{s}")
@@ -176,7 +273,7 @@ def detect(opt, save_img=False):
 import inspect
 def detect_script_importable(
         weights: str = 'yolov7.pt',          # model.pt weights path
-        source: str = 'inference/images',    # file or folder containing all the images you want to run inference on
+        source = 'inference/images',         # file or folder containing all the images you want to run inference on, or a list of image files
         img_size: int = 640,                 # inference size in pixels. Longest input image size will be scaled to this size. Aspect ratio kept the same, padding added if needed to make square
         conf_thres: float = 0.25,            # object confidence threshold needed to not get thrown out
         iou_thres: float = 0.45,             # IOU (Intersection Over Union) threshold for NMS (non-max suppression). Any extra overlapping same-class bboxes, with more than this IOU, will be thrown out
@@ -192,7 +289,12 @@ def detect_script_importable(
         project: str = 'runs/detect',        # saves results to project/name
         name: str = 'exp',                   # saves results to project/name
         exist_ok: bool = False,              # if True, existing project/name ok, do not increment. If False, will increment name with number if the project/name exists
-        no_trace: bool = False               # if True, do not trace the model
+        no_trace: bool = False,              # if True, do not trace the model
+        batch_size: int = 1,                 # number of images run through the model at once. Above 1, images are decoded and letterboxed on a thread pool ahead of the model (images only, no videos)
+        workers: int = 4,                    # number of threads decoding images when batch_size > 1
+        result_sinks: list = None,           # extra ResultSink-like objects that receive every image's detections (e.g. to write annotation files directly)
+        keep_loaded: bool = False,           # if True, keep the model loaded (and warm) in WARM_DETECTION_MODEL for the next call with the same weights
+        root: str = '.'                      # directory that relative weights/source/project paths are resolved against (instead of the current working directory)
 ):
     """
     This function was made by Thomas Hymel during LDV development in Oct 2023 to import the entire detect functionality.
@@ -209,6 +311,10 @@ def detect_script_importable(
         setattr(opt, arg, _locals[arg]) # Populate the Namespace object using the function arguments
 
     # At this point, the opt variable should be in the EXACT state as if it were loaded from the argparse method
+    # relative paths are taken relative to root, so callers never need to change the (process-wide) working directory
+    if isinstance(opt.source, (list, tuple)) or not (opt.source.isnumeric() or opt.source.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))):
+        opt.source = resolve_path(opt.source, opt.root)
+    opt.weights, opt.project = resolve_path(opt.weights, opt.root), resolve_path(opt.project, opt.root)
 
     # ------- COPIED FROM if __name__ == '__main__': ------- #
     print(opt)
@@ -219,8 +325,11 @@ def detect_script_importable(
             for opt.weights in ['yolov7.pt']:
                 cl_map, im2im  = detect(opt=opt)
                 strip_optimizer(opt.weights)
+        elif opt.keep_loaded:
+            with WARM_DETECTION_MODEL.lock:
+                cl_map, im2im = detect(opt=opt, detection_model=WARM_DETECTION_MODEL, result_sinks=opt.result_sinks or ())
         else:
-            cl_map, im2im = detect(opt=opt)
+            cl_map, im2im = detect(opt=opt, result_sinks=opt.result_sinks or ())
     
     return cl_map, im2im
 
@@ -244,6 +353,8 @@ if __name__ == '__main__':
     parser.add_argument('--name', default='exp', help='save results to project/name')
     parser.add_argument('--exist-ok', action='store_true', help='existing project/name ok, do not increment')
     parser.add_argument('--no-trace', action='store_true', help='don`t trace model')
+    parser.add_argument('--batch-size', type=int, default=1, help='images per forward pass, >1 decodes images on a thread pool')
+    parser.add_argument('--workers', type=int, default=4, help='image decoding threads when --batch-size > 1')
     opt = parser.parse_args()
     print(opt)
     #check_requirements(exclude=('pycocotools', 'thop'))
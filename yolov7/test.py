@@ -6,14 +6,15 @@ from threading import Thread
 
 import numpy as np
 import torch
+import torchvision
 import yaml
 from tqdm import tqdm
 
 from models.experimental import attempt_load
 from utils.datasets import create_dataloader
 from utils.general import coco80_to_coco91_class, check_dataset, check_file, check_img_size, check_requirements, \
-    box_iou, non_max_suppression, scale_coords, xyxy2xywh, xywh2xyxy, set_logging, increment_path, colorstr
-from utils.metrics import ap_per_class, ConfusionMatrix
+    box_iou, non_max_suppression, scale_coords, xyxy2xywh, xywh2xyxy, set_logging, increment_path, colorstr, resolve_path
+from utils.metrics import ap_per_class, match_predictions, ConfusionMatrix
 from utils.plots import plot_images, output_to_target, plot_study_txt
 from utils.torch_utils import select_device, time_synchronized, TracedModel
 
@@ -41,7 +42,8 @@ def test(data,
          trace=False,
          is_coco=False,
          v5_metric=False,
-         opt_through=None): # added for LDV compatibility
+         opt_through=None,  # added for LDV compatibility
+         progress_callback=None): # added for LDV, called as progress_callback(batches_done, num_batches) after every batch
     # opt var problem resolved
     if opt_through:  # if you passed the opt object through, assign it. Else assume it is in the namespace, as original test function as written
         opt = opt_through
@@ -58,6 +60,9 @@ def test(data,
         # Directories
         save_dir = Path(increment_path(Path(opt.project) / opt.name, exist_ok=opt.exist_ok))  # increment run
         (save_dir / 'labels' if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
+        if save_txt:  # with exist_ok the folder of an earlier run is reused, and label files are appended to
+            for f in (save_dir / 'labels').glob('*.txt'):
+                f.unlink()
 
         # Load model
         model = attempt_load(weights, map_location=device)  # load FP32 model
@@ -65,7 +70,7 @@ def test(data,
         imgsz = check_img_size(imgsz, s=gs)  # check img_size
         
         if trace:
-            model = TracedModel(model, device, imgsz)
+            model = TracedModel(model, device, imgsz, save_path=os.path.join(getattr(opt, 'root', '.'), 'traced_model.pt'))  # root is only set by test_script_importable
 
     # Half
     half = device.type != 'cpu' and half_precision  # half precision only supported on CUDA
@@ -187,35 +192,13 @@ def test(data,
             # Assign all predictions as incorrect
             correct = torch.zeros(pred.shape[0], niou, dtype=torch.bool, device=device)
             if nl:
-                detected = []  # target indices
-                tcls_tensor = labels[:, 0]
-
                 # target boxes
                 tbox = xywh2xyxy(labels[:, 1:5])
                 scale_coords(img[si].shape[1:], tbox, shapes[si][0], shapes[si][1])  # native-space labels
+                labelsn = torch.cat((labels[:, 0:1], tbox), 1)  # class, x1, y1, x2, y2
                 if plots:
-                    confusion_matrix.process_batch(predn, torch.cat((labels[:, 0:1], tbox), 1))
-
-                # Per target class
-                for cls in torch.unique(tcls_tensor):
-                    ti = (cls == tcls_tensor).nonzero(as_tuple=False).view(-1)  # prediction indices
-                    pi = (cls == pred[:, 5]).nonzero(as_tuple=False).view(-1)  # target indices
-
-                    # Search for detections
-                    if pi.shape[0]:
-                        # Prediction to target ious
-                        ious, i = box_iou(predn[pi, :4], tbox[ti]).max(1)  # best ious, indices
-
-                        # Append detections
-                        detected_set = set()
-                        for j in (ious > iouv[0]).nonzero(as_tuple=False):
-                            d = ti[i[j]]  # detected target
-                            if d.item() not in detected_set:
-                                detected_set.add(d.item())
-                                detected.append(d)
-                                correct[pi[j]] = ious[j] > iouv  # iou_thres is 1xn
-                                if len(detected) == nl:  # all targets already located in image
-                                    break
+                    confusion_matrix.process_batch(predn, labelsn)
+                correct = match_predictions(predn, labelsn, iouv)
 
             # Append statistics (correct, conf, pcls, tcls)
             stats.append((correct.cpu(), pred[:, 4].cpu(), pred[:, 5].cpu(), tcls))
@@ -227,6 +210,9 @@ def test(data,
             f = save_dir / f'test_batch{batch_i}_pred.jpg'  # predictions
             Thread(target=plot_images, args=(img, output_to_target(out), paths, f, names), daemon=True).start()
 
+        if progress_callback is not None:
+            progress_callback(batch_i + 1, len(dataloader))
+
     # Compute statistics
     stats = [np.concatenate(x, 0) for x in zip(*stats)]  # to numpy
     if len(stats) and stats[0].any():
@@ -295,6 +281,96 @@ def test(data,
         maps[c] = ap[i]
     return (mp, mr, map50, map, *(loss.cpu() / len(dataloader)).tolist()), maps, t
 
+def test_saved_predictions(pred_dir,
+                           targets,
+                           names,
+                           conf_thres=0.001,
+                           iou_thres=0.6,  # for NMS
+                           max_det=300,
+                           save_dir=None,  # for the confusion matrix and PR curve plots, not plotted if None
+                           v5_metric=False,
+                           verbose=False):
+    # Scores the predictions test() saved with save_txt and save_conf (a 'cls x y w h conf' line per box, normalized
+    # xywh) against targets again, without the model. The saved boxes already passed the conf threshold and NMS of the run
+    # that saved them, so only a higher conf_thres or a lower iou_thres changes them, boxes it dropped are not in the files.
+    # IoU does not change with the image scale, so normalized boxes do.
+    # targets: {file stem: (M, 5) class, x1, y1, x2, y2 normalized to the image}, one item per test image
+    # Returns (mp, mr, map50, map), maps, confusion_matrix, as test() minus the losses and times
+    names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else names
+    nc = len(names)
+    iouv = torch.linspace(0.5, 0.95, 10)  # iou vector for mAP@0.5:0.95
+    niou = iouv.numel()
+    plots = save_dir is not None
+    if plots:
+        Path(save_dir).mkdir(parents=True, exist_ok=True)
+
+    # Predictions of all images in one tensor, with the image index of each box
+    stems = list(targets)
+    x, xi = [], []
+    for si, stem in enumerate(stems):
+        f = Path(pred_dir) / f'{stem}.txt'
+        if f.exists():
+            with open(f) as fp:
+                l = np.array([line.split() for line in fp.read().strip().splitlines()], dtype=np.float32)  # cls, xywh, conf
+            if len(l):
+                assert l.ndim == 2 and l.shape[1] == 6, f'{f} has no confidences, predictions must be saved with save_conf'
+                x.append(l)
+                xi.append(np.full(len(l), si))
+    x = torch.from_numpy(np.concatenate(x, 0)) if x else torch.zeros((0, 6))
+    xi = torch.from_numpy(np.concatenate(xi, 0)).long() if xi else torch.zeros(0, dtype=torch.long)
+
+    # Confidence threshold and NMS of all images at once, batched_nms keeps the boxes of different images and classes apart
+    keep = x[:, 5] > conf_thres
+    x, xi = x[keep], xi[keep]
+    predn = torch.cat((xywh2xyxy(x[:, 1:5]), x[:, 5:6], x[:, 0:1]), 1)  # xyxy, conf, cls
+    i = torchvision.ops.batched_nms(predn[:, :4], predn[:, 4], xi * nc + predn[:, 5].long(), iou_thres)  # decreasing conf
+    i = i[(xi[i] * len(i) + torch.arange(len(i))).argsort()]  # grouped by image, decreasing conf within
+    counts = torch.bincount(xi[i], minlength=len(stems))
+    i = i[torch.arange(len(i)) - (counts.cumsum(0) - counts)[xi[i]] < max_det]  # limit detections per image
+    predn, ends = predn[i], torch.bincount(xi[i], minlength=len(stems)).cumsum(0).tolist()
+
+    # Statistics per image
+    confusion_matrix = ConfusionMatrix(nc=nc)
+    stats = []
+    for si, stem in enumerate(stems):
+        labels = torch.as_tensor(targets[stem], dtype=torch.float32).view(-1, 5)
+        tcls = labels[:, 0].tolist()
+        pred = predn[ends[si - 1] if si else 0:ends[si]]
+        if len(pred) == 0:
+            if len(labels):
+                stats.append((torch.zeros(0, niou, dtype=torch.bool), torch.Tensor(), torch.Tensor(), tcls))
+            continue
+        if len(labels) and plots:
+            confusion_matrix.process_batch(pred, labels)
+        stats.append((match_predictions(pred, labels, iouv), pred[:, 4], pred[:, 5], tcls))
+
+    # Compute statistics
+    p, r, f1, mp, mr, map50, map = 0., 0., 0., 0., 0., 0., 0.
+    ap, ap_class = [], []
+    stats = [np.concatenate(x, 0) for x in zip(*stats)]  # to numpy
+    if len(stats) and stats[0].any():
+        p, r, ap, f1, ap_class = ap_per_class(*stats, plot=plots, v5_metric=v5_metric, save_dir=save_dir, names=names)
+        ap50, ap = ap[:, 0], ap.mean(1)  # AP@0.5, AP@0.5:0.95
+        mp, mr, map50, map = p.mean(), r.mean(), ap50.mean(), ap.mean()
+        nt = np.bincount(stats[3].astype(np.int64), minlength=nc)  # number of targets per class
+    else:
+        nt = torch.zeros(1)
+
+    # Print results
+    print(('%20s' + '%12s' * 6) % ('Class', 'Images', 'Labels', 'P', 'R', 'mAP@.5', 'mAP@.5:.95'))
+    pf = '%20s' + '%12i' * 2 + '%12.3g' * 4  # print format
+    print(pf % ('all', len(stems), nt.sum(), mp, mr, map50, map))
+    if (verbose or nc < 50) and nc > 1 and len(stats):
+        for i, c in enumerate(ap_class):
+            print(pf % (names[c], len(stems), nt[c], p[i], r[i], ap50[i], ap[i]))
+
+    if plots:
+        confusion_matrix.plot(save_dir=save_dir, names=list(names.values()))
+    maps = np.zeros(nc) + map
+    for i, c in enumerate(ap_class):
+        maps[c] = ap[i]
+    return (mp, mr, map50, map), maps, confusion_matrix
+
 import inspect
 def test_script_importable(
         weights: str = 'yolov7.pt',    # weights path to load
@@ -317,6 +393,8 @@ def test_script_importable(
         exist_ok: bool = False,        # if True, the existing project/name will be overwritten. If False, increment with number when encountering the same name
         no_trace: bool = False,        # if True, do not trace the model
         v5_metric: bool = False,       # if True, assume maximum recall as 1.0 in AP calculations
+        progress_callback = None,      # called as progress_callback(batches_done, num_batches) after every test batch
+        root: str = '.',               # directory that relative weights/data/project paths are resolved against (instead of the current working directory)
 ):
     """
     This function was made by Thomas Hymel during LDV development in Oct 2023 to import the entire test functionality.
@@ -333,6 +411,8 @@ def test_script_importable(
         setattr(opt, arg, _locals[arg]) # Populate the Namespace object using the function arguments
 
     # At this point, the opt variable should be in the EXACT state as if it were loaded from the argparse method
+    # relative paths are taken relative to root, so callers never need to change the (process-wide) working directory
+    opt.weights, opt.data, opt.project = resolve_path(opt.weights, opt.root), resolve_path(opt.data, opt.root), resolve_path(opt.project, opt.root)
     opt.data = check_file(opt.data)  # check file
     print(opt)
     #check_requirements()
@@ -353,7 +433,8 @@ def test_script_importable(
              save_conf=opt.save_conf,
              trace=not opt.no_trace,
              v5_metric=opt.v5_metric,
-             opt_through=opt    # added as a object existence/information flag to pass through the opt variable instead of assuming it is in the namespace already
+             opt_through=opt,    # added as a object existence/information flag to pass through the opt variable instead of assuming it is in the namespace already
+             progress_callback=opt.progress_callback
              )
 
     elif opt.task == 'speed':  # speed benchmarks
@@ -25,20 +25,22 @@ import test  # import test.py to get mAP after each epoch
 from models.experimental import attempt_load
 from models.yolo import Model
 from utils.autoanchor import check_anchors
-from utils.datasets import create_dataloader
+from utils.datasets import create_dataloader, dataset_fingerprint
 from utils.general import labels_to_class_weights, increment_path, labels_to_image_weights, init_seeds, \
     fitness, strip_optimizer, get_latest_run, check_dataset, check_file, check_git_status, check_img_size, \
-    check_requirements, print_mutation, set_logging, one_cycle, colorstr
+    check_requirements, print_mutation, set_logging, one_cycle, colorstr, resolve_path, file_checksum
 from utils.google_utils import attempt_download
 from utils.loss import ComputeLoss, ComputeLossOTA
+from utils.model_registry import update_model_registry
 from utils.plots import plot_images, plot_labels, plot_results, plot_evolution
-from utils.torch_utils import ModelEMA, select_device, intersect_dicts, torch_distributed_zero_first, is_parallel
+from utils.torch_utils import ModelEMA, ValidationScheduler, select_device, intersect_dicts, remap_head_classes, \
+    torch_distributed_zero_first, is_parallel
 from utils.wandb_logging.wandb_utils import WandbLogger, check_wandb_resume
 
 logger = logging.getLogger(__name__)
 
 
-def train(hyp, opt, device, tb_writer=None):
+def train(hyp, opt, device, tb_writer=None, epoch_callback=None):
     logger.info(colorstr('hyperparameters: ') + ', '.join(f'{k}={v}' for k, v in hyp.items()))
     save_dir, epochs, batch_size, total_batch_size, weights, rank, freeze = \
         Path(opt.save_dir), opt.epochs, opt.batch_size, opt.total_batch_size, opt.weights, opt.global_rank, opt.freeze
@@ -88,6 +90,9 @@ def train(hyp, opt, device, tb_writer=None):
         model = Model(opt.cfg or ckpt['model'].yaml, ch=3, nc=nc, anchors=hyp.get('anchors')).to(device)  # create
         exclude = ['anchor'] if (opt.cfg or hyp.get('anchors')) and not opt.resume else []  # exclude keys
         state_dict = ckpt['model'].float().state_dict()  # to FP32
+        old_names = getattr(ckpt['model'], 'names', None)
+        if getattr(opt, 'remap_head', False) and old_names is not None and list(old_names) != list(names) and not opt.resume:
+            state_dict = remap_head_classes(state_dict, model, old_names, names)  # keep the head outputs of known classes
         state_dict = intersect_dicts(state_dict, model.state_dict(), exclude=exclude)  # intersect
         model.load_state_dict(state_dict, strict=False)  # load
         logger.info('Transferred %g/%g items from %s' % (len(state_dict), len(model.state_dict()), weights))  # report
@@ -242,10 +247,14 @@ def train(hyp, opt, device, tb_writer=None):
         logger.info('Using SyncBatchNorm()')
 
     # Trainloader
+    replay = set(getattr(opt, 'replay_images', None) or [])  # image file names to oversample
     dataloader, dataset = create_dataloader(train_path, imgsz, batch_size, gs, opt,
                                             hyp=hyp, augment=True, cache=opt.cache_images, rect=opt.rect, rank=rank,
                                             world_size=opt.world_size, workers=opt.workers,
-                                            image_weights=opt.image_weights, quad=opt.quad, prefix=colorstr('train: '))
+                                            image_weights=opt.image_weights or bool(replay), quad=opt.quad, prefix=colorstr('train: '))
+    if replay:
+        rw = np.array([opt.replay_weight if Path(f).name in replay else 1.0 for f in dataset.img_files])  # replay weights
+        logger.info(f'Oversampling {int((rw != 1.0).sum())}/{dataset.n} replay images {opt.replay_weight:g}x')
     mlc = np.concatenate(dataset.labels, 0)[:, 0].max()  # max label class
     nb = len(dataloader)  # number of batches
     assert mlc < nc, 'Label class %g exceeds nc=%g in %s. Possible class labels are 0-%g' % (mlc, nc, opt.data, nc - 1)
@@ -296,6 +305,12 @@ def train(hyp, opt, device, tb_writer=None):
     maps = np.zeros(nc)  # mAP per class
     results = (0, 0, 0, 0, 0, 0, 0)  # P, R, mAP@.5, mAP@.5-.95, val_loss(box, obj, cls)
     scheduler.last_epoch = start_epoch - 1  # do not move
+    # validation epochs and early stopping (getattr, opt.yaml files of runs started before these options lack them)
+    val_scheduler = ValidationScheduler(epochs, interval=getattr(opt, 'val_interval', 1),
+                                        dense_epochs=getattr(opt, 'val_dense_epochs', 0),
+                                        patience=getattr(opt, 'patience', 0),
+                                        best_fitness=best_fitness, best_epoch=start_epoch - 1)
+    fi, stop = 0.0, False
     scaler = amp.GradScaler(enabled=cuda)
     compute_loss_ota = ComputeLossOTA(model)  # init loss class
     compute_loss = ComputeLoss(model)  # init loss class
@@ -308,11 +323,15 @@ def train(hyp, opt, device, tb_writer=None):
         model.train()
 
         # Update image weights (optional)
-        if opt.image_weights:
+        if opt.image_weights or replay:
             # Generate indices
             if rank in [-1, 0]:
-                cw = model.class_weights.cpu().numpy() * (1 - maps) ** 2 / nc  # class weights
-                iw = labels_to_image_weights(dataset.labels, nc=nc, class_weights=cw)  # image weights
+                iw = np.ones(dataset.n)  # image weights
+                if opt.image_weights:
+                    cw = model.class_weights.cpu().numpy() * (1 - maps) ** 2 / nc  # class weights
+                    iw = labels_to_image_weights(dataset.labels, nc=nc, class_weights=cw)  # image weights
+                if replay:
+                    iw = iw * rw  # oversample replay images
                 dataset.indices = random.choices(range(dataset.n), weights=iw, k=dataset.n)  # rand weighted idx
             # Broadcast if DDP
             if rank != -1:
@@ -410,7 +429,11 @@ def train(hyp, opt, device, tb_writer=None):
             # mAP
             ema.update_attr(model, include=['yaml', 'nc', 'hyp', 'gr', 'names', 'stride', 'class_weights'])
             final_epoch = epoch + 1 == epochs
-            if not opt.notest or final_epoch:  # Calculate mAP
+            # added for LDV, reports the finished epoch and lets the caller stop training early. The epoch training stops
+            # after is validated and saved like the final one, so the run always has a best.pt
+            stop_requested = epoch_callback is not None and epoch_callback(epoch, epochs, results)
+            validated = final_epoch or stop_requested or (not opt.notest and val_scheduler.validate(epoch))
+            if validated:  # Calculate mAP
                 wandb_logger.current_epoch = epoch + 1
                 results, maps, times = test.test(data_dict,
                                                  batch_size=batch_size * 2,
@@ -443,14 +466,18 @@ def train(hyp, opt, device, tb_writer=None):
                 if wandb_logger.wandb:
                     wandb_logger.log({tag: x})  # W&B
 
-            # Update best mAP
-            fi = fitness(np.array(results).reshape(1, -1))  # weighted combination of [P, R, mAP@.5, mAP@.5-.95]
-            if fi > best_fitness:
-                best_fitness = fi
-            wandb_logger.end_epoch(best_result=best_fitness == fi)
+            # Update best mAP, only on validated epochs (results of the others are the last validated ones)
+            is_best = False
+            if validated:
+                fi = fitness(np.array(results).reshape(1, -1))  # weighted combination of [P, R, mAP@.5, mAP@.5-.95]
+                if fi > best_fitness:
+                    best_fitness = fi
+                is_best = best_fitness == fi
+                stop = val_scheduler.step(epoch, fi)
+            wandb_logger.end_epoch(best_result=is_best)
 
             # Save model
-            if (not opt.nosave) or (final_epoch and not opt.evolve):  # if save
+            if (not opt.nosave) or ((final_epoch or stop_requested) and not opt.evolve):  # if save
                 ckpt = {'epoch': epoch,
                         'best_fitness': best_fitness,
                         'training_results': results_file.read_text(),
@@ -462,7 +489,7 @@ def train(hyp, opt, device, tb_writer=None):
 
                 # Save last, best and delete
                 torch.save(ckpt, last)  # always overwrites the just finished epoch in "last.pt"
-                if best_fitness == fi:  # overwrites the "best.pt" file if this is the best fitness, which is determined almost entirely by mAP0.5-0.95 metric of validation set
+                if is_best:  # overwrites the "best.pt" file if this is the best fitness, which is determined almost entirely by mAP0.5-0.95 metric of validation set
                     torch.save(ckpt, best)
                 # for the general LDV use case, we don't want to fill up storage with extra model checkpoints. Ultimately only one checkpoint will be "the model" for this run, and that will likely be "best.pt"
                 ''' 
@@ -478,9 +505,15 @@ def train(hyp, opt, device, tb_writer=None):
                 if wandb_logger.wandb:
                     if ((epoch + 1) % opt.save_period == 0 and not final_epoch) and opt.save_period != -1:
                         wandb_logger.log_model(
-                            last.parent, opt, epoch, fi, best_model=best_fitness == fi)
+                            last.parent, opt, epoch, fi, best_model=is_best)
                 del ckpt
 
+            if stop_requested:
+                logger.info(f'Training stopped early after epoch {epoch}')
+                break
+            if stop:  # patience ran out
+                break
+
         # end epoch ----------------------------------------------------------------------------------------------------
     # end training
     if rank in [-1, 0]:
@@ -516,6 +549,18 @@ def train(hyp, opt, device, tb_writer=None):
                 strip_optimizer(f)  # strip optimizers
         if opt.bucket:
             os.system(f'gsutil cp {final} gs://{opt.bucket}/weights')  # upload
+        if getattr(opt, 'model_registry', '') and not opt.evolve and final.exists():  # record the run for model selection
+            update_model_registry(opt.model_registry, save_dir.name, {
+                'best_fitness': float(np.max(best_fitness)),  # fitness of best.pt on the validation set
+                'best_epoch': int(val_scheduler.best_epoch),
+                'epochs': epoch + 1,
+                'names': list(names),
+                'img_size': list(opt.img_size),
+                'dataset': dataset_fingerprint(dataset),
+                'val_dataset': dataset_fingerprint(testloader.dataset),  # equal fingerprints, comparable fitnesses
+                'weights': str(final.relative_to(save_dir)),
+                'weights_sha256': file_checksum(final),
+                'time': time.time()})
         if wandb_logger.wandb and not opt.evolve:  # Log the stripped model
             wandb_logger.wandb.log_artifact(str(final), type='model',
                                             name='run_' + wandb_logger.wandb_run.id + '_model',
@@ -539,10 +584,13 @@ def train_script_importable(
         resume = False,                       # resume most recent training. Can be False, True, or a str path to a different training folder
         nosave: bool = False,                 # if True, save only final checkpoint
         notest: bool = False,                 # if True, test only final epoch
+        val_interval: int = 1,                # validate every "val_interval" epochs (the final epoch is always validated)
+        val_dense_epochs: int = 0,            # validate every one of the last "val_dense_epochs" epochs, regardless of val_interval
+        patience: int = 0,                    # stop training after this many epochs without a better fitness (see utils.general.fitness). 0 disables early stopping
         noautoanchor: bool = False,           # if True, disable the autoanchor check
         evolve: bool = False,                 # evolve hyperparameters
         bucket: str = '',                     # gsutil bucket
-        cache_images: bool = False,           # if True, cache images for faster training
+        cache_images = False,                 # cache images for faster training: False, True/'ram' (in RAM), 'disk' or 'mmap' (one memory-mapped file next to the images, shared by all dataloader workers)
         image_weights: bool = False,          # if True, use weighted image selection for training
         device = '',                          # cuda device, i.e. 0 or 0,1,2,3 or cpu
         multi_scale: bool = False,            # if True, vary image size by -+ 50% (as determined by hyperparameter.yaml file)
@@ -563,7 +611,13 @@ def train_script_importable(
         save_period: int = -1,                # log after every "save_period" epoch
         artifact_alias: str = "latest",       # version of dataset artifact to be used
         freeze = [0],                         # list of Freeze layers: backbone of yolov7=50, first3=0 1 2'
-        v5_metric: bool = False               # if True, assume maximum recall as 1.0 in AP calculation
+        v5_metric: bool = False,              # if True, assume maximum recall as 1.0 in AP calculation
+        remap_head: bool = False,             # if True, the detection head outputs of weights are carried over by class name when the class list changed (fine-tuning a trained model after adding classes)
+        replay_images = None,                 # list of training image file names (e.g. recently added images) to oversample, see replay_weight
+        replay_weight: float = 3.0,           # sampling weight of the replay_images relative to the other training images
+        model_registry: str = '',             # JSON file the finished run is recorded in (best fitness, class names, dataset fingerprints, weights checksum), '' to skip
+        epoch_callback = None,                # called as epoch_callback(epoch, epochs, results) after every epoch, with the results of the last validated one. Returning True validates this epoch and stops training
+        root: str = '.'                       # directory that relative weights/cfg/data/hyp/project paths are resolved against (instead of the current working directory)
 
 ):
     """
@@ -579,8 +633,12 @@ def train_script_importable(
     _locals = locals()
     for arg in arg_names:
         setattr(opt, arg, _locals[arg]) # Populate the Namespace object using the function arguments
+    delattr(opt, 'epoch_callback')  # not a real train.py option, and opt gets dumped to opt.yaml
 
     # At this point, the opt variable should be in the EXACT state as if it were loaded from the argparse method
+    # relative paths are taken relative to root, so callers never need to change the (process-wide) working directory
+    for path_arg in ('weights', 'cfg', 'data', 'hyp', 'project', 'model_registry'):
+        setattr(opt, path_arg, resolve_path(getattr(opt, path_arg), opt.root))
 
 
     # ------- COPIED FROM if __name__ == '__main__': ------- #
@@ -595,7 +653,7 @@ def train_script_importable(
     # Resume
     wandb_run = check_wandb_resume(opt)
     if opt.resume and not wandb_run:  # resume an interrupted run
-        ckpt = opt.resume if isinstance(opt.resume, str) else get_latest_run()  # specified or most recent path
+        ckpt = resolve_path(opt.resume, opt.root) if isinstance(opt.resume, str) else get_latest_run(opt.root)  # specified or most recent path
         assert os.path.isfile(ckpt), 'ERROR: --resume checkpoint does not exist'
         apriori = opt.global_rank, opt.local_rank
         with open(Path(ckpt).parent.parent / 'opt.yaml') as f:
@@ -633,7 +691,7 @@ def train_script_importable(
             prefix = colorstr('tensorboard: ')
             logger.info(f"{prefix}Start with 'tensorboard --logdir {opt.project}', view at http://localhost:6006/")
             tb_writer = SummaryWriter(opt.save_dir)  # Tensorboard
-        train(hyp, opt, device, tb_writer)
+        train(hyp, opt, device, tb_writer, epoch_callback=epoch_callback)
 
     # Evolve hyperparameters (optional)
     else:
@@ -737,10 +795,13 @@ if __name__ == '__main__':
     parser.add_argument('--resume', nargs='?', const=True, default=False, help='resume most recent training')
     parser.add_argument('--nosave', action='store_true', help='only save final checkpoint')
     parser.add_argument('--notest', action='store_true', help='only test final epoch')
+    parser.add_argument('--val-interval', type=int, default=1, help='validate every N epochs')
+    parser.add_argument('--val-dense-epochs', type=int, default=0, help='validate every one of the last N epochs')
+    parser.add_argument('--patience', type=int, default=0, help='early stopping patience in epochs, 0 disables it')
     parser.add_argument('--noautoanchor', action='store_true', help='disable autoanchor check')
     parser.add_argument('--evolve', action='store_true', help='evolve hyperparameters')
     parser.add_argument('--bucket', type=str, default='', help='gsutil bucket')
-    parser.add_argument('--cache-images', action='store_true', help='cache images for faster training')
+    parser.add_argument('--cache-images', nargs='?', const='ram', default=False, help='cache images for faster training: ram (default), disk or mmap')
     parser.add_argument('--image-weights', action='store_true', help='use weighted image selection for training')
     parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
     parser.add_argument('--multi-scale', action='store_true', help='vary img-size +/- 50%%')
@@ -762,6 +823,10 @@ if __name__ == '__main__':
     parser.add_argument('--artifact_alias', type=str, default="latest", help='version of dataset artifact to be used')
     parser.add_argument('--freeze', nargs='+', type=int, default=[0], help='Freeze layers: backbone of yolov7=50, first3=0 1 2')
     parser.add_argument('--v5-metric', action='store_true', help='assume maximum recall as 1.0 in AP calculation')
+    parser.add_argument('--remap-head', action='store_true', help='carry the head outputs of --weights over by class name')
+    parser.add_argument('--replay-images', nargs='+', default=None, help='training image file names to oversample')
+    parser.add_argument('--replay-weight', type=float, default=3.0, help='sampling weight of --replay-images')
+    parser.add_argument('--model-registry', type=str, default='', help='JSON file the finished run is recorded in')
     opt = parser.parse_args()
 
     # Set DDP variables
@@ -1,6 +1,7 @@
 # Dataset utils and dataloaders
 
 import glob
+import hashlib
 import logging
 import math
 import os
@@ -8,6 +9,7 @@ import random
 import shutil
 import time
 from itertools import repeat
+from multiprocessing import Pool
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
 from threading import Thread
@@ -35,6 +37,7 @@ help_url = 'https://github.com/ultralytics/yolov5/wiki/Train-Custom-Data'
 img_formats = ['bmp', 'jpg', 'jpeg', 'png', 'tif', 'tiff', 'dng', 'webp', 'mpo']  # acceptable image suffixes
 vid_formats = ['mov', 'avi', 'mp4', 'mpg', 'mpeg', 'm4v', 'wmv', 'mkv']  # acceptable video suffixes
 logger = logging.getLogger(__name__)
+LABEL_CACHE_VERSION = 0.2  # columnar NumPy label cache with per-file mtime/size, older caches are rebuilt
 
 # Get orientation exif tag
 for orientation in ExifTags.TAGS.keys():
@@ -47,6 +50,15 @@ def get_hash(files):
     return sum(os.path.getsize(f) for f in files if os.path.isfile(f))
 
 
+def dataset_fingerprint(dataset):
+    # Returns a hash of the image file names and labels of a LoadImagesAndLabels dataset, independent of their order
+    h = hashlib.md5()
+    for name, labels in sorted(zip((Path(f).name for f in dataset.img_files), dataset.labels), key=lambda x: x[0]):
+        h.update(name.encode('utf-8'))
+        h.update(np.ascontiguousarray(labels, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
 def exif_size(img):
     # Returns exif-corrected PIL size
     s = img.size  # (width, height)
@@ -127,15 +139,18 @@ class _RepeatSampler(object):
 
 class LoadImages:  # for inference
     def __init__(self, path, img_size=640, stride=32):
-        p = str(Path(path).absolute())  # os-agnostic absolute path
-        if '*' in p:
-            files = sorted(glob.glob(p, recursive=True))  # glob
-        elif os.path.isdir(p):
-            files = sorted(glob.glob(os.path.join(p, '*.*')))  # dir
-        elif os.path.isfile(p):
-            files = [p]  # files
+        if isinstance(path, (list, tuple)):  # added for LDV, an explicit list of files
+            p, files = f'{len(path)} listed files', sorted(str(Path(x).absolute()) for x in path)
         else:
-            raise Exception(f'ERROR: {p} does not exist')
+            p = str(Path(path).absolute())  # os-agnostic absolute path
+            if '*' in p:
+                files = sorted(glob.glob(p, recursive=True))  # glob
+            elif os.path.isdir(p):
+                files = sorted(glob.glob(os.path.join(p, '*.*')))  # dir
+            elif os.path.isfile(p):
+                files = [p]  # files
+            else:
+                raise Exception(f'ERROR: {p} does not exist')
 
         images = [x for x in files if x.split('.')[-1].lower() in img_formats]
         videos = [x for x in files if x.split('.')[-1].lower() in vid_formats]
@@ -205,6 +220,80 @@ class LoadImages:  # for inference
         return self.nf  # number of files
 
 
+class LoadImagesBatched:  # for batched inference
+    # Decodes and letterboxes images on a thread pool, a few batches ahead of the consumer, and yields them in batches.
+    # Letterboxed images of the same (stride-multiple, rect-style) shape share a bucket, so every batch stacks without
+    # extra padding. At most batch_size * prefetch images wait in the buckets, beyond that the fullest bucket is yielded
+    # as a partial batch, so folders of mixed capture shapes do not keep every decoded image. Images only, videos are
+    # left to LoadImages
+    def __init__(self, path, img_size=640, stride=32, batch_size=8, workers=4, prefetch=2):
+        if isinstance(path, (list, tuple)):  # added for LDV, an explicit list of files
+            p, files = f'{len(path)} listed files', sorted(str(Path(x).absolute()) for x in path)
+        else:
+            p = str(Path(path).absolute())  # os-agnostic absolute path
+            if '*' in p:
+                files = sorted(glob.glob(p, recursive=True))  # glob
+            elif os.path.isdir(p):
+                files = sorted(glob.glob(os.path.join(p, '*.*')))  # dir
+            elif os.path.isfile(p):
+                files = [p]  # files
+            else:
+                raise Exception(f'ERROR: {p} does not exist')
+
+        self.img_size = img_size
+        self.stride = stride
+        self.batch_size = max(batch_size, 1)
+        self.workers = max(workers, 1)
+        self.prefetch = max(prefetch, 1)  # number of batches decoded ahead of the consumer
+        self.files = [x for x in files if x.split('.')[-1].lower() in img_formats]
+        self.nf = len(self.files)  # number of files
+        self.mode = 'image'
+        assert self.nf > 0, f'No images found in {p}. Supported formats are:\nimages: {img_formats}'
+
+    def load(self, path):
+        img0 = cv2.imread(path)  # BGR
+        assert img0 is not None, 'Image Not Found ' + path
+
+        # Padded resize
+        img = letterbox(img0, self.img_size, stride=self.stride)[0]
+
+        # Convert
+        img = img[:, :, ::-1].transpose(2, 0, 1)  # BGR to RGB, to 3x416x416
+        return path, np.ascontiguousarray(img), img0
+
+    def __iter__(self):
+        # yields (paths, imgs, img0s, None) with imgs a (n, 3, h, w) uint8 array, n <= batch_size
+        buckets = {}  # letterboxed shape -> [(path, img, img0), ...]
+        window = self.batch_size * self.prefetch  # images decoded per pool submission
+        with ThreadPool(self.workers) as pool:
+            pending = []
+            for i in range(0, self.nf, window):
+                pending.append(pool.map_async(self.load, self.files[i:i + window]))
+                if len(pending) > 1:  # the next window keeps decoding while this one is consumed
+                    yield from self.fill_buckets(pending.pop(0).get(), buckets)
+            for result in pending:
+                yield from self.fill_buckets(result.get(), buckets)
+        for bucket in buckets.values():  # leftovers, one partial batch per shape
+            yield self.collate(bucket)
+
+    def fill_buckets(self, items, buckets):
+        for item in items:
+            shape = item[1].shape
+            buckets.setdefault(shape, []).append(item)
+            if len(buckets[shape]) == self.batch_size:
+                yield self.collate(buckets.pop(shape))
+            elif sum(len(bucket) for bucket in buckets.values()) > self.batch_size * self.prefetch:
+                yield self.collate(buckets.pop(max(buckets, key=lambda k: len(buckets[k]))))  # fullest, oldest first on ties
+
+    @staticmethod
+    def collate(bucket):
+        paths, imgs, img0s = zip(*bucket)
+        return list(paths), np.stack(imgs, 0), list(img0s), None
+
+    def __len__(self):
+        return self.nf  # number of files
+
+
 class LoadWebcam:  # for inference
     def __init__(self, pipe='0', img_size=640, stride=32):
         self.img_size = img_size
@@ -350,6 +439,104 @@ def img2label_paths(img_paths):
     return ['txt'.join(x.replace(sa, sb, 1).rsplit(x.split('.')[-1], 1)) for x in img_paths]
 
 
+def file_stat(path):
+    # Returns (mtime_ns, size) of a file, (-1, -1) if it does not exist
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return -1, -1
+
+
+def verify_image(im_file):
+    # Returns (exif corrected (width, height), None) for a valid image, (None, error message) otherwise
+    try:
+        im = Image.open(im_file)
+        im.verify()  # PIL verify
+        shape = exif_size(im)  # image size
+        assert (shape[0] > 9) & (shape[1] > 9), f'image size {shape} <10 pixels'
+        assert im.format.lower() in img_formats, f'invalid image format {im.format}'
+        return shape, None
+    except Exception as e:
+        return None, str(e)
+
+
+def read_label_file(lb_file):
+    # Returns (labels (n, 5) cls-xywh, segments, state, error message), state is 0 missing, 1 found, 2 found but empty
+    try:
+        segments = []  # instance segments
+        if not os.path.isfile(lb_file):
+            return np.zeros((0, 5), dtype=np.float32), segments, 0, None  # label missing
+        with open(lb_file, 'r') as f:
+            l = [x.split() for x in f.read().strip().splitlines()]
+            if any([len(x) > 8 for x in l]):  # is segment
+                classes = np.array([x[0] for x in l], dtype=np.float32)
+                segments = [np.array(x[1:], dtype=np.float32).reshape(-1, 2) for x in l]  # (cls, xy1...)
+                l = np.concatenate((classes.reshape(-1, 1), segments2boxes(segments)), 1)  # (cls, xywh)
+            l = np.array(l, dtype=np.float32)
+        if len(l):
+            assert l.shape[1] == 5, 'labels require 5 columns each'
+            assert (l >= 0).all(), 'negative labels'
+            assert (l[:, 1:] <= 1).all(), 'non-normalized or out of bounds coordinate labels'
+            assert np.unique(l, axis=0).shape[0] == l.shape[0], 'duplicate labels'
+            return l, segments, 1, None
+        return np.zeros((0, 5), dtype=np.float32), segments, 2, None  # label empty
+    except Exception as e:
+        return np.zeros((0, 5), dtype=np.float32), [], 1, str(e)
+
+
+def scan_image_and_label(args):
+    # Process pool worker of LoadImagesAndLabels.cache_labels, only redoes the checks whose file changed
+    im_file, lb_file, check_image, check_label = args
+    return (verify_image(im_file) if check_image else None), (read_label_file(lb_file) if check_label else None)
+
+
+def save_label_cache(path, cache):
+    # Stores the label cache dict column by column in a NumPy .npz, which loads without unpickling anything
+    files = list(cache['files'])
+    labels, segments = cache['labels'], cache['segments']
+    seg_list = [s for segs in segments for s in segs]
+    arrays = {'version': np.array(LABEL_CACHE_VERSION),
+              'files': np.frombuffer('\n'.join(files).encode('utf-8'), dtype=np.uint8),
+              'num_files': np.array(len(files)),
+              'img_stat': np.array(cache['img_stat'], dtype=np.int64).reshape(-1, 2),
+              'lb_stat': np.array(cache['lb_stat'], dtype=np.int64).reshape(-1, 2),
+              'shapes': np.array(cache['shapes'], dtype=np.int64).reshape(-1, 2),
+              'img_ok': np.array(cache['img_ok'], dtype=bool),
+              'lb_state': np.array(cache['lb_state'], dtype=np.int8),
+              'lb_ok': np.array(cache['lb_ok'], dtype=bool),
+              'label_counts': np.array([len(l) for l in labels], dtype=np.int64),
+              'labels': np.concatenate(labels, 0) if labels else np.zeros((0, 5), dtype=np.float32),
+              'segment_counts': np.array([len(segs) for segs in segments], dtype=np.int64),
+              'segment_sizes': np.array([len(s) for s in seg_list], dtype=np.int64),
+              'segment_points': np.concatenate(seg_list, 0) if seg_list else np.zeros((0, 2), dtype=np.float32)}
+    tmp_path = str(path) + '.tmp'
+    with open(tmp_path, 'wb') as f:  # np.savez would append .npz to a path
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)  # never leave a half written cache behind
+
+
+def load_label_cache(path):
+    # Inverse of save_label_cache, returns None if there is no usable cache at path
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if float(data['version']) != LABEL_CACHE_VERSION:
+                return None
+            n = int(data['num_files'])
+            files = bytes(data['files']).decode('utf-8').split('\n') if n else []
+            labels = np.split(data['labels'], np.cumsum(data['label_counts'])[:-1]) if n else []
+            seg_points = np.split(data['segment_points'], np.cumsum(data['segment_sizes'])[:-1]) \
+                if len(data['segment_sizes']) else []
+            seg_bounds = np.concatenate(([0], np.cumsum(data['segment_counts'])))
+            segments = [seg_points[seg_bounds[i]:seg_bounds[i + 1]] for i in range(n)]
+            return {'files': files, 'img_stat': data['img_stat'].tolist(), 'lb_stat': data['lb_stat'].tolist(),
+                    'shapes': data['shapes'].tolist(), 'img_ok': data['img_ok'].tolist(),
+                    'lb_state': data['lb_state'].tolist(), 'lb_ok': data['lb_ok'].tolist(),
+                    'labels': labels, 'segments': segments}
+    except Exception:  # missing, an old pickled cache, or damaged
+        return None
+
+
 class LoadImagesAndLabels(Dataset):  # for training/testing
     def __init__(self, path, img_size=640, batch_size=16, augment=False, hyp=None, rect=False, image_weights=False,
                  cache_images=False, single_cls=False, stride=32, pad=0.0, prefix=''):
@@ -388,12 +575,7 @@ class LoadImagesAndLabels(Dataset):  # for training/testing
         # Check cache
         self.label_files = img2label_paths(self.img_files)  # labels
         cache_path = (p if p.is_file() else Path(self.label_files[0]).parent).with_suffix('.cache')  # cached labels
-        if cache_path.is_file():
-            cache, exists = torch.load(cache_path), True  # load
-            #if cache['hash'] != get_hash(self.label_files + self.img_files) or 'version' not in cache:  # changed
-            #    cache, exists = self.cache_labels(cache_path, prefix), False  # re-cache
-        else:
-            cache, exists = self.cache_labels(cache_path, prefix), False  # cache
+        cache, exists = self.cache_labels(cache_path, prefix)  # only images/labels added or changed since the cache was made are scanned
 
         # Display cache
         nf, nm, ne, nc, n = cache.pop('results')  # found, missing, empty, corrupted, total
@@ -403,8 +585,6 @@ class LoadImagesAndLabels(Dataset):  # for training/testing
         assert nf > 0 or not augment, f'{prefix}No labels in {cache_path}. Can not train without labels. See {help_url}'
 
         # Read cache
-        cache.pop('hash')  # remove hash
-        cache.pop('version')  # remove version
         labels, shapes, self.segments = zip(*cache.values())
         self.labels = list(labels)
         self.shapes = np.array(shapes, dtype=np.float64)
@@ -447,7 +627,12 @@ class LoadImagesAndLabels(Dataset):  # for training/testing
 
         # Cache images into memory for faster training (WARNING: large datasets may exceed system RAM)
         self.imgs = [None] * n
-        if cache_images:
+        self.img_shard = None
+        if cache_images == 'mmap':  # one memory-mapped file shared by all dataloader workers through the OS page cache
+            img_shard = ImageShardCache(Path(self.img_files[0]).parent.as_posix() + '_cache.mmap')
+            img_shard.update(self, prefix)
+            self.img_shard = img_shard  # only now, load_image above still had to decode
+        elif cache_images:
             if cache_images == 'disk':
                 self.im_cache_dir = Path(Path(self.img_files[0]).parent.as_posix() + '_npy')
                 self.img_npy = [self.im_cache_dir / Path(f).with_suffix('.npy').name for f in self.img_files]
@@ -469,58 +654,70 @@ class LoadImagesAndLabels(Dataset):  # for training/testing
 
     def cache_labels(self, path=Path('./labels.cache'), prefix=''):
         # Cache dataset labels, check images and read shapes
+        # Every image and label file is checked against the mtime/size stored in the cache, so only files that were added
+        # or changed are verified (on a process pool) again. Returns the cache dict and whether nothing had to be scanned
+        old = load_label_cache(path)
+        old_rows = {f: i for i, f in enumerate(old['files'])} if old is not None else {}
+        img_stats = [file_stat(f) for f in self.img_files]
+        lb_stats = [file_stat(f) for f in self.label_files]
+
+        rows, jobs = [], []  # row of each file in the old cache (or None), and its (im_file, lb_file, check_image, check_label)
+        for im_file, lb_file, img_stat, lb_stat in zip(self.img_files, self.label_files, img_stats, lb_stats):
+            row = old_rows.get(im_file)
+            check_image = row is None or tuple(old['img_stat'][row]) != img_stat
+            check_label = row is None or tuple(old['lb_stat'][row]) != lb_stat
+            rows.append(row)
+            if check_image or check_label:
+                jobs.append((im_file, lb_file, check_image, check_label))
+
+        results = {}
+        if jobs:
+            desc = f"{prefix}Scanning '{path.parent / path.stem}' images and labels ({len(jobs)} new or changed)..."
+            if len(jobs) > 64:  # not worth starting processes for a handful of files
+                with Pool(min(os.cpu_count() or 1, 8)) as pool:
+                    scanned = list(tqdm(pool.imap(scan_image_and_label, jobs, chunksize=64), desc=desc, total=len(jobs)))
+            else:
+                scanned = [scan_image_and_label(job) for job in jobs]
+            results = {job[0]: result for job, result in zip(jobs, scanned)}
+
+        c = {k: [] for k in ['files', 'img_stat', 'lb_stat', 'shapes', 'img_ok', 'lb_state', 'lb_ok', 'labels', 'segments']}
         x = {}  # dict
         nm, nf, ne, nc = 0, 0, 0, 0  # number missing, found, empty, duplicate
-        pbar = tqdm(zip(self.img_files, self.label_files), desc='Scanning images', total=len(self.img_files))
-        for i, (im_file, lb_file) in enumerate(pbar):
-            try:
-                # verify images
-                im = Image.open(im_file)
-                im.verify()  # PIL verify
-                shape = exif_size(im)  # image size
-                segments = []  # instance segments
-                assert (shape[0] > 9) & (shape[1] > 9), f'image size {shape} <10 pixels'
-                assert im.format.lower() in img_formats, f'invalid image format {im.format}'
-
-                # verify labels
-                if os.path.isfile(lb_file):
-                    nf += 1  # label found
-                    with open(lb_file, 'r') as f:
-                        l = [x.split() for x in f.read().strip().splitlines()]
-                        if any([len(x) > 8 for x in l]):  # is segment
-                            classes = np.array([x[0] for x in l], dtype=np.float32)
-                            segments = [np.array(x[1:], dtype=np.float32).reshape(-1, 2) for x in l]  # (cls, xy1...)
-                            l = np.concatenate((classes.reshape(-1, 1), segments2boxes(segments)), 1)  # (cls, xywh)
-                        l = np.array(l, dtype=np.float32)
-                    if len(l):
-                        assert l.shape[1] == 5, 'labels require 5 columns each'
-                        assert (l >= 0).all(), 'negative labels'
-                        assert (l[:, 1:] <= 1).all(), 'non-normalized or out of bounds coordinate labels'
-                        assert np.unique(l, axis=0).shape[0] == l.shape[0], 'duplicate labels'
-                    else:
-                        ne += 1  # label empty
-                        l = np.zeros((0, 5), dtype=np.float32)
-                else:
-                    nm += 1  # label missing
-                    l = np.zeros((0, 5), dtype=np.float32)
-                x[im_file] = [l, shape, segments]
-            except Exception as e:
-                nc += 1
-                print(f'{prefix}WARNING: Ignoring corrupted image and/or label {im_file}: {e}')
+        for im_file, img_stat, lb_stat, row in zip(self.img_files, img_stats, lb_stats, rows):
+            image_result, label_result = results.get(im_file, (None, None))
+            if image_result is not None:
+                shape, msg = image_result
+                img_ok = shape is not None
+                shape = shape or (0, 0)
+            else:
+                shape, img_ok, msg = tuple(old['shapes'][row]), old['img_ok'][row], 'corrupted image (cached)'
+            if label_result is not None:
+                l, segments, lb_state, lb_msg = label_result
+                lb_ok = lb_msg is None
+            else:
+                l, segments, lb_state, lb_ok, lb_msg = old['labels'][row], old['segments'][row], old['lb_state'][row], \
+                    old['lb_ok'][row], 'corrupted label (cached)'
 
-            pbar.desc = f"{prefix}Scanning '{path.parent / path.stem}' images and labels... " \
-                        f"{nf} found, {nm} missing, {ne} empty, {nc} corrupted"
-        pbar.close()
+            for k, v in zip(c, [im_file, img_stat, lb_stat, shape, img_ok, lb_state, lb_ok, l, segments]):
+                c[k].append(v)
+            if not img_ok or not lb_ok:
+                nc += 1
+                if image_result is not None or label_result is not None:  # only warn when it was just found
+                    print(f'{prefix}WARNING: Ignoring corrupted image and/or label {im_file}: {msg if not img_ok else lb_msg}')
+                continue
+            nm += lb_state == 0
+            nf += lb_state > 0
+            ne += lb_state == 2
+            x[im_file] = [l, shape, segments]
 
         if nf == 0:
             print(f'{prefix}WARNING: No labels found in {path}. See {help_url}')
 
-        x['hash'] = get_hash(self.label_files + self.img_files)
-        x['results'] = nf, nm, ne, nc, i + 1
-        x['version'] = 0.1  # cache version
-        torch.save(x, path)  # save for next time
-        logging.info(f'{prefix}New cache created: {path}')
-        return x
+        x['results'] = nf, nm, ne, nc, len(self.img_files)
+        if jobs or old is None or len(old['files']) != len(self.img_files):
+            save_label_cache(path, c)  # save for next time
+            logging.info(f'{prefix}Label cache updated: {path} ({len(jobs)} files scanned)')
+        return x, not jobs
 
     def __len__(self):
         return len(self.img_files)
@@ -665,6 +862,8 @@ class LoadImagesAndLabels(Dataset):  # for training/testing
 # Ancillary functions --------------------------------------------------------------------------------------------------
 def load_image(self, index):
     # loads 1 image from dataset, returns img, original hw, resized hw
+    if getattr(self, 'img_shard', None) is not None:
+        return self.img_shard.get(index)
     img = self.imgs[index]
     if img is None:  # not cached
         path = self.img_files[index]
@@ -680,6 +879,76 @@ def load_image(self, index):
         return self.imgs[index], self.img_hw0[index], self.img_hw[index]  # img, hw_original, hw_resized
 
 
+class ImageShardCache:
+    # cache_images='mmap': every image of a dataset, already resized by load_image, in one memory-mapped shard file with an
+    # offset index (.index.npz) next to it. All dataloader workers map the same file, so the decoded pixels live once in the
+    # OS page cache instead of once per worker. Images that are unchanged (path, mtime, size) are reused between runs,
+    # new ones are appended, and the shard is rewritten from scratch once more than half of it is dead space
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix('.index.npz')
+        self.offsets = self.shapes = self.hw0 = None
+        self._mm = None  # opened lazily in every process (dataloader workers get a pickled copy without it)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_mm'] = None
+        return state
+
+    def get(self, index):
+        if self._mm is None:
+            self._mm = np.memmap(self.path, dtype=np.uint8, mode='c')  # copy-on-write, in-place augmentation never reaches the file
+        h, w, c = (int(x) for x in self.shapes[index])
+        o = int(self.offsets[index])
+        return self._mm[o:o + h * w * c].reshape(h, w, c), tuple(int(x) for x in self.hw0[index]), (h, w)  # img, hw_original, hw_resized
+
+    def _load_index(self, dataset):
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                if int(data['img_size']) != dataset.img_size or bool(data['augment']) != dataset.augment or \
+                        not self.path.is_file() or self.path.stat().st_size != int(data['end']):  # settings changed or an append was interrupted
+                    return None
+                files = bytes(data['files']).decode('utf-8').split('\n') if len(data['offsets']) else []
+                return {(f, tuple(st)): (o, tuple(sh), tuple(hw)) for f, st, o, sh, hw in
+                        zip(files, data['stats'].tolist(), data['offsets'].tolist(), data['shapes'].tolist(), data['hw0'].tolist())}, int(data['end'])
+        except Exception:  # no index yet, or damaged
+            return None
+
+    def update(self, dataset, prefix=''):
+        n = len(dataset.img_files)
+        stats = [file_stat(f) for f in dataset.img_files]
+        old = self._load_index(dataset)
+        entries, end = old if old is not None else ({}, 0)
+        self.offsets, self.shapes, self.hw0 = np.zeros(n, dtype=np.int64), np.zeros((n, 3), dtype=np.int64), np.zeros((n, 2), dtype=np.int64)
+        todo = []
+        for i, key in enumerate(zip(dataset.img_files, stats)):
+            if key in entries:
+                self.offsets[i], self.shapes[i], self.hw0[i] = entries[key]
+            else:
+                todo.append(i)
+        if end > 2 * int(self.shapes.prod(1).sum()):  # mostly images that left the dataset, start over
+            todo, end = list(range(n)), 0
+
+        if todo:
+            with open(self.path, 'ab' if end else 'wb') as f, ThreadPool(8) as pool:
+                results = pool.imap(lambda i: load_image(dataset, i), todo)
+                pbar = tqdm(zip(todo, results), total=len(todo))
+                for i, (img, hw0, hw) in pbar:
+                    img = np.ascontiguousarray(img.reshape(*img.shape[:2], -1))
+                    self.offsets[i], self.shapes[i], self.hw0[i] = end, img.shape, hw0
+                    f.write(img.tobytes())
+                    end += img.nbytes
+                    pbar.desc = f'{prefix}Caching images in {self.path.name} ({end / 1E9:.1f}GB)'
+                pbar.close()
+                pool.close()  # LDV trains repeatedly in one process, so the pool threads must not outlive the build
+                pool.join()
+            with open(self.index_path, 'wb') as f:  # np.savez would append .npz to a path
+                np.savez(f, img_size=dataset.img_size, augment=dataset.augment, end=end,
+                         files=np.frombuffer('\n'.join(dataset.img_files).encode('utf-8'), dtype=np.uint8),
+                         stats=np.array(stats, dtype=np.int64).reshape(-1, 2), offsets=self.offsets, shapes=self.shapes, hw0=self.hw0)
+        logging.info(f'{prefix}{n - len(todo)} cached images reused, {len(todo)} added to {self.path}')
+
+
 def augment_hsv(img, hgain=0.5, sgain=0.5, vgain=0.5):
     r = np.random.uniform(-1, 1, 3) * [hgain, sgain, vgain] + 1  # random gains
     hue, sat, val = cv2.split(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
@@ -1,6 +1,7 @@
 # YOLOR general utils
 
 import glob
+import hashlib
 import logging
 import math
 import os
@@ -153,6 +154,25 @@ def check_file(file):
         return files[0]  # return file
 
 
+def resolve_path(path, root='.'):
+    # Resolve a relative path (or list of paths) against root instead of the current working directory
+    # Absolute and empty paths are returned unchanged
+    if isinstance(path, (list, tuple)):
+        return [resolve_path(p, root) for p in path]
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.join(root, path)
+
+
+def file_checksum(path, chunk_size=8 << 20):
+    # Returns the sha256 hex digest of a file, read in chunks
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 def check_dataset(dict):
     # Download dataset if not found locally
     val, s = dict.get('val'), dict.get('download')
@@ -607,7 +627,7 @@ def box_diou(box1, box2, eps: float = 1e-7):
 
 def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False, multi_label=False,
                         labels=()):
-    """Runs Non-Maximum Suppression (NMS) on inference results
+    """Runs Non-Maximum Suppression (NMS) on inference results, filtering the candidates of the whole batch at once
 
     Returns:
          list of detections, on (n,6) tensor per image [xyxy, conf, cls]
@@ -620,83 +640,84 @@ def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=Non
     min_wh, max_wh = 2, 4096  # (pixels) minimum and maximum box width and height
     max_det = 300  # maximum number of detections per image
     max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
-    time_limit = 10.0  # seconds to quit after
+    time_limit = 10.0  # seconds before a warning is printed (the batch is still finished)
     redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
     merge = False  # use merge-NMS
 
     t = time.time()
-    output = [torch.zeros((0, 6), device=prediction.device)] * prediction.shape[0]
-    for xi, x in enumerate(prediction):  # image index, image inference
-        # Apply constraints
-        # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
-        x = x[xc[xi]]  # confidence
-
-        # Cat apriori labels if autolabelling
-        if labels and len(labels[xi]):
-            l = labels[xi]
-            v = torch.zeros((len(l), nc + 5), device=x.device)
-            v[:, :4] = l[:, 1:5]  # box
-            v[:, 4] = 1.0  # conf
-            v[range(len(l)), l[:, 0].long() + 5] = 1.0  # cls
-            x = torch.cat((x, v), 0)
-
-        # If none remain process next image
-        if not x.shape[0]:
-            continue
-
-        # Compute conf
-        if nc == 1:
-            x[:, 5:] = x[:, 4:5] # for models with one class, cls_loss is 0 and cls_conf is always 0.5,
-                                 # so there is no need to multiplicate.
-        else:
-            x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
-
-        # Box (center x, center y, width, height) to (x1, y1, x2, y2)
-        box = xywh2xyxy(x[:, :4])
-
-        # Detections matrix nx6 (xyxy, conf, cls)
-        if multi_label:
-            i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
-            x = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1)
-        else:  # best class only
-            conf, j = x[:, 5:].max(1, keepdim=True)
-            x = torch.cat((box, conf, j.float()), 1)[conf.view(-1) > conf_thres]
-
-        # Filter by class
-        if classes is not None:
-            x = x[(x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)]
-
-        # Apply finite constraint
-        # if not torch.isfinite(x).all():
-        #     x = x[torch.isfinite(x).all(1)]
-
-        # Check shape
-        n = x.shape[0]  # number of boxes
-        if not n:  # no boxes
+    bs = prediction.shape[0]  # batch size
+    bi, ai = xc.nonzero(as_tuple=True)  # image index, anchor index of the candidates
+    x = prediction[bi, ai]  # confidence, candidates of the whole batch (a copy, prediction is left untouched)
+
+    # Cat apriori labels if autolabelling
+    if labels:
+        for li, l in enumerate(labels):
+            if len(l):
+                v = torch.zeros((len(l), nc + 5), device=x.device, dtype=x.dtype)
+                v[:, :4] = l[:, 1:5]  # box
+                v[:, 4] = 1.0  # conf
+                v[range(len(l)), l[:, 0].long() + 5] = 1.0  # cls
+                x = torch.cat((x, v), 0)
+                bi = torch.cat((bi, torch.full((len(l),), li, device=bi.device, dtype=bi.dtype)), 0)
+
+    # Compute conf
+    if nc == 1:
+        x[:, 5:] = x[:, 4:5] # for models with one class, cls_loss is 0 and cls_conf is always 0.5,
+                             # so there is no need to multiplicate.
+    else:
+        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+    # Box (center x, center y, width, height) to (x1, y1, x2, y2)
+    box = xywh2xyxy(x[:, :4])
+
+    # Detections matrix nx6 (xyxy, conf, cls), with the image index of each row in bi
+    if multi_label:
+        i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
+        x, bi = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1), bi[i]
+    else:  # best class only
+        conf, j = x[:, 5:].max(1, keepdim=True)
+        keep = conf.view(-1) > conf_thres
+        x, bi = torch.cat((box, conf, j.float()), 1)[keep], bi[keep]
+
+    # Filter by class
+    if classes is not None:
+        keep = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+        x, bi = x[keep], bi[keep]
+
+    # Group the boxes by image, most confident first, and keep at most max_nms per image
+    n = x.shape[0]  # number of boxes, all images
+    order = x[:, 4].argsort(descending=True)
+    order = order[(bi[order] * n + torch.arange(n, device=x.device)).argsort()]  # by image, confidence order within
+    x, bi = x[order], bi[order]
+    counts = torch.bincount(bi, minlength=bs)
+    if (counts > max_nms).any():  # excess boxes
+        keep = torch.arange(n, device=x.device) - (counts.cumsum(0) - counts)[bi] < max_nms  # rank within image
+        x, bi = x[keep], bi[keep]
+        counts = counts.clamp(max=max_nms)
+
+    # NMS per image on its slice of the grouped boxes. A single call for the whole batch would be simpler, but the
+    # cost of NMS grows with the square of the number of boxes it is given, so it scales worse with the batch size
+    c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+    boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
+    ends = counts.cumsum(0).tolist()
+    output = []
+    for s, e in zip([0] + ends[:-1], ends):  # slice of each image
+        if s == e:  # no boxes
+            output.append(torch.zeros((0, 6), device=prediction.device))
             continue
-        elif n > max_nms:  # excess boxes
-            x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence
-
-        # Batched NMS
-        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
-        i = torchvision.ops.nms(boxes, scores, iou_thres)  # NMS
-        if i.shape[0] > max_det:  # limit detections
-            i = i[:max_det]
-        if merge and (1 < n < 3E3):  # Merge NMS (boxes merged using weighted mean)
+        i = torchvision.ops.nms(boxes[s:e], scores[s:e], iou_thres)[:max_det] + s  # NMS, limit detections
+        if merge and (1 < e - s < 3E3):  # Merge NMS (boxes merged using weighted mean)
             # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
-            weights = iou * scores[None]  # box weights
-            x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
+            iou = box_iou(boxes[i], boxes[s:e]) > iou_thres  # iou matrix
+            weights = iou * scores[None, s:e]  # box weights
+            x[i, :4] = torch.mm(weights, x[s:e, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
             if redundant:
                 i = i[iou.sum(1) > 1]  # require redundancy
+        output.append(x[i])
 
-        output[xi] = x[i]
-        if (time.time() - t) > time_limit:
-            print(f'WARNING: NMS time limit {time_limit}s exceeded')
-            break  # time limit exceeded
-
+    if (time.time() - t) > time_limit:  # reported, not truncated: every image of the batch has its detections
+        print(f'WARNING: NMS took {time.time() - t:.1f}s for {bs} images, above the {time_limit}s time limit')
     return output
 
 
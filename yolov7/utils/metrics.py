@@ -7,12 +7,12 @@ import numpy as np
 import torch
 
 from . import general
+from .model_registry import FITNESS_WEIGHTS
 
 
 def fitness(x):
     # Model fitness as a weighted combination of metrics
-    w = [0.0, 0.0, 0.1, 0.9]  # weights for [P, R, mAP@0.5, mAP@0.5:0.95]
-    return (x[:, :4] * w).sum(1)
+    return (x[:, :4] * FITNESS_WEIGHTS).sum(1)  # weights for [P, R, mAP@0.5, mAP@0.5:0.95]
 
 
 def ap_per_class(tp, conf, pred_cls, target_cls, v5_metric=False, plot=False, save_dir='.', names=()):
@@ -34,37 +34,41 @@ def ap_per_class(tp, conf, pred_cls, target_cls, v5_metric=False, plot=False, sa
     tp, conf, pred_cls = tp[i], conf[i], pred_cls[i]
 
     # Find unique classes
-    unique_classes = np.unique(target_cls)
+    unique_classes, n_l = np.unique(target_cls, return_counts=True)  # classes, number of labels per class
     nc = unique_classes.shape[0]  # number of classes, number of detections
 
+    # Group the predictions by class, keeping the objectness order within each class (predictions of classes without
+    # labels are left out). The classes with predictions are then handled at once, each being a segment of rows
+    # starts[k]:starts[k + 1]
+    ci = np.clip(np.searchsorted(unique_classes, pred_cls), 0, max(nc - 1, 0))  # class index of each prediction
+    i = np.flatnonzero(unique_classes[ci] == pred_cls) if nc else np.zeros(0, dtype=int)
+    i = i[np.argsort(ci[i], kind='stable')]
+    tp, conf, ci = tp[i], conf[i].astype(np.float64), ci[i]
+    n_p = np.bincount(ci, minlength=nc)  # number of predictions per class
+    has = n_p > 0  # classes with predictions, the others keep zero AP, P and R
+    starts = np.concatenate(([0], n_p[has].cumsum()))
+
     # Create Precision-Recall curve and compute AP for each class
     px, py = np.linspace(0, 1, 1000), []  # for plotting
     ap, p, r = np.zeros((nc, tp.shape[1])), np.zeros((nc, 1000)), np.zeros((nc, 1000))
-    for ci, c in enumerate(unique_classes):
-        i = pred_cls == c
-        n_l = (target_cls == c).sum()  # number of labels
-        n_p = i.sum()  # number of predictions
-
-        if n_p == 0 or n_l == 0:
-            continue
-        else:
-            # Accumulate FPs and TPs
-            fpc = (1 - tp[i]).cumsum(0)
-            tpc = tp[i].cumsum(0)
+    if has.any():
+        # Accumulate FPs and TPs, per class
+        tpc = tp.cumsum(0)
+        tpc -= np.repeat(np.concatenate((np.zeros((1, tp.shape[1]), dtype=tpc.dtype), tpc))[starts[:-1]], n_p[has], 0)
+        fpc = (np.arange(len(tp)) - np.repeat(starts[:-1], n_p[has]) + 1)[:, None] - tpc
 
-            # Recall
-            recall = tpc / (n_l + 1e-16)  # recall curve
-            r[ci] = np.interp(-px, -conf[i], recall[:, 0], left=0)  # negative x, xp because xp decreases
+        # Recall
+        recall = tpc / (n_l[ci][:, None] + 1e-16)  # recall curve
+        r[has] = interp_segments(-px[::-1], -conf[:, None], recall[:, :1], starts, left=0)[:, 0, ::-1]  # negative x, xp because xp decreases
 
-            # Precision
-            precision = tpc / (tpc + fpc)  # precision curve
-            p[ci] = np.interp(-px, -conf[i], precision[:, 0], left=1)  # p at pr_score
+        # Precision
+        precision = tpc / (tpc + fpc)  # precision curve
+        p[has] = interp_segments(-px[::-1], -conf[:, None], precision[:, :1], starts, left=1)[:, 0, ::-1]  # p at pr_score
 
-            # AP from recall-precision curve
-            for j in range(tp.shape[1]):
-                ap[ci, j], mpre, mrec = compute_ap(recall[:, j], precision[:, j], v5_metric=v5_metric)
-                if plot and j == 0:
-                    py.append(np.interp(px, mrec, mpre))  # precision at mAP@0.5
+        # AP from recall-precision curve
+        ap[has], mpre, mrec, starts = compute_ap_segments(recall, precision, starts, v5_metric=v5_metric)
+        if plot:
+            py = list(interp_segments(px, mrec[:, :1], mpre[:, :1], starts)[:, 0])  # precision at mAP@0.5
 
     # Compute F1 (harmonic mean of precision and recall)
     f1 = 2 * p * r / (p + r + 1e-16)
@@ -78,6 +82,71 @@ def ap_per_class(tp, conf, pred_cls, target_cls, v5_metric=False, plot=False, sa
     return p[:, i], r[:, i], ap, f1[:, i], unique_classes.astype('int32')
 
 
+def interp_segments(x, xp, fp, starts, left=None):
+    """ np.interp(x, xp[a:b, t], fp[a:b, t], left) for every segment a:b of rows and every column t at once,
+    with the same numbers: the last xp <= x is found, then linear interpolation to the next one.
+    # Arguments
+        x:  Points to evaluate, increasing (nparray, k).
+        xp:  Increasing x of each segment (nparray, nxt).
+        fp:  Values at xp (nparray, nxt).
+        starts:  First row of each segment, then n (nparray, s+1). Segments must not be empty.
+        left:  Value for x below the first xp of a segment, that first fp by default.
+    # Returns
+        The interpolated values (nparray, sxtxk).
+    """
+    s, t, k = len(starts) - 1, xp.shape[1], len(x)
+    n = np.diff(starts)[:, None, None]  # segment lengths
+
+    # Number of xp <= x within each segment and column, from the first x at or above every xp
+    seg = np.repeat(np.arange(s), n.ravel())
+    first = np.searchsorted(x, xp, side='left')
+    counts = np.bincount(((seg[:, None] * t + np.arange(t)) * (k + 1) + first).ravel(), minlength=s * t * (k + 1))
+    j = counts.reshape(s, t, k + 1).cumsum(2)[..., :k] - 1  # last xp <= x, -1 if there is none
+
+    col = np.arange(t)[None, :, None]
+    j0, j1 = starts[:-1, None, None] + np.clip(j, 0, n - 1), starts[:-1, None, None] + np.clip(j + 1, 0, n - 1)
+    x0, x1, y0, y1 = xp[j0, col], xp[j1, col], fp[j0, col], fp[j1, col]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = (y1 - y0) / (x1 - x0) * (x - x0) + y0
+    y = np.where((j >= n - 1) | (x0 == x), y0, y)  # at or past the last xp, or exactly on one
+    return np.where(j < 0, y0 if left is None else left, y)
+
+
+def compute_ap_segments(recall, precision, starts, v5_metric=False):
+    """ compute_ap for the recall and precision curves of all classes (row segments) and IoU thresholds (columns) at once
+    # Arguments
+        recall:    The recall curves (nparray, nxt)
+        precision: The precision curves (nparray, nxt)
+        starts:    First row of each class, then n (nparray, s+1)
+        v5_metric: Assume maximum recall to be 1.0, as in YOLOv5, MMDetetion etc.
+    # Returns
+        Average precision (nparray, sxt), precision envelopes, recall curves and starts, with the sentinel rows
+    """
+    s = len(starts) - 1
+    n = np.diff(starts)
+
+    # Append sentinel values to beginning and end of each class
+    first, last = starts[:-1] + 2 * np.arange(s), starts[1:] + 2 * np.arange(s) + 1
+    rows = np.arange(len(recall)) + 2 * np.repeat(np.arange(s), n) + 1
+    mrec, mpre = np.zeros((len(recall) + 2 * s, recall.shape[1])), np.zeros((len(recall) + 2 * s, recall.shape[1]))
+    mrec[rows], mpre[rows], mpre[first] = recall, precision, 1.
+    if v5_metric:  # New YOLOv5 metric, same as MMDetection and Detectron2 repositories
+        mrec[last] = 1.0
+    else:  # Old YOLOv5 metric, i.e. default YOLOv7 metric
+        mrec[last] = recall[starts[1:] - 1] + 0.01
+    starts = starts + 2 * np.arange(s + 1)
+
+    # Compute the precision envelope, the max at or after each point within its class. numpy orders complex numbers
+    # by real part first, so with the class order as real part the values of a class never carry over to the class before
+    key = (s - np.repeat(np.arange(s), n + 2))[:, None] + 1j * mpre
+    mpre = np.flip(np.maximum.accumulate(np.flip(key, 0), 0), 0).imag
+
+    # Integrate area under curve, 101-point interp (COCO)
+    x = np.linspace(0, 1, 101)
+    ap = np.trapz(interp_segments(x, mrec, mpre, starts), x)  # integrate
+    return ap, mpre, mrec, starts
+
+
 def compute_ap(recall, precision, v5_metric=False):
     """ Compute the average precision, given the recall and precision curves
     # Arguments
@@ -110,6 +179,36 @@ def compute_ap(recall, precision, v5_metric=False):
     return ap, mpre, mrec
 
 
+def match_predictions(detections, labels, iouv):
+    """
+    Marks which detections are true positives, at each IoU threshold.
+    Every detection is matched to its best IoU target of the same class, and a target matched by several detections
+    goes to the first one of them (the most confident, as NMS outputs them in that order) above iouv[0].
+    Both sets of boxes are expected to be in (x1, y1, x2, y2) format.
+    Arguments:
+        detections (Array[N, 6]), x1, y1, x2, y2, conf, class
+        labels (Array[M, 5]), class, x1, y1, x2, y2
+        iouv (Array[T]), IoU thresholds
+    Returns:
+        correct (Array[N, T]), bool
+    """
+    correct = torch.zeros(detections.shape[0], iouv.numel(), dtype=torch.bool, device=iouv.device)
+    if not detections.shape[0] or not labels.shape[0]:
+        return correct
+    iou = general.box_iou(detections[:, :4], labels[:, 1:]) * (detections[:, 5:6] == labels[:, 0])  # same class only
+    ious, ti = iou.max(1)  # best iou and target of each detection
+    pi = (ious > iouv[0]).nonzero(as_tuple=False).view(-1)  # detections above the lowest threshold, in order
+    if pi.shape[0]:
+        ti = ti[pi]
+        order = (ti * detections.shape[0] + pi).argsort()  # grouped by target, first detection first
+        pi, ti = pi[order], ti[order]
+        first = torch.ones_like(pi, dtype=torch.bool)
+        first[1:] = ti[1:] != ti[:-1]  # first detection of each target
+        pi = pi[first]
+        correct[pi] = ious[pi, None] > iouv  # iou_thres is 1xn
+    return correct
+
+
 class ConfusionMatrix:
     # Updated version of https://github.com/kaanakan/object_detection_confusion_matrix
     def __init__(self, nc, conf=0.25, iou_thres=0.45):
@@ -144,19 +243,18 @@ class ConfusionMatrix:
         else:
             matches = np.zeros((0, 3))
 
-        n = matches.shape[0] > 0
-        m0, m1, _ = matches.transpose().astype(np.int16)
-        for i, gc in enumerate(gt_classes):
-            j = m0 == i
-            if n and sum(j) == 1:
-                self.matrix[gc, detection_classes[m1[j]]] += 1  # correct
-            else:
-                self.matrix[self.nc, gc] += 1  # background FP
-
-        if n:
-            for i, dc in enumerate(detection_classes):
-                if not any(m1 == i):
-                    self.matrix[dc, self.nc] += 1  # background FN
+        gt_classes, detection_classes = gt_classes.cpu().numpy(), detection_classes.cpu().numpy()
+        m0, m1 = matches[:, 0].astype(int), matches[:, 1].astype(int)  # matched label, detection (each at most once)
+        gt_matched = np.zeros(len(gt_classes), dtype=bool)
+        gt_matched[m0] = True
+        rows = [gt_classes[m0], np.full((~gt_matched).sum(), self.nc)]  # correct, background FP
+        cols = [detection_classes[m1], gt_classes[~gt_matched]]
+        if len(m0):
+            detection_matched = np.zeros(len(detection_classes), dtype=bool)
+            detection_matched[m1] = True
+            rows.append(detection_classes[~detection_matched])  # background FN
+            cols.append(np.full((~detection_matched).sum(), self.nc))
+        np.add.at(self.matrix, (np.concatenate(rows), np.concatenate(cols)), 1)
 
     def matrix(self):
         return self.matrix
@@ -0,0 +1,65 @@
+# Model registry, a JSON file {'version': 1, 'models': {run name: entry}} next to the training runs it lists.
+# train() adds the entry of a run when it ends, LDV picks its models from it. Only json/os, so it imports without torch
+
+import json
+import os
+
+FITNESS_WEIGHTS = [0.0, 0.0, 0.1, 0.9]  # weights for [P, R, mAP@0.5, mAP@0.5:0.95] in utils.metrics.fitness()
+
+
+def load_model_registry(registry_path):
+    # Returns the {run name: entry} models of a registry, None if there is no registry (or it cannot be read)
+    if not os.path.isfile(registry_path):
+        return None
+    try:
+        with open(registry_path, encoding='utf-8') as f:
+            return json.load(f)['models']
+    except (ValueError, KeyError):
+        print(f'WARNING: unreadable model registry {registry_path}, ignoring it')
+        return None
+
+
+def save_model_registry(registry_path, models):
+    # Writes the {run name: entry} models of a registry
+    with open(str(registry_path) + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'models': models}, f, indent=1)
+    os.replace(str(registry_path) + '.tmp', registry_path)  # never leaves a half written registry behind
+
+
+def legacy_model_entry(run_dir):
+    # Entry of a run trained before the registry existed, with the best fitness recomputed from its results.txt.
+    # Its class names and validation set are unknown (None)
+    fitnesses = []
+    with open(os.path.join(run_dir, 'results.txt')) as f:
+        for line in f:
+            metrics = [float(x) for x in line.split()[8:12]]  # columns 9 to 12 are validation P, R, mAP@0.5 and mAP@0.5:0.95
+            fitnesses.append(sum(w * x for w, x in zip(FITNESS_WEIGHTS, metrics)))
+    return {'best_fitness': max(fitnesses, default=0.0), 'best_epoch': fitnesses.index(max(fitnesses)) if fitnesses else -1,
+            'names': None, 'val_dataset': None, 'weights': os.path.join('weights', 'best.pt')}
+
+
+def legacy_models(runs_dir):
+    # Returns the {run name: entry} models of the runs in runs_dir that have a results.txt and a weights/best.pt
+    models = {}
+    for run_name in sorted(os.listdir(runs_dir)):
+        run_dir = os.path.join(runs_dir, run_name)
+        if os.path.isfile(os.path.join(run_dir, 'results.txt')) and os.path.isfile(os.path.join(run_dir, 'weights', 'best.pt')):
+            models[run_name] = legacy_model_entry(run_dir)
+    return models
+
+
+def registered_models(registry_path):
+    # Returns the {run name: entry} models of a registry. Without a registry, the runs next to it are registered from
+    # their results.txt files first, so the runs trained before the registry existed are never dropped
+    models = load_model_registry(registry_path)
+    if models is None:
+        models = legacy_models(os.path.dirname(os.path.abspath(registry_path)))
+        save_model_registry(registry_path, models)
+    return models
+
+
+def update_model_registry(registry_path, run_name, entry):
+    # Adds (or replaces) the entry of the training run run_name
+    models = registered_models(registry_path)
+    models[run_name] = entry
+    save_model_registry(registry_path, models)
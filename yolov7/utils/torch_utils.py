@@ -141,6 +141,34 @@ def intersect_dicts(da, db, exclude=()):
     return {k: v for k, v in da.items() if k in db and not any(x in k for x in exclude) and v.shape == db[k].shape}
 
 
+def remap_head_classes(state_dict, model, old_names, new_names):
+    # Carries a checkpoint's detection head over to model, whose class list differs (classes added, removed or reordered).
+    # Per anchor, the box and objectness outputs and the outputs of every class in both lists are copied by class name,
+    # the outputs of new classes keep the model's initialization. Returns state_dict with the head tensors replaced
+    head = model.model[-1]
+    if type(head).__name__ not in ('Detect', 'IDetect', 'IAuxDetect'):  # heads with outputs laid out as (xywh, obj, classes)
+        return state_dict
+    old_no, new_no, na = len(old_names) + 5, head.no, head.na
+    common = [name for name in new_names if name in old_names]
+    old_rows = list(range(5)) + [5 + list(old_names).index(name) for name in common]
+    new_rows = list(range(5)) + [5 + list(new_names).index(name) for name in common]
+    prefix = f'model.{len(model.model) - 1}.'
+    msd = model.state_dict()
+    for k, v in state_dict.items():
+        if not k.startswith(prefix) or k not in msd or v.dim() != msd[k].dim():  # same shapes too, classes may be reordered or renamed
+            continue
+        # output channel dim: conv weights/biases dim 0, ImplicitM dim 1
+        dims = [d for d in range(v.dim()) if v.shape[d] == old_no * na and msd[k].shape[d] == new_no * na and
+                v.shape[:d] + v.shape[d + 1:] == msd[k].shape[:d] + msd[k].shape[d + 1:]]
+        if dims:
+            d = dims[0]
+            w = msd[k].detach().clone().float()
+            w.transpose(0, d).unflatten(0, (na, new_no))[:, new_rows] = v.float().transpose(0, d).unflatten(0, (na, old_no))[:, old_rows]
+            state_dict[k] = w
+    logger.info(f'Remapped detection head from {len(old_names)} to {len(new_names)} classes, {len(common)} classes carried over')
+    return state_dict
+
+
 def initialize_weights(model):
     for m in model.modules():
         t = type(m)
@@ -303,6 +331,40 @@ class ModelEMA:
         copy_attr(self.ema, model, include, exclude)
 
 
+class ValidationScheduler:
+    """ Decides which epochs are validated, and stops training once the fitness stops improving.
+    Epochs are validated every `interval` epochs, every epoch of the last `dense_epochs` epochs, on the final epoch,
+    and on the epoch where `patience` epochs without a better fitness run out (so the stop is decided on a fresh validation).
+    """
+
+    def __init__(self, epochs, interval=1, dense_epochs=0, patience=0, best_fitness=0.0, best_epoch=-1):
+        self.epochs = epochs
+        self.interval = max(interval, 1)
+        self.dense_start = epochs - dense_epochs  # first epoch that is always validated
+        self.patience = patience  # epochs without improvement before stopping, 0 disables early stopping
+        self.best_fitness = best_fitness
+        self.best_epoch = best_epoch
+
+    def validate(self, epoch):
+        # True if this epoch should be validated
+        return (epoch + 1) % self.interval == 0 or epoch >= self.dense_start or epoch + 1 == self.epochs or \
+               self.patience_over(epoch)
+
+    def patience_over(self, epoch):
+        return self.patience > 0 and epoch - self.best_epoch >= self.patience
+
+    def step(self, epoch, fitness):
+        # Records the fitness of a validated epoch, returns True if training should stop
+        if fitness > self.best_fitness or self.best_epoch < 0:  # the first validated epoch is the best so far, even at 0 fitness
+            self.best_epoch, self.best_fitness = epoch, fitness
+        stop = self.patience_over(epoch)
+        if stop:
+            logger.info(f'Stopping training early, no improvement in the last {epoch - self.best_epoch} epochs. '
+                        f'Best results were observed at epoch {self.best_epoch}, best.pt holds that model. '
+                        f'Set patience=0 to disable early stopping.')
+        return stop
+
+
 class BatchNormXd(torch.nn.modules.batchnorm._BatchNorm):
     def _check_input_dim(self, input):
         # The only difference between BatchNorm1d, BatchNorm2d, BatchNorm3d, etc
@@ -342,7 +404,7 @@ def revert_sync_batchnorm(module):
 
 class TracedModel(nn.Module):
 
-    def __init__(self, model=None, device=None, img_size=(640,640)): 
+    def __init__(self, model=None, device=None, img_size=(640,640), save_path="traced_model.pt"): 
         super(TracedModel, self).__init__()
         
         print(" Convert model to Traced-model... ") 
@@ -361,7 +423,7 @@ class TracedModel(nn.Module):
         
         traced_script_module = torch.jit.trace(self.model, rand_example, strict=False)
         #traced_script_module = torch.jit.script(self.model)
-        traced_script_module.save("traced_model.pt")
+        traced_script_module.save(save_path)
         print(" traced_script_module saved! ")
         self.model = traced_script_module
         self.model.to(device)